@@ -0,0 +1,164 @@
+"""基准测试用的订单表、运营对照表、成本对照表生成器（相同参数生成的数据完全相同）"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# 可选的数据规模
+SIZES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# 订单状态分布（接近实际导出数据中的比例）
+STATUS_MIX = [
+    ('已收货', 0.42),
+    ('交易完成', 0.15),
+    ('退货退款', 0.06),
+    ('已退款', 0.04),
+    ('已发货待收货', 0.10),
+    ('已发货', 0.06),
+    ('待发货', 0.08),
+    ('待处理', 0.02),
+    ('已取消', 0.07),
+]
+
+OPERATORS = ['张伟', '王芳', '李娜', '刘洋', '陈静', '杨磊', '赵敏', '黄涛', '周杰', '吴倩', '徐亮', '孙悦']
+
+# 模拟平台导出中与分析无关的列
+FILLER_COLUMNS = ['买家昵称', '收货人', '收货地址', '联系电话', '买家留言', '卖家备注',
+                  '物流公司', '物流单号', '店铺名称', '支付方式', '优惠金额', '商品名称']
+
+# Excel 单个工作表的最大数据行数
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def parse_size(text):
+    """把 '100k'、'1m' 或整数字符串转换为行数"""
+    text = str(text).lower()
+    if text in SIZES:
+        return SIZES[text]
+    return int(text)
+
+
+def generate_tables(n_orders, seed=0, extra_columns=len(FILLER_COLUMNS),
+                    missing_operator_rate=0.03, missing_cost_rate=0.05,
+                    duplicate_operator_rate=0.01, duplicate_cost_rate=0.005):
+    """生成 (订单表, 运营对照表, 成本对照表)
+
+    商品销量呈长尾分布；部分商品不在运营对照表或成本对照表中，
+    两张对照表中也包含少量重复记录。
+    """
+    rng = np.random.default_rng(seed)
+    n_products = max(50, n_orders // 200)
+
+    product_ids = np.arange(100000, 100000 + n_products)
+    product_codes = np.array([f"SKU{i:07d}" for i in range(n_products)], dtype=object)
+
+    # 长尾分布：少数商品占大部分订单
+    weights = 1.0 / np.arange(1, n_products + 1) ** 0.8
+    weights /= weights.sum()
+    product_idx = rng.choice(n_products, size=n_orders, p=weights)
+
+    statuses = np.array([name for name, _ in STATUS_MIX], dtype=object)
+    status_p = np.array([p for _, p in STATUS_MIX])
+    status_p /= status_p.sum()
+
+    unit_price = rng.uniform(9.9, 399.0, n_products).round(2)
+    quantity = rng.choice([1, 1, 1, 1, 2, 2, 3, 5], size=n_orders)
+    discount = rng.uniform(0.7, 1.0, n_orders)
+    order_time = (np.datetime64('2024-01-01') +
+                  rng.integers(0, 365 * 24 * 3600, n_orders).astype('timedelta64[s]'))
+
+    order_df = pd.DataFrame({
+        '订单编号': np.char.add('P', np.arange(10_000_000_000, 10_000_000_000 + n_orders).astype(str)),
+        '下单时间': pd.to_datetime(order_time).strftime('%Y-%m-%d %H:%M:%S'),
+        '商品ID': product_ids[product_idx],
+        '商品编码': product_codes[product_idx],
+        '订单状态': rng.choice(statuses, size=n_orders, p=status_p),
+        '实收金额': (unit_price[product_idx] * quantity * discount).round(2),
+        '商品数量': quantity,
+        '运费': rng.choice([0.0, 0.0, 6.0, 8.0, 12.0], size=n_orders),
+    })
+    for name in FILLER_COLUMNS[:extra_columns]:
+        order_df[name] = rng.choice(np.array([f"{name}{i}" for i in range(200)], dtype=object), size=n_orders)
+
+    # 运营对照表：部分商品缺失，少量重复
+    has_operator = rng.random(n_products) >= missing_operator_rate
+    operator_df = pd.DataFrame({
+        '商品ID': product_ids[has_operator],
+        '商品编码': product_codes[has_operator],
+        '运营人员': rng.choice(np.array(OPERATORS, dtype=object), size=int(has_operator.sum())),
+    })
+    n_dup = int(len(operator_df) * duplicate_operator_rate)
+    if n_dup:
+        dup = operator_df.sample(n=n_dup, random_state=seed).assign(
+            运营人员=rng.choice(np.array(OPERATORS, dtype=object), size=n_dup))
+        operator_df = pd.concat([operator_df, dup], ignore_index=True)
+
+    # 成本对照表：部分商品编码缺失，少量重复
+    has_cost = rng.random(n_products) >= missing_cost_rate
+    cost_df = pd.DataFrame({
+        '商品编码': product_codes[has_cost],
+        '商品成本': (unit_price[has_cost] * rng.uniform(0.3, 0.8, int(has_cost.sum()))).round(2),
+    })
+    n_dup = int(len(cost_df) * duplicate_cost_rate)
+    if n_dup:
+        dup = cost_df.sample(n=n_dup, random_state=seed + 1)
+        cost_df = pd.concat([cost_df, dup.assign(商品成本=dup['商品成本'] * 1.1)], ignore_index=True)
+
+    return order_df, operator_df, cost_df
+
+
+def expected_paths(out_dir, prefix, formats=('csv', 'xlsx'), n_orders=0):
+    """返回 write_tables 会写出的 {(表名, 格式): 路径}"""
+    paths = {}
+    for name in ('order', 'operator', 'cost'):
+        base = os.path.join(out_dir, f"{prefix}_{name}")
+        if 'csv' in formats:
+            paths[(name, 'csv')] = base + '.csv'
+        if 'xlsx' in formats and _has_openpyxl() and n_orders <= EXCEL_MAX_ROWS:
+            paths[(name, 'xlsx')] = base + '.xlsx'
+    return paths
+
+
+def write_tables(tables, out_dir, prefix, formats=('csv', 'xlsx'), encoding='gbk', n_orders=None):
+    """把三张表写成 GBK 编码的 CSV 和/或 XLSX，返回 {(表名, 格式): 路径}
+
+    已存在的文件不会重写（此时 tables 中对应的表可以为 None）；
+    超过 Excel 行数上限或未安装 openpyxl 时跳过 XLSX。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if n_orders is None:
+        n_orders = len(tables[0])
+    paths = expected_paths(out_dir, prefix, formats, n_orders)
+    for name, df in zip(('order', 'operator', 'cost'), tables):
+        if (name, 'csv') in paths:
+            _write_once(paths[(name, 'csv')], lambda tmp: df.to_csv(tmp, index=False, encoding=encoding))
+        if (name, 'xlsx') in paths:
+            _write_once(paths[(name, 'xlsx')], lambda tmp: df.to_excel(tmp, index=False, engine='openpyxl'))
+    return paths
+
+
+def _has_openpyxl():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _write_once(path, write):
+    """文件不存在时写入（先写临时文件，避免中断后留下不完整的数据文件）"""
+    if os.path.exists(path):
+        return
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,244 @@
+"""订单分析流程的分阶段基准测试（无界面运行）
+
+示例：
+    python benchmarks/run_benchmarks.py --sizes 10k,100k
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --save-baseline
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --compare
+
+每个规模依次计时以下阶段：文件读取（GBK CSV / XLSX）、列识别、订单规范化、
+对照表索引与匹配、状态分类、盈亏计算、汇总，以及完整流程（单进程和多进程分片）。
+计时和内存峰值（tracemalloc）分两遍测量，避免内存跟踪影响计时。
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir, 'main'))
+sys.path.insert(0, HERE)
+
+from analysis import (  # noqa: E402
+    build_cost_index, build_operator_index, format_summary, lookup_operators, merge_lookups,
+    normalize_orders, resolve_columns, select_columns
+)
+from cube import build_cube  # noqa: E402
+from datagen import expected_paths, generate_tables, parse_size, write_tables  # noqa: E402
+import loaders  # noqa: E402
+from loaders import detect_encoding, read_header, read_table  # noqa: E402
+from parallel import run_parallel_analysis  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from profit_engine import compute_profit  # noqa: E402
+from status_rules import classify_statuses  # noqa: E402
+from summary import summarize_by_operator  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(HERE, 'data')
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+
+# 低于该耗时（秒）的阶段波动较大，不参与回归判断
+MIN_COMPARABLE_SECONDS = 0.02
+
+
+def read_pruned(path):
+    """先读取表头，只读取分析用到的订单列"""
+    usecols, text_columns = select_columns('order', read_header(path))
+    return read_table(path, usecols=usecols, text_columns=text_columns)
+
+
+def benchmark_steps(paths):
+    """返回按顺序执行的 (阶段名, 函数) 列表，函数接收并返回共享的状态字典"""
+    steps = [
+        ('detect_encoding', lambda s: s.update(encoding=detect_encoding(paths[('order', 'csv')]))),
+        ('read_csv_order', lambda s: s.update(order=read_table(paths[('order', 'csv')]))),
+        ('read_csv_order_pruned', lambda s: read_pruned(paths[('order', 'csv')])),
+        ('read_csv_operator', lambda s: s.update(operator=read_table(paths[('operator', 'csv')]))),
+        ('read_csv_cost', lambda s: s.update(cost=read_table(paths[('cost', 'csv')]))),
+    ]
+    for name in ('order', 'operator', 'cost'):
+        if (name, 'xlsx') in paths:
+            steps.append((f'read_xlsx_{name}', lambda s, p=paths[(name, 'xlsx')]: read_table(p)))
+
+    def profit(s):
+        frame = s['orders'].copy(deep=False)
+        frame['商品成本'] = s['costs']
+        frame['状态分类'] = s['status']
+        s['profit'] = compute_profit(frame)
+
+    def aggregate(s):
+        merged_df = merge_lookups(s['orders'], s['operators'], s['costs'])
+        merged_df['状态分类'] = s['status']
+        merged_df['盈亏'], merged_df['待确认盈利'] = s['profit']
+        s['result'] = format_summary(summarize_by_operator(merged_df))
+        s['merged'] = merged_df
+
+    steps += [
+        ('resolve_columns', lambda s: s.update(columns=resolve_columns(s['order'], s['operator'], s['cost']))),
+        ('normalize', lambda s: s.update(orders=normalize_orders(s['order'], s['columns']))),
+        ('operator_index', lambda s: s.update(operator_index=build_operator_index(s['operator'], s['columns'])[0])),
+        ('operator_join', lambda s: s.update(operators=lookup_operators(s['orders'], s['operator_index']))),
+        ('cost_index', lambda s: s.update(cost_index=build_cost_index(s['cost'], s['columns']))),
+        ('cost_join', lambda s: s.update(costs=s['cost_index'].lookup(s['orders']))),
+        ('status', lambda s: s.update(status=classify_statuses(s['orders']['订单状态']))),
+        ('profit', profit),
+        ('aggregate', aggregate),
+        ('cube', lambda s: build_cube(s['merged'])),
+        ('pipeline_total', lambda s: AnalysisPipeline().run(s['order'], s['operator'], s['cost'])),
+        ('parallel_total', lambda s: run_parallel_analysis(s['order'], s['operator'], s['cost'])),
+    ]
+    return steps
+
+
+def _reset_peak():
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def run_size(label, n_orders, data_dir, seed, formats, repeat, measure_memory):
+    """生成（或复用）一个规模的数据并测量各阶段"""
+    prefix = f"{label}_seed{seed}"
+    if _all_written(data_dir, prefix, formats, n_orders):
+        tables = None
+    else:
+        print(f"[{label}] 生成 {n_orders} 行订单数据 ...", flush=True)
+        tables = generate_tables(n_orders, seed=seed)
+    paths = write_tables(tables or (None, None, None), data_dir, prefix, formats=formats,
+                         n_orders=n_orders)
+
+    steps = benchmark_steps(paths)
+    results = {name: {'seconds': float('inf')} for name, _ in steps}
+
+    # 计时：重复 repeat 次取最短时间
+    for _ in range(repeat):
+        # 编码检测结果按文件缓存，每一遍都从冷缓存开始
+        loaders._encoding_cache.clear()
+        state = {}
+        for name, func in steps:
+            gc.collect()
+            start = time.perf_counter()
+            func(state)
+            results[name]['seconds'] = min(results[name]['seconds'], time.perf_counter() - start)
+        rows = len(state['order'])
+
+    # 内存峰值：单独一遍，记录每个阶段新分配内存的峰值
+    if measure_memory:
+        loaders._encoding_cache.clear()
+        state = {}
+        tracemalloc.start()
+        try:
+            for name, func in steps:
+                gc.collect()
+                current = tracemalloc.get_traced_memory()[0]
+                _reset_peak()
+                func(state)
+                peak = tracemalloc.get_traced_memory()[1]
+                results[name]['peak_mb'] = round(max(peak - current, 0) / 1024 ** 2, 2)
+        finally:
+            tracemalloc.stop()
+
+    for name, _ in steps:
+        results[name]['seconds'] = round(results[name]['seconds'], 4)
+        results[name]['rows'] = rows
+    return results
+
+
+def _all_written(data_dir, prefix, formats, n_orders):
+    """数据文件是否都已存在（都存在时不再重新生成数据）"""
+    return all(os.path.exists(path)
+               for path in expected_paths(data_dir, prefix, formats, n_orders).values())
+
+
+def compare(results, baseline, threshold):
+    """与基线比较，返回回归列表 [(规模, 阶段, 基线秒数, 当前秒数)]"""
+    regressions = []
+    for label, stages in results.items():
+        for name, current in stages.items():
+            base = baseline.get('results', {}).get(label, {}).get(name)
+            if not base:
+                continue
+            if max(base['seconds'], current['seconds']) < MIN_COMPARABLE_SECONDS:
+                continue
+            if current['seconds'] > base['seconds'] * (1 + threshold):
+                regressions.append((label, name, base['seconds'], current['seconds']))
+    return regressions
+
+
+def print_table(results):
+    for label, stages in results.items():
+        print(f"\n== {label} ({next(iter(stages.values()))['rows']} 行订单) ==")
+        print(f"{'阶段':<20}{'耗时(秒)':>12}{'内存峰值(MB)':>16}")
+        for name, item in stages.items():
+            peak = item.get('peak_mb')
+            print(f"{name:<20}{item['seconds']:>12.4f}{'' if peak is None else f'{peak:.2f}':>16}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="订单盈亏分析流程基准测试")
+    parser.add_argument('--sizes', default='10k,100k', help="逗号分隔的规模，例如 10k,100k,1m,10m")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="生成数据的存放目录（会复用已有文件）")
+    parser.add_argument('--formats', default='csv,xlsx', help="生成的文件格式：csv,xlsx")
+    parser.add_argument('--repeat', type=int, default=3, help="计时重复次数，取最短时间")
+    parser.add_argument('--no-memory', action='store_true', help="不测量内存峰值")
+    parser.add_argument('--output', help="把结果写入 JSON 文件")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线结果文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--compare', action='store_true', help="与基线比较，有回归时返回非零退出码")
+    parser.add_argument('--threshold', type=float, default=0.25, help="判定回归的耗时增幅，默认 25%%")
+    args = parser.parse_args(argv)
+
+    formats = tuple(f.strip() for f in args.formats.split(',') if f.strip())
+    results = {}
+    for label in [s.strip().lower() for s in args.sizes.split(',') if s.strip()]:
+        results[label] = run_size(label, parse_size(label), args.data_dir, args.seed, formats,
+                                  max(1, args.repeat), not args.no_memory)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\n未找到基线文件 {args.baseline}，请先使用 --save-baseline")
+            return 2
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n性能回归：")
+            for label, name, base, current in regressions:
+                print(f"  [{label}] {name}: {base:.4f}s -> {current:.4f}s ({current / base - 1:+.0%})")
+            return 1
+        print("\n与基线相比没有性能回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,531 @@
+"""订单盈亏分析流程（不依赖界面，可在后台线程中运行）"""
+import pandas as pd
+
+from cube import build_cube, combine_cubes, unparsed_dates
+from instrumentation import timed_stage
+from loaders import DEFAULT_CHUNK_SIZE, iter_table_chunks, read_header, read_table
+from lookup_index import LookupIndex
+from profit_engine import compute_profit
+from status_rules import classify_statuses
+from summary import combine_partials, finalize_summary, partial_summary, summarize_by_operator
+
+# 必要列的可能列名（按顺序匹配）
+PRODUCT_ID_NAMES = ['商品ID', '商品id', '产品ID', '产品id', '商品编号']
+PRODUCT_CODE_NAMES = ['商品编码', '商品编码', '产品编码', '产品编码', 'SKU']
+STATUS_NAMES = ['订单状态', '状态', '订单状态', '状态']
+AMOUNT_NAMES = ['实收金额', '金额', '实收', '收入']
+QUANTITY_NAMES = ['商品数量(件)', '商品数量', '数量', '数量(件)', '件数']
+OPERATOR_NAMES = ['运营人员', '运营', '负责人', '运营人员', '负责人']
+COST_NAMES = ['商品成本', '成本', '商品成本', '成本价']
+SHIPPING_NAMES = ['运费']
+ORDER_NUMBER_NAMES = ['订单号', '订单编号', '子订单号', '子订单编号', '主订单编号', '订单ID', '订单id']
+DATE_NAMES = ['订单日期', '下单时间', '下单日期', '订单创建时间', '创建时间', '付款时间', '支付时间', '日期']
+
+# 各数据表分析时用到的列：(列映射中的键, 可能的列名, 是否必要, 是否按文本读取)
+TABLE_COLUMNS = {
+    'order': [
+        ('product_id', PRODUCT_ID_NAMES, True, False),
+        ('product_code', PRODUCT_CODE_NAMES, True, False),
+        ('status', STATUS_NAMES, True, True),
+        ('amount', AMOUNT_NAMES, True, False),
+        ('quantity', QUANTITY_NAMES, False, False),
+        ('shipping', SHIPPING_NAMES, False, False),
+        ('order_date', DATE_NAMES, False, True),
+        ('order_number', ORDER_NUMBER_NAMES, False, True),
+    ],
+    'operator': [
+        ('operator_product_id', PRODUCT_ID_NAMES, True, False),
+        ('operator_product_code', PRODUCT_CODE_NAMES, False, False),
+        ('operator', OPERATOR_NAMES, True, True),
+    ],
+    'cost': [
+        ('cost_product_code', PRODUCT_CODE_NAMES, True, False),
+        ('cost', COST_NAMES, True, False),
+    ],
+}
+
+# 流式分析时每累积这么多块的立方体合并一次（避免每块都与越来越大的立方体合并）
+CUBE_MERGE_BATCH = 16
+
+# 分析阶段及其在界面上显示的名称
+STAGES = [
+    ('read', '读取数据'),
+    ('merge', '合并数据'),
+    ('profit', '计算盈亏'),
+    ('aggregate', '汇总结果'),
+    ('render', '显示结果'),
+]
+STAGE_LABELS = dict(STAGES)
+
+
+class AnalysisError(Exception):
+    """分析过程中的数据错误"""
+
+
+class MissingColumnsError(AnalysisError):
+    """数据表中缺少必要的列"""
+
+    def __init__(self, missing_columns, order_df, operator_df, cost_df):
+        self.missing_columns = missing_columns
+        message = ("数据表中缺少必要的列:\n\n" + "\n".join(missing_columns) +
+                   f"\n\n订单表列名: {', '.join(map(str, order_df.columns))}" +
+                   f"\n运营对照表列名: {', '.join(map(str, operator_df.columns))}" +
+                   f"\n成本对照表列名: {', '.join(map(str, cost_df.columns))}")
+        super().__init__(message)
+
+
+class TableLoadError(AnalysisError):
+    """一个或多个数据文件读取失败；读取成功的数据表保存在 loaded 中"""
+
+    def __init__(self, errors, loaded, titles):
+        self.errors = errors
+        self.loaded = loaded
+        message = "\n".join(f"{titles[kind]}: {error}" for kind, error in errors.items())
+        super().__init__(f"以下数据文件读取失败:\n\n{message}\n\n请尝试更改CSV文件编码设置。")
+
+
+class AnalysisCancelled(Exception):
+    """分析被用户取消"""
+
+
+def check_cancelled(cancel_event):
+    """如果用户已请求取消则中止当前任务"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelled()
+
+
+def find_column(df, possible_names):
+    """在数据框中查找可能的列名"""
+    for name in possible_names:
+        if name in df.columns:
+            return name
+    return None
+
+
+def select_columns(kind, header):
+    """根据表头确定分析需要读取的列，返回 (列名列表, 按文本读取的列名列表)
+
+    与 resolve_columns 使用相同的候选列名；缺少必要列时返回 (None, ())，
+    即读取全部列，以便报错时能列出表中所有的列名。
+    """
+    header = list(header)
+    usecols = []
+    text_columns = []
+    for _, names, required, text in TABLE_COLUMNS[kind]:
+        column = next((name for name in names if name in header), None)
+        if column is None:
+            if required:
+                return None, ()
+            continue
+        if column not in usecols:
+            usecols.append(column)
+            if text:
+                text_columns.append(column)
+    return usecols, text_columns
+
+
+def as_paths(file_paths):
+    """订单表可以由多个文件组成：返回文件路径列表"""
+    if isinstance(file_paths, str):
+        return [file_paths]
+    return list(file_paths)
+
+
+def read_analysis_table(kind, file_path, encoding_setting='auto'):
+    """读取一张数据表（不使用本地缓存），只读取分析用到的列"""
+    usecols, text_columns = select_columns(kind, read_header(file_path, encoding_setting))
+    return read_table(file_path, encoding_setting, usecols=usecols, text_columns=text_columns)
+
+
+def resolve_columns(order_df, operator_df, cost_df):
+    """查找三张表中的必要列，缺少时抛出 MissingColumnsError"""
+    columns = {
+        'product_id': find_column(order_df, PRODUCT_ID_NAMES),
+        'product_code': find_column(order_df, PRODUCT_CODE_NAMES),
+        'status': find_column(order_df, STATUS_NAMES),
+        'amount': find_column(order_df, AMOUNT_NAMES),
+        'quantity': find_column(order_df, QUANTITY_NAMES),
+        'order_date': find_column(order_df, DATE_NAMES),
+        'operator_product_id': find_column(operator_df, PRODUCT_ID_NAMES),
+        'operator_product_code': find_column(operator_df, PRODUCT_CODE_NAMES),
+        'operator': find_column(operator_df, OPERATOR_NAMES),
+        'cost_product_code': find_column(cost_df, PRODUCT_CODE_NAMES),
+        'cost': find_column(cost_df, COST_NAMES),
+    }
+
+    # 检查必要的列是否存在
+    missing_columns = []
+    if not columns['product_id']:
+        missing_columns.append("订单表中缺少商品ID列")
+    if not columns['product_code']:
+        missing_columns.append("订单表中缺少商品编码列")
+    if not columns['status']:
+        missing_columns.append("订单表中缺少订单状态列")
+    if not columns['amount']:
+        missing_columns.append("订单表中缺少实收金额列")
+    if not columns['operator_product_id']:
+        missing_columns.append("运营对照表中缺少商品ID列")
+    if not columns['operator']:
+        missing_columns.append("运营对照表中缺少运营人员列")
+    if not columns['cost_product_code']:
+        missing_columns.append("成本对照表中缺少商品编码列")
+    if not columns['cost']:
+        missing_columns.append("成本对照表中缺少商品成本列")
+
+    if missing_columns:
+        raise MissingColumnsError(missing_columns, order_df, operator_df, cost_df)
+    return columns
+
+
+class AnalysisResult:
+    """一次分析的结果及统计信息"""
+
+    def __init__(self, result_df, merged_df, indexes, quantity_col,
+                 order_count, other_count, missing_cost_count, cube=None, duplicate_count=None):
+        self.result_df = result_df
+        # 运营人员 × 商品编码 × 日期 × 状态 的预聚合立方体，用于钻取分析
+        self.cube = cube
+        # 逐单明细（流式分析时不保留，为 None）
+        self.merged_df = merged_df
+        self.indexes = indexes
+        self.merge_on_operator = indexes.merge_on_operator
+        self.quantity_col = quantity_col
+        self.order_count = order_count
+        self.operator_duplicate_count = indexes.operator_duplicate_count
+        self.cost_duplicate_count = indexes.cost_duplicate_count
+        # 未匹配到运营人员 / 成本的订单数量
+        self.other_count = other_count
+        self.missing_cost_count = missing_cost_count
+        # 合并多个订单文件时去除的重复订单数（只有一个订单文件时为 None）
+        self.duplicate_count = duplicate_count
+        # 是否为从结果缓存中恢复的结果（此时 indexes 只包含合并信息）
+        self.from_cache = False
+
+    def warnings(self):
+        """需要提示用户的数据问题"""
+        messages = []
+        if self.operator_duplicate_count:
+            messages.append(
+                f"运营对照表中发现 {self.operator_duplicate_count} 条重复记录\n\n"
+                f"重复记录可能会导致分析结果不准确。\n"
+                f"建议清理运营对照表中的重复数据。\n\n"
+                f"程序已继续分析，但使用了第一条匹配记录。")
+        if self.cost_duplicate_count:
+            messages.append(
+                f"成本对照表中发现 {self.cost_duplicate_count} 条商品编码重复的记录\n\n"
+                f"程序已继续分析，每个商品编码使用第一条成本记录。")
+        if unparsed_dates(self.cube):
+            messages.append(
+                f"订单日期列中有 {unparsed_dates(self.cube)} 个值无法解析为日期\n\n"
+                f"这些订单在按日期钻取时归入日期缺失的一组，盈亏汇总不受影响。")
+        return messages
+
+    def status_message(self):
+        """分析完成后在状态栏显示的信息"""
+        # 显示合并方式信息
+        merge_info = f"合并方式: 订单表与运营对照表按 {self.merge_on_operator} 合并"
+        if len(self.merge_on_operator) == 2:
+            merge_info += " (商品ID+商品编码)"
+        else:
+            merge_info += " (仅商品ID)"
+
+        # 检查是否使用了商品数量
+        if self.quantity_col:
+            quantity_info = f" - 已使用商品数量列: {self.quantity_col}"
+        else:
+            quantity_info = " - 未找到商品数量列，默认数量为1"
+
+        duplicate_info = ""
+        if self.duplicate_count is not None:
+            duplicate_info = f" - 去除重复订单: {self.duplicate_count} 条"
+
+        return (f"分析完成 - {merge_info} - 未匹配运营的订单: {self.other_count} 条"
+                f" - 未匹配成本的订单: {self.missing_cost_count} 条{duplicate_info}{quantity_info}")
+
+
+def format_summary(summary):
+    """将按运营人员的汇总结果整理为显示/导出用的表格"""
+    # 重命名列以匹配显示
+    result = summary.rename(columns={
+        '运营人员': '运营',
+        '待确认盈利总额': '待确认盈利'
+    })
+
+    # 对数值列进行格式化
+    result['总盈亏'] = result['总盈亏'].round(2)
+    result['待确认盈利'] = result['待确认盈利'].round(2)
+    result['平均每单盈亏'] = result['平均每单盈亏'].round(2)
+
+    # 按总盈亏排序，但将"其他"放在最后
+    result['排序权重'] = result['运营'].apply(lambda x: 0 if x == '其他' else 1)
+    return result.sort_values(['排序权重', '总盈亏'], ascending=[False, False]).drop('排序权重', axis=1)
+
+
+class JoinIndexes:
+    """由运营对照表和成本对照表建立的查找索引，可在多次分析之间复用"""
+
+    def __init__(self, operator_index, cost_index, merge_on_operator):
+        self.operator_index = operator_index
+        self.cost_index = cost_index
+        self.merge_on_operator = merge_on_operator
+
+    @property
+    def operator_duplicate_count(self):
+        return self.operator_index.duplicate_count
+
+    @property
+    def cost_duplicate_count(self):
+        return self.cost_index.duplicate_count
+
+
+class JoinSummary:
+    """不含查找索引的合并信息，用于从缓存或订单库恢复的结果"""
+
+    def __init__(self, merge_on_operator, operator_duplicate_count, cost_duplicate_count):
+        self.merge_on_operator = merge_on_operator
+        self.operator_duplicate_count = operator_duplicate_count
+        self.cost_duplicate_count = cost_duplicate_count
+
+
+def build_operator_index(operator_df, columns):
+    """统一运营对照表列名并建立 (商品ID[+商品编码]) → 运营人员 的查找索引
+
+    返回 (索引, 匹配键)。
+    """
+    # 检查运营对照表是否有商品编码列
+    if columns['operator_product_code']:
+        operator_df = operator_df.rename(columns={
+            columns['operator_product_id']: '商品ID',
+            columns['operator_product_code']: '商品编码',
+            columns['operator']: '运营人员'
+        })
+        # 如果运营对照表有商品编码，则使用商品ID+商品编码进行匹配
+        merge_on_operator = ['商品ID', '商品编码']
+    else:
+        operator_df = operator_df.rename(columns={
+            columns['operator_product_id']: '商品ID',
+            columns['operator']: '运营人员'
+        })
+        # 如果运营对照表没有商品编码，则只使用商品ID进行匹配
+        merge_on_operator = ['商品ID']
+    return LookupIndex.build(operator_df, merge_on_operator, '运营人员'), merge_on_operator
+
+
+def build_cost_index(cost_df, columns):
+    """统一成本对照表列名并建立 商品编码 → 商品成本 的查找索引"""
+    cost_df = cost_df.rename(columns={
+        columns['cost_product_code']: '商品编码',
+        columns['cost']: '商品成本'
+    })
+    return LookupIndex.build(cost_df, ['商品编码'], '商品成本')
+
+
+def build_join_indexes(operator_df, cost_df, columns):
+    """建立两张对照表的查找索引，重复记录在这里去除（保留第一条）并计数"""
+    operator_index, merge_on_operator = build_operator_index(operator_df, columns)
+    return JoinIndexes(operator_index, build_cost_index(cost_df, columns), merge_on_operator)
+
+
+def normalize_orders(order_df, columns):
+    """统一订单表的列名，没有商品数量列时补充默认数量1
+
+    只复制列索引而不复制数据，新增或替换的列不会影响传入的订单表。
+    """
+    renames = {
+        columns['product_id']: '商品ID',
+        columns['product_code']: '商品编码',
+        columns['status']: '订单状态',
+        columns['amount']: '实收金额'
+    }
+    # 如果订单表有商品数量列，则重命名；如果没有，则添加一列，值为1
+    quantity_col = columns['quantity']
+    if quantity_col:
+        renames[quantity_col] = '商品数量'
+    if columns.get('order_date'):
+        renames[columns['order_date']] = '订单日期'
+    order_df = order_df.copy(deep=False)
+    order_df.columns = [renames.get(column, column) for column in order_df.columns]
+
+    if quantity_col:
+        # 确保商品数量是数值类型
+        order_df['商品数量'] = pd.to_numeric(order_df['商品数量'], errors='coerce').fillna(1)
+    else:
+        order_df['商品数量'] = 1
+    return order_df
+
+
+def merge_orders(order_df, indexes):
+    """按查找索引为订单补充运营人员和商品成本，输出行数与订单行数相同"""
+    return merge_lookups(order_df, lookup_operators(order_df, indexes.operator_index),
+                         indexes.cost_index.lookup(order_df))
+
+
+def merge_lookups(order_df, operators, costs):
+    """把按订单对齐的运营人员和商品成本加到订单表上（不修改传入的订单表）"""
+    merged_df = order_df.copy(deep=False)
+    merged_df['运营人员'] = operators
+    merged_df['商品成本'] = costs
+    return merged_df
+
+
+def lookup_operators(order_df, operator_index):
+    """查找每个订单的运营人员，找不到的归类为其他"""
+    return pd.Series(operator_index.lookup(order_df), index=order_df.index).fillna('其他')
+
+
+def add_profit_columns(merged_df):
+    """为合并后的订单添加状态分类、盈亏和待确认盈利列"""
+    # 对订单状态只分类一次，盈亏计算和汇总共用同一分类列
+    merged_df['状态分类'] = classify_statuses(merged_df['订单状态'])
+
+    # 根据订单状态计算盈亏和待确认盈利（整表向量化计算）
+    merged_df['盈亏'], merged_df['待确认盈利'] = compute_profit(merged_df)
+    return merged_df
+
+
+def count_unmatched(merged_df):
+    """统计未匹配到运营人员和未匹配到成本的订单数"""
+    other_count = int((merged_df['运营人员'] == '其他').sum())
+    missing_cost_count = int(merged_df['商品成本'].isna().sum())
+    return other_count, missing_cost_count
+
+
+def run_analysis(order_df, operator_df, cost_df, progress=None, cancel_event=None, indexes=None,
+                 profiler=None):
+    """合并三张表、计算盈亏并按运营人员汇总
+
+    传入的数据表不会被修改。progress(stage) 在每个阶段开始时调用，
+    cancel_event 被设置后会在阶段之间抛出 AnalysisCancelled。
+    indexes 为之前由同样的对照表建立的 JoinIndexes 时直接复用。
+    profiler 为 RunProfiler 时记录每个阶段的耗时和行数。
+    """
+    report = progress or (lambda stage: None)
+    columns = resolve_columns(order_df, operator_df, cost_df)
+
+    check_cancelled(cancel_event)
+    report('merge')
+    with timed_stage(profiler, 'merge', STAGE_LABELS['merge'], len(order_df)) as timing:
+        order_df = normalize_orders(order_df, columns)
+        if indexes is None:
+            indexes = build_join_indexes(operator_df, cost_df, columns)
+        merged_df = merge_orders(order_df, indexes)
+        timing.rows_out = len(merged_df)
+
+    check_cancelled(cancel_event)
+    report('profit')
+    with timed_stage(profiler, 'profit', STAGE_LABELS['profit'], len(merged_df)) as timing:
+        add_profit_columns(merged_df)
+        timing.rows_out = len(merged_df)
+
+    check_cancelled(cancel_event)
+    report('aggregate')
+    with timed_stage(profiler, 'aggregate', STAGE_LABELS['aggregate'], len(merged_df)) as timing:
+        # 基于状态分类编码一次分组计算各种指标
+        result_df = format_summary(summarize_by_operator(merged_df))
+        timing.rows_out = len(result_df)
+    with timed_stage(profiler, 'cube', "汇总立方体", len(merged_df)) as timing:
+        cube = build_cube(merged_df)
+        timing.rows_out = len(cube)
+
+    return AnalysisResult(result_df, merged_df, indexes, columns['quantity'],
+                          len(order_df), *count_unmatched(merged_df), cube=cube)
+
+
+def _iter_order_chunks(order_paths, encoding_setting, chunksize, profiler, dedup):
+    """依次分块读取各订单文件；dedup 不为空时去除后面的文件中与前面重复的订单"""
+    for order_path in order_paths:
+        # 只读取分析用到的列
+        with timed_stage(profiler, 'sniff_header', "读取表头"):
+            usecols, text_columns = select_columns('order', read_header(order_path, encoding_setting))
+        chunks = iter_table_chunks(order_path, encoding_setting, chunksize, usecols, text_columns)
+        if dedup is not None:
+            dedup.start_file()
+        while True:
+            with timed_stage(profiler, 'read', STAGE_LABELS['read']) as timing:
+                chunk = next(chunks, None)
+                timing.rows_out = None if chunk is None else len(chunk)
+            if chunk is None:
+                break
+            if dedup is not None:
+                with timed_stage(profiler, 'dedup', "去除重复订单", len(chunk)) as timing:
+                    chunk = dedup.filter(chunk)
+                    timing.rows_out = len(chunk)
+            yield chunk
+
+
+def iter_merged_chunks(order_path, operator_df, cost_df, encoding_setting='auto',
+                       chunksize=DEFAULT_CHUNK_SIZE, progress=None, cancel_event=None,
+                       indexes=None, profiler=None, dedup=None):
+    """分块读取订单文件，逐块合并并计算盈亏，生成 (逐单明细块, 列映射, 查找索引)
+
+    order_path 可以是多个订单文件，依次读取；dedup 为 dedup.Deduplicator 时去除重复订单。
+    progress(stage, rows_done) 报告当前阶段和已处理的订单行数。
+    CSV 边读取边校验编码，解码失败时从失败的位置起切换编码，无需重新读取。
+    """
+    report = progress or (lambda stage, rows_done=None: None)
+    columns = None
+    rows_done = 0
+
+    for chunk in _iter_order_chunks(as_paths(order_path), encoding_setting, chunksize, profiler, dedup):
+        check_cancelled(cancel_event)
+        if not len(chunk):
+            continue
+        if columns is None:
+            # 用第一块的列名查找必要列，对照表的查找索引只建立一次
+            columns = resolve_columns(chunk, operator_df, cost_df)
+            if indexes is None:
+                with timed_stage(profiler, 'index', "对照表索引", len(operator_df) + len(cost_df)):
+                    indexes = build_join_indexes(operator_df, cost_df, columns)
+
+        report('merge', rows_done)
+        with timed_stage(profiler, 'merge', STAGE_LABELS['merge'], len(chunk)) as timing:
+            merged_df = merge_orders(normalize_orders(chunk, columns), indexes)
+            timing.rows_out = len(merged_df)
+        report('profit', rows_done)
+        with timed_stage(profiler, 'profit', STAGE_LABELS['profit'], len(merged_df)) as timing:
+            add_profit_columns(merged_df)
+            timing.rows_out = len(merged_df)
+        yield merged_df, columns, indexes
+        rows_done += len(chunk)
+
+    if columns is None:
+        raise AnalysisError(f"订单文件 {', '.join(as_paths(order_path))} 中没有数据")
+
+
+def run_streaming_analysis(order_path, operator_df, cost_df, encoding_setting='auto',
+                           chunksize=DEFAULT_CHUNK_SIZE, progress=None, cancel_event=None,
+                           indexes=None, profiler=None, dedup=None):
+    """分块读取订单文件并逐块合并、计算盈亏，累加各运营人员的部分汇总
+
+    峰值内存只与块大小有关，结果与 run_analysis 一致（不保留逐单明细）。
+    order_path 为多个订单文件时依次读取，dedup 为 dedup.Deduplicator 时去除文件之间重复的订单。
+    progress(stage, rows_done) 报告当前阶段和已处理的订单行数。
+    profiler 为 RunProfiler 时按阶段累计所有块的耗时和行数。
+    """
+    report = progress or (lambda stage, rows_done=None: None)
+    partial = None
+    cubes = []
+    order_count = other_count = missing_cost_count = 0
+
+    for merged_df, columns, indexes in iter_merged_chunks(order_path, operator_df, cost_df,
+                                                          encoding_setting, chunksize, progress,
+                                                          cancel_event, indexes, profiler, dedup):
+        report('aggregate', order_count)
+        with timed_stage(profiler, 'aggregate', STAGE_LABELS['aggregate'], len(merged_df)):
+            partial = combine_partials([partial, partial_summary(merged_df)])
+        with timed_stage(profiler, 'cube', "汇总立方体", len(merged_df)):
+            cubes.append(build_cube(merged_df))
+            if len(cubes) >= CUBE_MERGE_BATCH:
+                cubes = [combine_cubes(cubes)]
+
+        order_count += len(merged_df)
+        chunk_other, chunk_missing = count_unmatched(merged_df)
+        other_count += chunk_other
+        missing_cost_count += chunk_missing
+
+    result_df = format_summary(finalize_summary(partial))
+    with timed_stage(profiler, 'cube', "汇总立方体"):
+        cube = combine_cubes(cubes)
+    return AnalysisResult(result_df, None, indexes, columns['quantity'],
+                          order_count, other_count, missing_cost_count, cube=cube,
+                          duplicate_count=None if dedup is None else dedup.removed)
@@ -0,0 +1,553 @@
+"""本机分析服务（HTTP/JSON）：多个用户共用内存中的数据表，分析任务在有界的工作线程池中排队执行
+
+    POST   /jobs               提交分析 {"paths": {"order", "operator", "cost"}, "encoding", "compact"}
+    GET    /jobs/<id>          任务状态，完成后包含结果
+    GET    /jobs/<id>/events   逐行返回 JSON 事件（排队位置、分析阶段），最后一行为结果、错误或取消
+    DELETE /jobs/<id>          取消任务
+    GET    /status             工作线程数、排队和执行中的任务数、内存中的数据表个数
+
+文件路径是服务所在机器上的路径（如共享盘上的文件）。排队的任务已满时提交返回 503。
+启动服务时指定 --token 后，请求需要带 “Authorization: Bearer <token>” 请求头；
+界面从环境变量 PROFIT_SERVICE_TOKEN 读取令牌。默认只监听本机地址，监听其他地址时必须指定令牌。
+"""
+import argparse
+import hmac
+import http.client
+import ipaddress
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analysis import AnalysisCancelled, AnalysisError, AnalysisResult, JoinSummary, check_cancelled
+from pipeline import AnalysisPipeline
+from shared_tables import KINDS, SharedTables
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+DEFAULT_WORKERS = 2
+# 排队等待的任务数上限
+DEFAULT_MAX_QUEUE = 16
+# 保留的已结束任务个数（供之后查询结果）
+FINISHED_JOBS_KEPT = 100
+# 事件流中没有新事件时发送排队位置的间隔（秒），客户端借此检查是否取消
+HEARTBEAT_INTERVAL = 0.5
+
+TOKEN_ENV = 'PROFIT_SERVICE_TOKEN'
+
+FINISHED_STATES = ('done', 'error', 'cancelled')
+
+
+class ServiceError(Exception):
+    """无法连接分析服务，或服务拒绝了请求"""
+
+
+class ServiceBusy(ServiceError):
+    """排队的任务已满"""
+
+
+def _plain(value):
+    """numpy 标量转换为 JSON 可以表示的 Python 值"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def frame_to_json(df):
+    """按列转换数据表，缺失值为 null，日期为 ISO 格式字符串，并记录各列类型和行索引"""
+    data = []
+    for column in df.columns:
+        values = df[column]
+        missing = values.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = values.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        items = values.tolist()
+        for i in np.flatnonzero(missing):
+            items[i] = None
+        data.append(items)
+    payload = {'columns': [str(c) for c in df.columns], 'dtypes': [str(t) for t in df.dtypes], 'data': data}
+    # 默认的 0..n-1 行索引不需要记录
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        payload['index'] = [_plain(v) for v in df.index]
+    if df.attrs:
+        payload['attrs'] = {str(k): _plain(v) for k, v in df.attrs.items()}
+    return payload
+
+
+def frame_from_json(payload):
+    """frame_to_json 的逆转换"""
+    frame = {}
+    for column, dtype, items in zip(payload['columns'], payload['dtypes'], payload['data']):
+        if dtype.startswith('datetime64'):
+            frame[column] = pd.to_datetime(pd.Series(items, dtype=object)).astype(dtype)
+            continue
+        try:
+            frame[column] = pd.Series(items, dtype=object).astype(dtype)
+        except (TypeError, ValueError):
+            frame[column] = pd.Series(items, dtype=object)
+    df = pd.DataFrame(frame, columns=payload['columns'])
+    if 'index' in payload:
+        df.index = payload['index']
+    df.attrs.update(payload.get('attrs', {}))
+    return df
+
+
+def result_to_json(result):
+    return {
+        'result_df': frame_to_json(result.result_df),
+        'cube': None if result.cube is None else frame_to_json(result.cube),
+        'quantity_col': result.quantity_col,
+        'order_count': _plain(result.order_count),
+        'other_count': _plain(result.other_count),
+        'missing_cost_count': _plain(result.missing_cost_count),
+        'merge_on_operator': list(result.merge_on_operator),
+        'operator_duplicate_count': _plain(result.operator_duplicate_count),
+        'cost_duplicate_count': _plain(result.cost_duplicate_count),
+        'duplicate_count': _plain(result.duplicate_count),
+    }
+
+
+def result_from_json(payload):
+    """还原为 AnalysisResult（不含逐单明细，indexes 只包含合并信息）"""
+    join = JoinSummary(payload['merge_on_operator'], payload['operator_duplicate_count'],
+                       payload['cost_duplicate_count'])
+    cube = None if payload['cube'] is None else frame_from_json(payload['cube'])
+    return AnalysisResult(frame_from_json(payload['result_df']), None, join, payload['quantity_col'],
+                          payload['order_count'], payload['other_count'], payload['missing_cost_count'],
+                          cube=cube, duplicate_count=payload['duplicate_count'])
+
+
+class Job:
+    """一个分析任务；事件按顺序记录，事件流从任意位置读取"""
+
+    def __init__(self, job_id, paths, encoding_setting='auto', compact=False):
+        self.id = job_id
+        self.paths = paths
+        self.encoding_setting = encoding_setting
+        self.compact = compact
+        self.state = 'queued'
+        self.submitted = time.monotonic()
+        self.started = None
+        self.events = []
+        self.outcome = None
+        self.cancel_event = threading.Event()
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def emit(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def start(self):
+        self.started = time.monotonic()
+        self.state = 'running'
+        self.emit({'event': 'started', 'queued_seconds': round(self.started - self.submitted, 3)})
+
+    def progress(self, stage, rows_done=None):
+        self.emit({'event': 'progress', 'stage': stage, 'rows_done': rows_done})
+        check_cancelled(self.cancel_event)
+
+    def finish(self, state, **fields):
+        with self.condition:
+            self.state = state
+            self.outcome = dict(fields, event=state)
+            if self.started is not None:
+                self.outcome['queued_seconds'] = round(self.started - self.submitted, 3)
+            self.events.append(self.outcome)
+            self.condition.notify_all()
+
+    def wait_events(self, start, timeout):
+        """返回从 start 开始的新事件（等待最多 timeout 秒）"""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.events) > start, timeout)
+            return self.events[start:]
+
+    def to_dict(self, position=None):
+        info = {'id': self.id, 'state': self.state}
+        if position:
+            info['position'] = position
+        if self.outcome is not None:
+            info.update(self.outcome)
+            del info['event']
+        return info
+
+
+class AnalysisService:
+    """共用一份内存数据表的分析任务队列
+
+    workers 个工作线程各自持有一个 AnalysisPipeline，排队的任务超过 max_queue 时拒绝新任务。
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, tables=None):
+        self.tables = tables if tables is not None else SharedTables()
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._pending = []
+        self._running = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, paths, encoding_setting='auto', compact=False):
+        """加入队列并返回任务，队列已满时抛出 ServiceBusy"""
+        if not isinstance(paths, dict) or any(kind not in paths for kind in KINDS):
+            raise ValueError("paths 需要包含 order、operator、cost 三个文件路径")
+        paths = {kind: paths[kind] for kind in KINDS}
+        # 订单文件可以是多个路径组成的列表，其余只能是一个路径
+        if isinstance(paths['order'], (list, tuple)):
+            if not paths['order'] or not all(isinstance(path, str) for path in paths['order']):
+                raise ValueError("order 需要是文件路径或非空的文件路径列表")
+            paths['order'] = tuple(paths['order'])
+        for kind in KINDS:
+            if not isinstance(paths[kind], (str, tuple)):
+                raise ValueError(f"{kind} 需要是文件路径")
+        if not isinstance(encoding_setting, str):
+            raise ValueError("encoding 需要是字符串")
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                raise ServiceBusy(f"分析服务繁忙：已有 {len(self._pending)} 个任务在排队")
+            job = Job(str(next(self._ids)), paths, encoding_setting, compact)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """任务在队列中的位置（1 为下一个执行），不在排队时为 None"""
+        with self._lock:
+            return self._pending.index(job) + 1 if job in self._pending else None
+
+    def cancel(self, job):
+        """取消任务：排队中的立即结束，执行中的在下一个阶段开始前停止"""
+        job.cancel_event.set()
+        with self._lock:
+            if job not in self._pending:
+                return
+            self._pending.remove(job)
+        job.finish('cancelled')
+
+    def status(self):
+        with self._lock:
+            return {'workers': len(self._threads), 'queued': len(self._pending), 'running': self._running,
+                    'max_queue': self.max_queue, 'tables': len(self.tables)}
+
+    def stop(self):
+        """工作线程在完成当前任务后退出"""
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _work(self):
+        pipeline = AnalysisPipeline()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job not in self._pending:
+                    # 排队时已取消
+                    continue
+                self._pending.remove(job)
+                self._running += 1
+            try:
+                self._run(job, pipeline)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _run(self, job, pipeline):
+        job.start()
+        try:
+            result, reused = self.tables.analyze(pipeline, job.paths, job.encoding_setting, job.compact,
+                                                 progress=job.progress, cancel_event=job.cancel_event)
+        except AnalysisCancelled:
+            job.finish('cancelled')
+        except AnalysisError as e:
+            job.finish('error', error=str(e), analysis_error=True)
+        except Exception as e:
+            job.finish('error', error=str(e), analysis_error=False)
+        else:
+            job.finish('done', result=result_to_json(result), reused_tables=reused)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理；服务对象和令牌在 server 上"""
+
+    server_version = 'ProfitAnalysisService/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = self.server.token
+        # 固定时间比较，响应时间不泄露令牌前缀是否正确；按字节比较以便请求头含非 ASCII 字符
+        received = self.headers.get('Authorization', '').encode()
+        if token and not hmac.compare_digest(received, f"Bearer {token}".encode()):
+            self._send_json(401, {'error': "令牌无效"})
+            return False
+        return True
+
+    def _job(self, parts):
+        job = self.server.service.get(parts[1])
+        if job is None:
+            self._send_json(404, {'error': f"任务不存在: {parts[1]}"})
+        return job
+
+    def _parts(self):
+        return [part for part in urlsplit(self.path).path.split('/') if part]
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        service = self.server.service
+        if parts == ['status']:
+            self._send_json(200, service.status())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job(parts)
+            if job is not None:
+                self._send_json(200, job.to_dict(service.position(job)))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            job = self._job(parts)
+            if job is not None:
+                self._stream_events(job)
+        else:
+            self._send_json(404, {'error': "未知的地址"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self._parts() != ['jobs']:
+            self._send_json(404, {'error': "未知的地址"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            job = self.server.service.submit(request.get('paths'), request.get('encoding', 'auto'),
+                                             bool(request.get('compact', False)))
+        except ServiceBusy as e:
+            self._send_json(503, {'error': str(e)})
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {'error': str(e)})
+        else:
+            self._send_json(202, {'id': job.id, 'position': self.server.service.position(job)})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send_json(404, {'error': "未知的地址"})
+            return
+        job = self._job(parts)
+        if job is not None:
+            self.server.service.cancel(job)
+            self._send_json(200, job.to_dict())
+
+    def _stream_events(self, job):
+        """逐行写出事件直到任务结束；连接在最后一个事件后关闭"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+        sent = 0
+        try:
+            while True:
+                events = job.wait_events(sent, HEARTBEAT_INTERVAL)
+                sent += len(events)
+                if not events:
+                    events = [{'event': 'queued' if job.state == 'queued' else 'heartbeat',
+                               'position': self.server.service.position(job)}]
+                for event in events:
+                    self.wfile.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+                self.wfile.flush()
+                if events[-1]['event'] in FINISHED_STATES:
+                    return
+        except OSError:
+            # 客户端断开连接，任务照常执行
+            pass
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, token=None, verbose=False):
+        super().__init__(address, ServiceHandler)
+        self.service = service
+        self.token = token
+        self.verbose = verbose
+
+
+class ServiceClient:
+    """分析服务的客户端，analyze() 与 WarmClient.analyze() 的用法相同"""
+
+    def __init__(self, url=DEFAULT_URL, token=None, timeout=10):
+        parts = urlsplit(url if '://' in url else f"http://{url}")
+        if not parts.hostname:
+            raise ServiceError(f"分析服务地址无效: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+
+    def _open(self, method, path, payload=None):
+        headers = {}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            return conn, conn.getresponse()
+        except OSError as e:
+            conn.close()
+            raise ServiceError(f"无法连接分析服务 {self.host}:{self.port}: {e}")
+
+    def _request(self, method, path, payload=None):
+        conn, response = self._open(method, path, payload)
+        try:
+            data = json.loads(response.read() or b'{}')
+        except (OSError, ValueError) as e:
+            raise ServiceError(f"分析服务的响应无效: {e}")
+        finally:
+            conn.close()
+        if response.status == 503:
+            raise ServiceBusy(data.get('error', "分析服务繁忙"))
+        if response.status >= 400:
+            raise ServiceError(data.get('error', f"分析服务返回 {response.status}"))
+        return data
+
+    def status(self):
+        return self._request('GET', '/status')
+
+    def submit(self, paths, encoding_setting='auto', compact=False):
+        """提交任务，返回任务编号"""
+        return self._request('POST', '/jobs', {'paths': paths, 'encoding': encoding_setting,
+                                               'compact': compact})['id']
+
+    def job(self, job_id):
+        return self._request('GET', f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f"/jobs/{job_id}")
+
+    def events(self, job_id):
+        """逐个返回任务的事件，直到任务结束"""
+        conn, response = self._open('GET', f"/jobs/{job_id}/events")
+        try:
+            if response.status != 200:
+                raise ServiceError(f"分析服务返回 {response.status}")
+            while True:
+                try:
+                    line = response.readline()
+                except OSError as e:
+                    raise ServiceError(f"与分析服务的连接中断: {e}")
+                if not line:
+                    raise ServiceError("与分析服务的连接中断")
+                event = json.loads(line)
+                yield event
+                if event['event'] in FINISHED_STATES:
+                    return
+        finally:
+            conn.close()
+
+    def analyze(self, paths, encoding_setting='auto', compact=False, progress=None, cancel_event=None):
+        """在服务中分析，返回 (结果, 状态栏说明)；cancel_event 被设置时取消服务中的任务"""
+        check_cancelled(cancel_event)
+        job_id = self.submit(paths, encoding_setting, compact)
+        for event in self.events(job_id):
+            if cancel_event is not None and cancel_event.is_set():
+                self.cancel(job_id)
+                raise AnalysisCancelled()
+            kind = event['event']
+            if kind == 'progress' and progress is not None:
+                if event['rows_done'] is None:
+                    progress(event['stage'])
+                else:
+                    progress(event['stage'], event['rows_done'])
+            elif kind == 'done':
+                note = f"分析服务 (复用内存中的数据表 {event['reused_tables']}/3"
+                if event.get('queued_seconds', 0) >= 0.1:
+                    note += f", 排队 {event['queued_seconds']:.1f}s"
+                return result_from_json(event['result']), note + ")"
+            elif kind == 'error':
+                if event['analysis_error']:
+                    raise AnalysisError(event['error'])
+                raise RuntimeError(event['error'])
+            elif kind == 'cancelled':
+                raise AnalysisCancelled()
+        raise ServiceError("分析服务没有返回结果")
+
+
+def is_loopback(host):
+    """监听地址是否只允许本机访问"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="订单盈亏分析服务")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址（默认只允许本机访问）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="同时执行的分析任务数")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="排队任务数上限")
+    parser.add_argument('--token', default=os.environ.get(TOKEN_ENV), help="访问令牌")
+    parser.add_argument('--verbose', action='store_true', help="输出每个请求的日志")
+    args = parser.parse_args(argv)
+    if not is_loopback(args.host) and not args.token:
+        parser.error(f"监听 {args.host or '所有地址'} 时其他机器也能访问，"
+                     f"需要用 --token 或环境变量 {TOKEN_ENV} 指定访问令牌")
+    service = AnalysisService(args.workers, args.max_queue)
+    server = ServiceServer((args.host, args.port), service, token=args.token, verbose=args.verbose)
+    print(f"分析服务已启动: http://{args.host}:{server.server_address[1]} "
+          f"(工作线程 {args.workers} 个，排队上限 {args.max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
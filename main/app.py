@@ -0,0 +1,1077 @@
+"""订单盈亏分析工具的主界面（由 main.py 在窗口显示后导入）"""
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import os
+
+from analysis import (
+    STAGES, STAGE_LABELS, AnalysisError, TableLoadError, as_paths, iter_merged_chunks,
+    run_streaming_analysis, select_columns
+)
+from analysis_service import DEFAULT_URL, TOKEN_ENV, ServiceClient, ServiceError
+from data_table import DataTable
+from dedup import DUPLICATE_COUNT_ATTR, Deduplicator, combine_order_frames
+from detail_export import iter_frame_chunks, write_detail
+from drilldown import DrilldownWindow
+from compact import compact_table, format_bytes, memory_bytes
+from instrumentation import RunProfiler
+from loaders import read_header, read_table
+from parallel import run_parallel_analysis
+from pipeline import AnalysisPipeline
+from order_store import OrderStore, run_store_analysis
+from result_cache import ResultCache, changed_tables, result_key, source_fingerprints
+from scenario_window import ScenarioWindow
+from scenarios import comparison_table, evaluate_scenarios, groups_from_chunks
+from table_cache import FINGERPRINT_ATTR, TableCache
+from warm_process import WarmClient, WarmProcessError, read_state
+from worker import BackgroundTask, run_concurrently
+
+# 预览区显示的行数
+PREVIEW_ROWS = 20
+
+# 选择多个订单文件时在路径框中分隔各文件
+ORDER_PATH_SEPARATOR = ' | '
+
+
+def describe_paths(paths):
+    """状态栏显示的文件名（多个文件时显示文件数）"""
+    paths = as_paths(paths)
+    if len(paths) == 1:
+        return os.path.basename(paths[0])
+    return f"{os.path.basename(paths[0])} 等 {len(paths)} 个文件"
+
+class OrderAnalysisApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("订单盈亏分析工具 (支持CSV/Excel)")
+        self.root.geometry("1100x750")
+        
+        # 存储数据
+        self.order_df = None
+        self.operator_df = None
+        self.cost_df = None
+        self.result_df = None
+        # 最近一次分析的逐单明细（流式/多核分析和缓存结果不保留，为 None）及其 (文件路径, 编码设置)
+        self.detail_df = None
+        self.detail_source = None
+        # 最近一次分析的汇总立方体（运营人员 × 商品编码 × 日期 × 状态），钻取分析只查询它
+        self.cube = None
+        # 成本情景计算用的 运营人员 × 商品编码 分组系数（第一次计算情景时生成）
+        self.scenario_groups = None
+        
+        # 解析后数据表的本地缓存
+        self.table_cache = TableCache()
+        
+        # 分析结果缓存：输入文件、编码、列映射和计算规则都未变化时直接显示上次的结果
+        self.result_cache = ResultCache()
+        self.order_store = None
+        
+        # 分阶段缓存的分析流程（只改了某张表时只重新计算受影响的阶段）
+        self.pipeline = AnalysisPipeline()
+        
+        # 常驻后台分析进程的客户端（数据表保留在后台进程的内存中，多次启动界面时复用）
+        self.warm_client = WarmClient()
+        self.warm_task = None
+        
+        # 上次分析建立的对照表查找索引：(运营对照表, 成本对照表, 索引)，对照表不变时复用
+        self.join_indexes = None
+        
+        # 后台任务（预览和完整加载任务按数据表类型分别记录）
+        self.preview_tasks = {}
+        self.load_tasks = {}
+        # 完整加载任务使用的 (文件, 编码设置, 紧凑模式)，分析时设置相同才复用
+        self.load_settings = {}
+        self.analysis_task = None
+        self.export_task = None
+        self.scenario_task = None
+        # 多个订单文件合并时已出现的订单指纹（追加文件时只计算新文件的指纹）
+        self.order_dedup = None
+        
+        # 创建界面
+        self.create_widgets()
+    
+    def create_widgets(self):
+        # 主框架
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # 配置网格权重，使界面可调整大小
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        
+        # 标题
+        title_label = ttk.Label(main_frame, text="订单盈亏分析工具 (支持CSV和Excel格式)", font=("Arial", 16, "bold"))
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
+        
+        # 文件选择区域
+        file_frame = ttk.LabelFrame(main_frame, text="数据文件 (支持.csv, .xlsx, .xls格式)", padding="10")
+        file_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        file_frame.columnconfigure(1, weight=1)
+        
+        # 订单表
+        ttk.Label(file_frame, text="订单表:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        self.order_file_var = tk.StringVar()
+        ttk.Entry(file_frame, textvariable=self.order_file_var, state='readonly').grid(row=0, column=1, sticky=(tk.W, tk.E))
+        ttk.Button(file_frame, text="选择文件", command=self.select_order_file).grid(row=0, column=2, padx=(10, 0))
+        # 追加的订单文件与已选择的合并，去除文件之间重复的订单
+        ttk.Button(file_frame, text="追加文件", command=self.append_order_files).grid(row=0, column=3, padx=(10, 0))
+        
+        # 运营对照表
+        ttk.Label(file_frame, text="运营对照表:").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.operator_file_var = tk.StringVar()
+        ttk.Entry(file_frame, textvariable=self.operator_file_var, state='readonly').grid(row=1, column=1, sticky=(tk.W, tk.E), pady=(10, 0))
+        ttk.Button(file_frame, text="选择文件", command=self.select_operator_file).grid(row=1, column=2, padx=(10, 0), pady=(10, 0))
+        
+        # 成本对照表
+        ttk.Label(file_frame, text="成本对照表:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.cost_file_var = tk.StringVar()
+        ttk.Entry(file_frame, textvariable=self.cost_file_var, state='readonly').grid(row=2, column=1, sticky=(tk.W, tk.E), pady=(10, 0))
+        ttk.Button(file_frame, text="选择文件", command=self.select_cost_file).grid(row=2, column=2, padx=(10, 0), pady=(10, 0))
+        
+        # 编码选择区域
+        encoding_frame = ttk.LabelFrame(main_frame, text="CSV文件编码设置 (如遇乱码请尝试不同编码)", padding="10")
+        encoding_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        ttk.Label(encoding_frame, text="CSV文件编码:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        self.encoding_var = tk.StringVar(value="auto")
+        encoding_combo = ttk.Combobox(encoding_frame, textvariable=self.encoding_var, 
+                                     values=["auto", "utf-8", "gbk", "gb2312", "latin1", "iso-8859-1"],
+                                     state="readonly", width=15)
+        encoding_combo.grid(row=0, column=1, sticky=tk.W)
+        ttk.Label(encoding_frame, text="(auto: 自动检测编码)").grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
+        
+        # 流式分析：订单表分块读取，适用于超过内存大小的订单文件
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(encoding_frame, text="大文件流式分析 (订单表分块读取，不保留逐单明细)",
+                        variable=self.streaming_var).grid(row=0, column=3, sticky=tk.W, padx=(20, 0))
+        
+        # 性能剖析：记录各阶段内存峰值，并保存最慢阶段的 cProfile 结果（会使运行变慢）
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(encoding_frame, text="性能剖析 (记录内存峰值和最慢阶段的cProfile)",
+                        variable=self.profile_var).grid(row=1, column=3, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        # 紧凑内存模式：加载后把重复的文本列转换为分类类型、缩小整数列类型
+        self.compact_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(encoding_frame, text="紧凑内存模式 (减少大表占用的内存)",
+                        variable=self.compact_var).grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # 多核并行分析：订单表按行分片，在多个进程中合并和计算盈亏，适用于很大的订单表
+        self.parallel_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(encoding_frame, text="多核并行分析 (大订单表分片到多个进程计算，不保留逐单明细)",
+                        variable=self.parallel_var).grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # 增量订单库：每次的订单文件作为一个批次追加到本地订单库，报告包含所有已导入的批次
+        self.store_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(encoding_frame, text="增量订单库 (订单文件追加到本地订单库，只计算新批次)",
+                        variable=self.store_var).grid(row=2, column=3, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        # 常驻后台分析进程：界面关闭后继续运行，上次启动时已开启则默认开启
+        self.warm_var = tk.BooleanVar(value=read_state() is not None)
+        ttk.Checkbutton(encoding_frame, text="常驻后台分析进程 (数据表保留在内存中，下次启动直接复用)",
+                        variable=self.warm_var, command=self.toggle_warm_process).grid(
+            row=3, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # 分析服务：由共用的本机/局域网分析服务读取数据表和计算，本程序只显示结果
+        service_frame = ttk.Frame(encoding_frame)
+        service_frame.grid(row=3, column=3, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        self.service_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(service_frame, text="使用分析服务:", variable=self.service_var).pack(side=tk.LEFT)
+        self.service_url_var = tk.StringVar(value=DEFAULT_URL)
+        ttk.Entry(service_frame, textvariable=self.service_url_var, width=24).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # 数据预览区域
+        preview_frame = ttk.LabelFrame(main_frame, text="数据预览", padding="10")
+        preview_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        preview_frame.columnconfigure(0, weight=1)
+        
+        # 创建Notebook用于切换预览不同文件
+        self.preview_notebook = ttk.Notebook(preview_frame)
+        self.preview_notebook.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        # 为每个文件类型创建预览框架
+        self.order_preview_frame = ttk.Frame(self.preview_notebook)
+        self.operator_preview_frame = ttk.Frame(self.preview_notebook)
+        self.cost_preview_frame = ttk.Frame(self.preview_notebook)
+        
+        self.preview_notebook.add(self.order_preview_frame, text="订单表预览")
+        self.preview_notebook.add(self.operator_preview_frame, text="运营对照表预览")
+        self.preview_notebook.add(self.cost_preview_frame, text="成本对照表预览")
+        
+        # 在每个预览框架中创建表格
+        self.order_preview_table = self.create_preview_table(self.order_preview_frame)
+        self.operator_preview_table = self.create_preview_table(self.operator_preview_frame)
+        self.cost_preview_table = self.create_preview_table(self.cost_preview_frame)
+        
+        # 订单状态计算规则说明
+        rule_frame = ttk.LabelFrame(main_frame, text="订单状态计算规则 (已支持商品数量)", padding="10")
+        rule_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        rules_text = """
+        • 已收货/已完成：盈亏 = 实收金额 - (商品成本 × 商品数量)
+        • 退货/退款：盈亏 = -(商品成本 × 商品数量) - 运费(如有)
+        • 已发货待收货：预计盈利 = 实收金额 - (商品成本 × 商品数量) (单独显示为待确认盈利)
+        • 待发货/待处理：盈亏 = 0 (不计算盈亏)
+        • 其他状态：盈亏 = 实收金额 - (商品成本 × 商品数量) (可根据需要调整)
+        • 如果订单表没有商品数量列，默认数量为1
+        • 如果成本表中未找到商品编码，该订单盈利记为0
+        """
+        rules_label = ttk.Label(rule_frame, text=rules_text, justify=tk.LEFT)
+        rules_label.grid(row=0, column=0, sticky=tk.W)
+        
+        # 操作按钮区域
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=5, column=0, columnspan=3, pady=(0, 10))
+        
+        self.analyze_button = ttk.Button(button_frame, text="分析数据", command=self.analyze_data)
+        self.analyze_button.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_button = ttk.Button(button_frame, text="取消分析", command=self.cancel_analysis, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="导出结果", command=self.export_results).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="导出逐单明细", command=self.export_detail).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="钻取分析", command=self.open_drilldown).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="成本情景", command=self.open_scenarios).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="清空数据", command=self.clear_data).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame, text="清空订单库", command=self.clear_order_store).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 分析进度
+        self.progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(button_frame, variable=self.progress_var, maximum=100, length=200).pack(side=tk.LEFT)
+        
+        # 结果显示区域
+        result_frame = ttk.LabelFrame(main_frame, text="分析结果", padding="10")
+        result_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        result_frame.columnconfigure(0, weight=1)
+        result_frame.rowconfigure(0, weight=1)
+        main_frame.rowconfigure(6, weight=1)
+        
+        # 创建表格用于显示结果（只显示可见的行，点击表头排序）
+        count_columns = ["订单总数", "已收货订单", "退货订单", "已发货待收货"]
+        money_columns = ["总盈亏", "待确认盈利", "平均每单盈亏"]
+        formatters = {col: lambda v: int(v) for col in count_columns}
+        formatters.update({col: lambda v: f"¥{v:.2f}" for col in money_columns})
+        widths = {"运营": 120}
+        widths.update({col: 80 for col in count_columns})
+        self.result_table = DataTable(result_frame, height=15, formatters=formatters, column_widths=widths)
+        self.result_table.set_columns(["运营"] + count_columns + money_columns)
+        self.result_table.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # 双击某个运营人员打开该运营人员的钻取分析
+        self.result_table.tree.bind('<Double-1>', lambda event: self.open_drilldown(selected=True))
+        
+        # 状态栏
+        self.status_var = tk.StringVar(value="准备就绪 - 请选择数据文件")
+        status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
+        status_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E))
+    
+    def create_preview_table(self, parent):
+        """创建用于预览数据的表格"""
+        table = DataTable(parent, height=6)
+        table.pack(fill=tk.BOTH, expand=True)
+        return table
+    
+    def preview_data(self, df, table, title):
+        """在预览区域显示数据（只显示前20行）"""
+        if df is not None and not df.empty:
+            table.set_data(df.head(PREVIEW_ROWS))
+        else:
+            table.clear()
+    
+    def select_order_file(self):
+        filenames = filedialog.askopenfilenames(
+            title="选择订单表文件 (可多选，文件之间重复的订单只计算一次)",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if filenames:
+            self.set_order_paths(list(filenames))
+            self.status_var.set(f"已选择订单表: {describe_paths(self.order_paths())}")
+            # 自动加载并预览数据
+            self.load_and_preview_file('order', self.order_paths())
+    
+    def append_order_files(self):
+        """追加订单文件：已加载的订单保留，只读取新文件并去除与已有订单重复的行"""
+        if not self.order_file_var.get():
+            self.select_order_file()
+            return
+        filenames = filedialog.askopenfilenames(
+            title="追加订单表文件",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        previous = self.order_paths()
+        existing = as_paths(previous)
+        new_files = [f for f in filenames if f not in existing]
+        if not new_files:
+            return
+        self.set_order_paths(existing + new_files)
+        self.status_var.set(f"已追加订单表: {describe_paths(new_files)}")
+        encoding_setting = self.encoding_var.get()
+        compact = self.compact_var.get()
+        if (self.order_df is None or self.streaming_var.get()
+                or self.load_settings.get('order') != (previous, encoding_setting, compact)):
+            # 没有可复用的已加载订单时重新加载所有文件
+            self.load_and_preview_file('order', self.order_paths())
+        else:
+            self.start_full_load('order', self.order_paths(), encoding_setting, compact,
+                                 base=(self.order_df, self.order_dedup, new_files))
+    
+    def order_paths(self):
+        """订单文件路径：一个文件时为路径，多个文件时为路径元组"""
+        paths = [path for path in self.order_file_var.get().split(ORDER_PATH_SEPARATOR) if path]
+        return paths[0] if len(paths) == 1 else tuple(paths)
+    
+    def set_order_paths(self, paths):
+        self.order_file_var.set(ORDER_PATH_SEPARATOR.join(paths))
+    
+    def select_operator_file(self):
+        filename = filedialog.askopenfilename(
+            title="选择运营对照表文件",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if filename:
+            self.operator_file_var.set(filename)
+            self.status_var.set(f"已选择运营对照表: {os.path.basename(filename)}")
+            # 自动加载并预览数据
+            self.load_and_preview_file('operator', filename)
+    
+    def select_cost_file(self):
+        filename = filedialog.askopenfilename(
+            title="选择成本对照表文件",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if filename:
+            self.cost_file_var.set(filename)
+            self.status_var.set(f"已选择成本对照表: {os.path.basename(filename)}")
+            # 自动加载并预览数据
+            self.load_and_preview_file('cost', filename)
+    
+    def table_specs(self):
+        """三张数据表的 (类型, 名称, 文件路径变量, 预览表格)"""
+        return [
+            ('order', "订单表", self.order_file_var, self.order_preview_table),
+            ('operator', "运营对照表", self.operator_file_var, self.operator_preview_table),
+            ('cost', "成本对照表", self.cost_file_var, self.cost_preview_table),
+        ]
+    
+    def set_table(self, kind, df):
+        setattr(self, f"{kind}_df", df)
+    
+    def get_table(self, kind):
+        return getattr(self, f"{kind}_df")
+    
+    def read_full_table(self, kind, filename, encoding_setting, compact, profiler, dedup=None, base=None):
+        """读取完整数据表（优先使用本地缓存），紧凑模式下转换列类型
+
+        先读取表头，只读取分析用到的列。订单表为多个文件时依次读取，用 dedup 去除文件之间
+        重复的订单后合并；base 为已合并的订单表时只读取新增的文件并追加到它后面。
+        返回 (数据表, 内存占用)，内存占用为紧凑模式下的 (转换前字节数, 转换后字节数)，否则为 None。
+        """
+        if isinstance(filename, str):
+            df = self.read_cached_table(kind, filename, encoding_setting, profiler)
+        else:
+            dedup = dedup or Deduplicator()
+            frames = [self.read_cached_table(kind, path, encoding_setting, profiler.child(f"file{i}", os.path.basename(path)))
+                      for i, path in enumerate(filename)]
+            fingerprints = () if base is None else base.attrs.get(FINGERPRINT_ATTR, ())
+            with profiler.stage('dedup', "去除重复订单", sum(len(f) for f in frames)) as timing:
+                df = combine_order_frames(frames, dedup, base)
+                timing.rows_out = len(df)
+            # 合并后的订单表记录各文件读取时的内容哈希（按文件顺序）
+            df.attrs[FINGERPRINT_ATTR] = tuple(fingerprints) + tuple(
+                fingerprint for frame in frames for fingerprint in frame.attrs[FINGERPRINT_ATTR])
+        if not compact:
+            return df, None
+        with profiler.stage('compact', "紧凑类型转换", len(df)) as timing:
+            before = memory_bytes(df)
+            attrs = dict(df.attrs)
+            df = compact_table(df)
+            df.attrs.update(attrs)
+            timing.rows_out = len(df)
+        return df, (before, memory_bytes(df))
+    
+    def read_cached_table(self, kind, filename, encoding_setting, profiler):
+        """读取一个文件的完整数据表（优先使用本地缓存），只读取分析用到的列"""
+        with profiler.stage('sniff_header', "读取表头"):
+            usecols, text_columns = select_columns(kind, read_header(filename, encoding_setting))
+        return self.table_cache.read_table(filename, encoding_setting, profiler=profiler,
+                                           usecols=usecols, text_columns=text_columns)
+    
+    def load_and_preview_file(self, kind, filename):
+        """只读取文件开头的几行用于预览，完成后在后台预先加载完整数据"""
+        _, title, _, table = next(spec for spec in self.table_specs() if spec[0] == kind)
+        encoding_setting = self.encoding_var.get()
+        # 流式分析模式下订单表只做预览，完整数据在分析时分块读取；使用分析服务或后台分析进程时由它读取
+        remote_label = self.remote_label()
+        preview_only = (kind == 'order' and self.streaming_var.get()) or remote_label is not None
+        compact = self.compact_var.get()
+        
+        # 重新选择文件时，旧的预览和加载任务结果作废
+        for tasks in (self.preview_tasks, self.load_tasks):
+            previous = tasks.pop(kind, None)
+            if previous is not None and previous.running:
+                previous.cancel()
+        self.load_settings.pop(kind, None)
+        self.set_table(kind, None)
+        
+        profiler = self.create_profiler(f"preview-{kind}")
+        
+        def read_preview(progress, cancel_event):
+            with profiler.stage('read_preview', "读取预览", PREVIEW_ROWS) as timing:
+                # 多个订单文件时预览第一个文件
+                df = read_table(as_paths(filename)[0], encoding_setting, nrows=PREVIEW_ROWS)
+                timing.rows_out = len(df)
+            return df
+        
+        def on_done(df):
+            if self.preview_tasks.get(kind) is not task:
+                self.finish_profile(profiler, status='superseded', file=filename)
+                return
+            with profiler.stage('preview', "显示预览"):
+                self.preview_data(df, table, title)
+            timing = self.finish_profile(profiler, status='done', file=filename)
+            if preview_only:
+                if remote_label is not None:
+                    self.status_var.set(f"已预览{title}: 分析时由{remote_label}读取完整数据 ({timing})")
+                else:
+                    self.status_var.set(f"已预览{title}: 流式分析时分块读取完整数据 ({timing})")
+                return
+            self.status_var.set(f"已预览{title}，正在后台加载完整数据 ...")
+            self.start_full_load(kind, filename, encoding_setting, compact)
+        
+        def on_error(e):
+            self.finish_profile(profiler, status='error', file=filename, error=str(e))
+            if self.preview_tasks.get(kind) is task:
+                messagebox.showerror("错误", f"加载{title}时出错: {str(e)}\n\n请尝试更改CSV文件编码设置。")
+        
+        self.status_var.set(f"正在读取{title}: {describe_paths(filename)} ...")
+        task = BackgroundTask(self.root, read_preview, on_done=on_done, on_error=on_error)
+        self.preview_tasks[kind] = task
+        task.start()
+    
+    def start_full_load(self, kind, filename, encoding_setting, compact, base=None):
+        """在后台完整加载数据表；分析时如果加载仍在进行会等待它完成而不是重新读取
+
+        base 为 (已合并的订单表, 其订单指纹, 新增的文件) 时只读取新增的文件。
+        """
+        title = next(spec[1] for spec in self.table_specs() if spec[0] == kind)
+        profiler = self.create_profiler(f"load-{kind}")
+        # 在指纹的副本上去重，加载被取消或出错时不影响已有的指纹
+        dedup = None
+        if not isinstance(filename, str):
+            dedup = Deduplicator()
+            if base is not None and base[1] is not None:
+                dedup = Deduplicator(base[1].seen.copy())
+        
+        def load(progress, cancel_event):
+            if base is not None:
+                return self.read_full_table(kind, tuple(base[2]), encoding_setting, compact, profiler,
+                                            dedup=dedup, base=base[0])
+            return self.read_full_table(kind, filename, encoding_setting, compact, profiler, dedup=dedup)
+        
+        def on_done(outcome):
+            df, footprint = outcome
+            log_info = {'file': filename}
+            if footprint is not None:
+                log_info['memory_bytes'] = {'before': footprint[0], 'after': footprint[1]}
+            timing = self.finish_profile(profiler, status='done', **log_info)
+            if self.load_tasks.get(kind) is not task:
+                return
+            self.set_table(kind, df)
+            if kind == 'order':
+                self.order_dedup = dedup
+            message = f"已加载{title}: {len(df)} 行数据"
+            if DUPLICATE_COUNT_ATTR in df.attrs:
+                message += f", 去除重复订单 {df.attrs[DUPLICATE_COUNT_ATTR]} 条"
+            if footprint is not None:
+                message += f", 内存 {format_bytes(footprint[0])} → {format_bytes(footprint[1])}"
+            # 分析进行中时状态栏显示分析进度
+            if self.analysis_task is None:
+                self.status_var.set(f"{message} ({timing})")
+        
+        def on_error(e):
+            self.finish_profile(profiler, status='error', file=filename, error=str(e))
+            # 分析正在等待这次加载时由分析报告错误
+            if self.load_tasks.get(kind) is task and self.analysis_task is None:
+                messagebox.showerror("错误", f"加载{title}时出错: {str(e)}\n\n请尝试更改CSV文件编码设置。")
+        
+        task = BackgroundTask(self.root, load, on_done=on_done, on_error=on_error)
+        self.load_tasks[kind] = task
+        self.load_settings[kind] = (filename, encoding_setting, compact)
+        task.start()
+    
+    def create_profiler(self, kind):
+        """按界面上的性能剖析设置创建一次运行的性能记录"""
+        detailed = self.profile_var.get()
+        return RunProfiler(kind, track_memory=detailed, profile=detailed)
+    
+    def finish_profile(self, profiler, **extra):
+        """结束性能记录并写入 JSON 日志，返回状态栏显示的耗时明细"""
+        profiler.finish()
+        try:
+            profiler.write_log(extra=extra)
+        except OSError:
+            # 日志写入失败不影响分析结果
+            pass
+        return profiler.summary_text(limit=3)
+    
+    def set_progress(self, stage, rows_done=None):
+        """在主线程中显示当前分析阶段（流式分析时同时显示已处理的行数）"""
+        stage_names = [name for name, _ in STAGES]
+        index = stage_names.index(stage)
+        self.progress_var.set(index * 100 / len(stage_names))
+        message = f"正在分析数据: {STAGE_LABELS[stage]} ({index + 1}/{len(stage_names)})"
+        if rows_done is not None:
+            message += f" - 已处理 {rows_done} 行订单"
+        self.status_var.set(message + " ...")
+    
+    def finish_analysis(self):
+        self.analysis_task = None
+        if self.export_task is None:
+            self.cancel_button.configure(state=tk.DISABLED)
+        self.analyze_button.configure(state=tk.NORMAL)
+    
+    def analyze_data(self):
+        """在后台线程中分析数据并计算盈亏"""
+        if not all([self.order_file_var.get(), self.operator_file_var.get(), self.cost_file_var.get()]):
+            messagebox.showwarning("警告", "请先选择所有必需的数据文件")
+            return
+        if self.analysis_task is not None:
+            return
+        
+        encoding_setting = self.encoding_var.get()
+        store_mode = self.store_var.get()
+        multiple_orders = not isinstance(self.order_paths(), str)
+        streaming = self.streaming_var.get() and not store_mode
+        parallel = self.parallel_var.get() and not (streaming or store_mode)
+        # 标准分析模式可以交给分析服务或常驻后台分析进程
+        remote = remote_label = None
+        if not (streaming or parallel or store_mode):
+            remote_label = self.remote_label()
+            try:
+                remote = self.remote_client()
+            except ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
+        order_store = self.get_order_store() if store_mode else None
+        compact = self.compact_var.get()
+        cached_indexes = self.join_indexes
+        pipeline = self.pipeline
+        result_cache = self.result_cache
+        # 已加载完成的数据表直接交给后台线程；正在后台加载的等待加载完成，其余在后台线程中读取
+        tables = {}
+        paths = {}
+        titles = {}
+        pending = {}
+        for kind, title, file_var, _ in self.table_specs():
+            tables[kind] = self.get_table(kind)
+            paths[kind] = self.order_paths() if kind == 'order' else file_var.get()
+            titles[kind] = title
+            loading = self.load_tasks.get(kind)
+            if tables[kind] is not None or loading is None:
+                continue
+            if self.load_settings.get(kind) == (paths[kind], encoding_setting, compact):
+                pending[kind] = loading
+            else:
+                # 加载后修改了编码或紧凑模式设置，旧设置的加载结果不再使用
+                loading.cancel()
+                del self.load_tasks[kind]
+                del self.load_settings[kind]
+        
+        profiler = self.create_profiler('analysis')
+        log_info = {'files': paths, 'streaming': streaming, 'parallel': parallel, 'order_store': store_mode,
+                    'remote': remote_label}
+        
+        def wait_load(kind, cancel_event):
+            with profiler.stage(f"{kind}.wait_load", f"等待{titles[kind]}加载"):
+                return pending[kind].wait(cancel_event)
+        
+        def read(kind):
+            return self.read_full_table(kind, paths[kind], encoding_setting, compact,
+                                        profiler.child(kind, titles[kind]))
+        
+        def analyze(progress, cancel_event):
+            progress('read')
+            key = cached = None
+            # 订单库模式的报告包含之前导入的批次，不使用结果缓存
+            if not store_mode:
+                with profiler.stage('result_cache', "查找结果缓存"):
+                    try:
+                        key = result_key(paths, encoding_setting, tables)
+                    except Exception:
+                        # 缺少必要列或无法读取表头时照常分析，由分析过程报告错误
+                        key = None
+                    cached = None if key is None else result_cache.get(key)
+            # 分析所用文件的内容哈希：之后重新读取文件计算逐单明细时确认文件未被修改
+            fingerprints = {}
+            if not store_mode:
+                try:
+                    fingerprints = source_fingerprints(paths, tables)
+                except OSError:
+                    # 无法读取的文件由读取数据表时报告错误
+                    pass
+            if cached is not None:
+                return {}, tables, cached, None, fingerprints
+            note = None
+            if remote is not None:
+                try:
+                    with profiler.stage('remote', remote_label):
+                        result, note = remote.analyze(paths, encoding_setting, compact,
+                                                      progress=progress, cancel_event=cancel_event)
+                except (WarmProcessError, ServiceError) as e:
+                    note = f"{remote_label}不可用 ({e})，已在本进程中分析"
+                else:
+                    if key is not None:
+                        result_cache.put(key, result)
+                    # 数据表在其他进程中，没有本进程的对照表和查找索引
+                    return {}, None, result, note, fingerprints
+            # 未加载的数据表同时读取，某个文件出错不影响其他文件
+            jobs = {}
+            for kind, df in tables.items():
+                # 流式分析分块读取订单表；订单库模式只在订单文件是新批次时读取
+                if df is None and not ((streaming or store_mode) and kind == 'order'):
+                    if kind in pending:
+                        jobs[kind] = lambda kind=kind: wait_load(kind, cancel_event)
+                    else:
+                        jobs[kind] = lambda kind=kind: read(kind)
+            with profiler.stage('load_all', "读取数据文件", len(jobs)):
+                results, errors = run_concurrently(jobs, cancel_event)
+            loaded = {kind: df for kind, (df, _) in results.items()}
+            if errors:
+                raise TableLoadError(errors, loaded, titles)
+            if not store_mode:
+                # 本次读取的数据表使用读取时记录的哈希
+                fingerprints.update(source_fingerprints({kind: paths[kind] for kind in loaded}, loaded))
+            frames = dict(tables, **loaded)
+            # 对照表未变化时复用上次建立的查找索引
+            indexes = None
+            if (cached_indexes is not None and cached_indexes[0] is frames['operator']
+                    and cached_indexes[1] is frames['cost']):
+                indexes = cached_indexes[2]
+            if store_mode:
+                result, note = run_store_analysis(
+                    order_store, paths['order'], frames['operator'], frames['cost'], encoding_setting,
+                    order_df=frames['order'], indexes=indexes, progress=progress,
+                    cancel_event=cancel_event, profiler=profiler)
+            elif streaming:
+                result = run_streaming_analysis(paths['order'], frames['operator'], frames['cost'],
+                                                encoding_setting, progress=progress,
+                                                cancel_event=cancel_event, indexes=indexes,
+                                                profiler=profiler,
+                                                dedup=Deduplicator() if multiple_orders else None)
+            elif parallel:
+                result = run_parallel_analysis(frames['order'], frames['operator'], frames['cost'],
+                                               progress=progress, cancel_event=cancel_event,
+                                               indexes=indexes, profiler=profiler)
+            else:
+                # 分阶段缓存：只重新计算依赖发生变化的阶段
+                result = pipeline.run(frames['order'], frames['operator'], frames['cost'],
+                                      progress=progress, cancel_event=cancel_event,
+                                      profiler=profiler)
+            if multiple_orders and not (streaming or store_mode):
+                # 合并多个订单文件时去除的重复订单数记录在合并后的订单表上
+                result.duplicate_count = frames['order'].attrs.get(DUPLICATE_COUNT_ATTR, 0)
+            if key is not None:
+                # 按分析所用数据表读取时的文件哈希保存（读取后文件可能已被修改）
+                result_cache.put(result_key(paths, encoding_setting, frames), result)
+            return loaded, frames, result, note, fingerprints
+        
+        def on_done(outcome):
+            if self.analysis_task is not task:
+                self.finish_profile(profiler, status='superseded', **log_info)
+                return
+            loaded, frames, result, note, fingerprints = outcome
+            self.finish_analysis()
+            if frames is not None and not (result.from_cache or store_mode):
+                self.join_indexes = (frames['operator'], frames['cost'], result.indexes)
+            self.detail_df = result.merged_df
+            # 订单库的报告包含之前导入的批次，不能由当前订单文件重新计算明细
+            self.detail_source = None if store_mode else (paths, encoding_setting, fingerprints)
+            self.cube = result.cube
+            self.scenario_groups = None
+            # 显示在后台线程中补充加载的数据
+            self.show_loaded_tables(loaded)
+            
+            self.set_progress('render')
+            with profiler.stage('render', STAGE_LABELS['render'], len(result.result_df)) as timing:
+                self.show_result(result)
+                timing.rows_out = len(self.result_table)
+            self.progress_var.set(100)
+            message = result.status_message()
+            if result.from_cache:
+                message += " - 使用缓存的分析结果"
+            elif note:
+                message += f" - {note}"
+            elif not (streaming or parallel) and pipeline.reuse_message():
+                message += f" - {pipeline.reuse_message()}"
+            message += f" | {self.finish_profile(profiler, status='done', **log_info)}"
+            self.status_var.set(message)
+            for warning in result.warnings():
+                messagebox.showwarning("数据警告", warning)
+        
+        def on_error(e):
+            self.finish_profile(profiler, status='error', error=str(e), **log_info)
+            if self.analysis_task is not task:
+                return
+            self.finish_analysis()
+            self.progress_var.set(0)
+            if isinstance(e, TableLoadError):
+                # 读取成功的数据表照常加载和预览，下次分析时不再重新读取
+                self.show_loaded_tables(e.loaded)
+            if isinstance(e, AnalysisError):
+                messagebox.showerror("错误", str(e))
+            else:
+                messagebox.showerror("错误", f"分析数据时出错: {str(e)}\n\n如为加载失败，请尝试更改CSV文件编码设置。")
+            self.status_var.set("分析出错")
+        
+        def on_cancel():
+            self.finish_profile(profiler, status='cancelled', **log_info)
+            if self.analysis_task is not task:
+                return
+            self.finish_analysis()
+            self.progress_var.set(0)
+            self.status_var.set("分析已取消")
+        
+        self.analyze_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        def on_progress(stage, rows_done=None):
+            if self.analysis_task is task:
+                self.set_progress(stage, rows_done)
+        
+        task = BackgroundTask(self.root, analyze, on_progress=on_progress,
+                              on_done=on_done, on_error=on_error, on_cancel=on_cancel)
+        self.analysis_task = task
+        task.start()
+    
+    def show_loaded_tables(self, loaded):
+        """保存并预览在分析线程中加载的数据表"""
+        for kind, title, _, table in self.table_specs():
+            if kind in loaded:
+                self.set_table(kind, loaded[kind])
+                self.preview_data(loaded[kind], table, title)
+    
+    def cancel_analysis(self):
+        """取消正在进行的分析或逐单明细导出"""
+        if self.analysis_task is not None:
+            self.analysis_task.cancel()
+            self.status_var.set("正在取消分析...")
+        elif self.export_task is not None:
+            self.export_task.cancel()
+            self.status_var.set("正在取消导出...")
+    
+    def show_result(self, result):
+        """在结果区域显示按运营人员汇总的结果"""
+        self.result_df = result.result_df
+        # 表格只显示可见的行，结果行数很多时也不会卡顿
+        self.result_table.set_data(self.result_df, self.result_table.columns)
+    
+    def export_results(self):
+        """导出结果到Excel文件"""
+        if self.result_df is None:
+            messagebox.showwarning("警告", "没有可导出的结果数据")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="保存分析结果",
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
+        )
+        
+        if filename:
+            try:
+                if filename.endswith('.csv'):
+                    self.result_df.to_csv(filename, index=False, encoding='utf-8-sig')
+                else:
+                    self.result_df.to_excel(filename, index=False)
+                
+                messagebox.showinfo("成功", f"结果已导出到: {filename}")
+                self.status_var.set(f"结果已导出: {os.path.basename(filename)}")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出结果时出错: {str(e)}")
+    
+    def export_detail(self):
+        """在后台线程中分块导出逐单明细（CSV / Excel / Parquet），内存占用与订单数无关"""
+        if self.result_df is None or self.detail_source is None:
+            messagebox.showwarning("警告", "请先分析数据")
+            return
+        if self.analysis_task is not None or self.export_task is not None:
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="导出逐单明细",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx"), ("Parquet files", "*.parquet")]
+        )
+        if not filename:
+            return
+        
+        detail_df = self.detail_df
+        paths, encoding_setting, fingerprints = self.detail_source
+        compact = self.compact_var.get()
+        tables = {kind: self.get_table(kind) for kind in ('operator', 'cost')}
+        cached_indexes = self.join_indexes
+        profiler = self.create_profiler('export')
+        log_info = {'file': filename, 'recomputed': detail_df is None}
+        
+        def export(progress, cancel_event):
+            chunks = self.detail_chunks(detail_df, paths, encoding_setting, fingerprints, compact, tables,
+                                        cached_indexes, profiler, cancel_event)
+            with profiler.stage('write', "写入明细") as timing:
+                timing.rows_out = write_detail(chunks, filename, progress, cancel_event)
+            return timing.rows_out
+        
+        def finish_export():
+            self.export_task = None
+            if self.analysis_task is None:
+                self.cancel_button.configure(state=tk.DISABLED)
+            self.progress_var.set(0)
+        
+        def on_progress(rows):
+            if self.export_task is not task:
+                return
+            if detail_df is not None and len(detail_df):
+                self.progress_var.set(rows * 100 / len(detail_df))
+            self.status_var.set(f"正在导出逐单明细: 已写入 {rows} 行 ...")
+        
+        def on_done(rows):
+            timing = self.finish_profile(profiler, status='done', rows=rows, **log_info)
+            if self.export_task is not task:
+                return
+            finish_export()
+            self.status_var.set(f"逐单明细已导出: {os.path.basename(filename)} ({rows} 行) | {timing}")
+            messagebox.showinfo("成功", f"逐单明细已导出到: {filename}")
+        
+        def on_error(e):
+            self.finish_profile(profiler, status='error', error=str(e), **log_info)
+            if self.export_task is not task:
+                return
+            finish_export()
+            messagebox.showerror("错误", f"导出逐单明细时出错: {str(e)}")
+            self.status_var.set("导出出错")
+        
+        def on_cancel():
+            self.finish_profile(profiler, status='cancelled', **log_info)
+            if self.export_task is not task:
+                return
+            finish_export()
+            self.status_var.set("导出已取消")
+        
+        self.cancel_button.configure(state=tk.NORMAL)
+        task = BackgroundTask(self.root, export, on_progress=on_progress,
+                              on_done=on_done, on_error=on_error, on_cancel=on_cancel)
+        self.export_task = task
+        task.start()
+    
+    def detail_chunks(self, detail_df, paths, encoding_setting, fingerprints, compact, tables, cached_indexes,
+                      profiler, cancel_event):
+        """逐块返回逐单明细（在后台线程中调用）
+
+        流式分析、多核分析、后台分析进程或缓存的结果没有保留逐单明细，按上次分析的文件分块重新计算；
+        fingerprints 为分析时各文件的内容哈希，文件之后被修改时抛出 AnalysisError，不导出与报告不符的明细。
+        """
+        if detail_df is not None:
+            return iter_frame_chunks(detail_df)
+        titles = {kind: title for kind, title, _, _ in self.table_specs()}
+        changed = changed_tables(paths, fingerprints, tables)
+        if changed:
+            names = "、".join(titles[kind] for kind in changed)
+            raise AnalysisError(f"{names}的文件在分析后已被修改或删除，请重新分析后再计算逐单明细")
+        for kind, df in tables.items():
+            if df is None:
+                tables[kind] = self.read_full_table(kind, paths[kind], encoding_setting, compact,
+                                                    profiler.child(kind, titles[kind]))[0]
+        indexes = None
+        if (cached_indexes is not None and cached_indexes[0] is tables['operator']
+                and cached_indexes[1] is tables['cost']):
+            indexes = cached_indexes[2]
+        dedup = None if isinstance(paths['order'], str) else Deduplicator()
+        return (merged_df for merged_df, _, _ in iter_merged_chunks(
+            paths['order'], tables['operator'], tables['cost'], encoding_setting,
+            cancel_event=cancel_event, indexes=indexes, profiler=profiler, dedup=dedup))
+    
+    def open_scenarios(self):
+        """打开成本情景窗口，在上次分析的订单上比较多组假设成本"""
+        if self.result_df is None:
+            messagebox.showwarning("警告", "请先分析数据")
+            return
+        if self.detail_source is None:
+            messagebox.showwarning("警告", "订单库模式的分析结果不能做成本情景分析，请关闭增量订单库后重新分析")
+            return
+        ScenarioWindow(self.root, self.run_scenarios, self.encoding_var.get())
+    
+    def run_scenarios(self, scenarios, on_result):
+        """在后台一次计算所有情景；订单只在第一次计算时归并为分组系数，之后的情景直接复用"""
+        if self.scenario_task is not None and self.scenario_task.running:
+            self.scenario_task.cancel()
+        groups = self.scenario_groups
+        detail_df = self.detail_df
+        paths, encoding_setting, fingerprints = self.detail_source
+        compact = self.compact_var.get()
+        tables = {kind: self.get_table(kind) for kind in ('operator', 'cost')}
+        cached_indexes = self.join_indexes
+        profiler = self.create_profiler('scenarios')
+        log_info = {'scenarios': len(scenarios), 'recomputed': groups is None and detail_df is None}
+        
+        def compute(progress, cancel_event):
+            nonlocal groups
+            if groups is None:
+                chunks = self.detail_chunks(detail_df, paths, encoding_setting, fingerprints, compact, tables,
+                                            cached_indexes, profiler, cancel_event)
+                with profiler.stage('groups', "归并订单") as timing:
+                    groups = groups_from_chunks(chunks, cancel_event)
+                    timing.rows_out = len(groups)
+            with profiler.stage('scenarios', f"计算情景({len(scenarios)}个)", len(groups)):
+                profit, _ = evaluate_scenarios(groups, scenarios)
+                return groups, comparison_table(profit)
+        
+        def unmatched_note():
+            # 调价表中没有匹配到任何订单的商品编码（如编码写错或已下架）
+            notes = [f"{s.name} {s.unmatched} 个" for s in scenarios if s.unmatched]
+            return f" | 调价表中未匹配订单的商品编码: {', '.join(notes)}" if notes else ""
+        
+        def on_done(outcome):
+            timing = self.finish_profile(profiler, status='done', **log_info)
+            if self.scenario_task is not task:
+                return
+            self.scenario_task = None
+            # 分析结果未变化时保留分组系数
+            if self.detail_source == (paths, encoding_setting, fingerprints):
+                self.scenario_groups = outcome[0]
+            on_result(outcome[1], f"已计算 {len(scenarios)} 个情景{unmatched_note()} | {timing}")
+        
+        def on_error(e):
+            self.finish_profile(profiler, status='error', error=str(e), **log_info)
+            if self.scenario_task is not task:
+                return
+            self.scenario_task = None
+            messagebox.showerror("错误", f"计算成本情景时出错: {str(e)}")
+            on_result(None, "计算出错")
+        
+        def on_cancel():
+            self.finish_profile(profiler, status='cancelled', **log_info)
+            if self.scenario_task is not task:
+                return
+            self.scenario_task = None
+            on_result(None, "计算已取消")
+        
+        task = BackgroundTask(self.root, compute, on_done=on_done, on_error=on_error, on_cancel=on_cancel)
+        self.scenario_task = task
+        task.start()
+    
+    def open_drilldown(self, selected=False):
+        """打开钻取分析窗口；selected 为真时只看结果表中选中的运营人员"""
+        if self.cube is None:
+            if self.result_df is not None:
+                messagebox.showwarning("警告", "订单库模式的分析结果不包含钻取数据，请关闭增量订单库后重新分析")
+            else:
+                messagebox.showwarning("警告", "请先分析数据")
+            return
+        operator = None
+        if selected:
+            rows = self.result_table.selected_values()
+            if rows:
+                operator = str(rows[0][0])
+        DrilldownWindow(self.root, self.cube, operator)
+    
+    def get_order_store(self):
+        """第一次使用时打开本地订单库"""
+        if self.order_store is None:
+            self.order_store = OrderStore()
+        return self.order_store
+    
+    def clear_order_store(self):
+        """删除订单库中所有已导入的批次"""
+        if self.analysis_task is not None:
+            messagebox.showwarning("警告", "请等待分析完成后再清空订单库")
+            return
+        if not messagebox.askyesno("清空订单库", "是否删除订单库中所有已导入的订单批次？\n\n此操作不能撤销。"):
+            return
+        self.get_order_store().clear()
+        self.status_var.set("订单库已清空")
+    
+    def remote_label(self):
+        """分析交给其他进程时返回其名称（分析服务优先），否则返回 None"""
+        if self.service_var.get():
+            return "分析服务"
+        if self.warm_var.get():
+            return "后台分析进程"
+        return None
+    
+    def remote_client(self):
+        """当前设置下负责分析的客户端（在本进程中分析时为 None）"""
+        if self.service_var.get():
+            return ServiceClient(self.service_url_var.get().strip(), token=os.environ.get(TOKEN_ENV))
+        if self.warm_var.get():
+            return self.warm_client
+        return None
+    
+    def toggle_warm_process(self):
+        """开启时在后台启动（或连接已有的）后台分析进程，关闭时结束它"""
+        enabled = self.warm_var.get()
+        client = self.warm_client
+        
+        def switch(progress, cancel_event):
+            if enabled:
+                return client.ensure_running()
+            client.shutdown()
+            return None
+        
+        def on_done(info):
+            if self.warm_task is not task:
+                return
+            self.warm_task = None
+            if info is None:
+                self.status_var.set("已关闭后台分析进程")
+            else:
+                self.status_var.set(f"后台分析进程已就绪 (进程号 {info['pid']})，分析时由它读取和计算数据")
+        
+        def on_error(e):
+            if self.warm_task is not task:
+                return
+            self.warm_task = None
+            self.warm_var.set(False)
+            messagebox.showerror("错误", f"启动后台分析进程时出错: {str(e)}")
+        
+        self.status_var.set("正在启动后台分析进程 ..." if enabled else "正在关闭后台分析进程 ...")
+        task = BackgroundTask(self.root, switch, on_done=on_done, on_error=on_error)
+        self.warm_task = task
+        task.start()
+    
+    def clear_data(self):
+        """清空所有数据"""
+        # 取消正在进行的后台任务
+        for task in (list(self.preview_tasks.values()) + list(self.load_tasks.values()) +
+                     [self.analysis_task, self.export_task, self.scenario_task]):
+            if task is not None and task.running:
+                task.cancel()
+        self.preview_tasks = {}
+        self.load_tasks = {}
+        self.load_settings = {}
+        self.export_task = None
+        self.finish_analysis()
+        self.progress_var.set(0)
+        
+        self.order_df = None
+        self.operator_df = None
+        self.cost_df = None
+        self.result_df = None
+        self.detail_df = None
+        self.detail_source = None
+        self.cube = None
+        self.scenario_groups = None
+        self.join_indexes = None
+        self.pipeline = AnalysisPipeline()
+        
+        self.order_file_var.set("")
+        self.order_dedup = None
+        self.operator_file_var.set("")
+        self.cost_file_var.set("")
+        
+        # 清空预览数据和结果数据
+        for table in [self.order_preview_table, self.operator_preview_table, self.cost_preview_table,
+                      self.result_table]:
+            table.clear()
+        
+        # 可选：同时清空本地解析缓存
+        if messagebox.askyesno("清空缓存", "是否同时清空本地数据表缓存和分析结果缓存？\n\n清空后再次选择相同文件需要重新解析。"):
+            self.table_cache.clear()
+            self.result_cache.clear()
+            self.status_var.set("数据和本地缓存已清空")
+        else:
+            self.status_var.set("数据已清空")
@@ -0,0 +1,220 @@
+"""无界面批量分析：对多个店铺/日期的订单文件分别计算盈亏并生成汇总报告
+
+示例：
+    python main/batch.py exports/ --operator 运营对照表.xlsx --cost 成本对照表.xlsx -o reports/
+    python main/batch.py "exports/*_2024-06-*.csv" --operator op.csv --cost cost.csv -o reports/ --workers 8
+
+每个订单文件输出一份按运营人员的汇总，另外输出所有文件合并后的汇总（combined_summary）
+和每个文件一行的概览（shops）。计算与界面中的分析完全相同。
+报告按订单文件相对于所有文件共同上级目录的路径命名，例如 exports/店铺A/orders.csv
+和 exports/店铺B/orders.csv 分别输出 店铺A_orders_汇总.csv 和 店铺B_orders_汇总.csv。
+"""
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from analysis import (
+    build_join_indexes, format_summary, read_analysis_table, resolve_columns, run_analysis
+)
+from summary import combine_partials, finalize_summary, partial_summary
+
+ORDER_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# 每个工作进程中的对照表和查找索引（由 _init_worker 加载一次）
+_worker_state = {}
+
+
+def expand_order_paths(patterns, exclude=()):
+    """把目录、通配符和文件路径展开为排序后的订单文件列表"""
+    exclude = {os.path.abspath(path) for path in exclude}
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                       if name.lower().endswith(ORDER_EXTENSIONS)]
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern)
+        else:
+            matches = [pattern]
+        paths.extend(path for path in sorted(matches) if os.path.abspath(path) not in exclude)
+    # 去掉重复指定的文件，保持顺序
+    return list(dict.fromkeys(paths))
+
+
+def _init_worker(operator_path, cost_path, encoding_setting):
+    """工作进程初始化：读取运营对照表和成本对照表（每个进程只读取一次）
+
+    读取失败时记录错误，由之后的每个分析任务报告，而不是让进程池失效。
+    """
+    _worker_state.clear()
+    _worker_state['encoding'] = encoding_setting
+    _worker_state['indexes'] = None
+    try:
+        _worker_state['operator_df'] = read_analysis_table('operator', operator_path, encoding_setting)
+        _worker_state['cost_df'] = read_analysis_table('cost', cost_path, encoding_setting)
+    except Exception as e:
+        _worker_state['error'] = f"读取对照表失败: {type(e).__name__}: {e}"
+
+
+def analyze_file(order_path):
+    """在工作进程中分析一个订单文件，返回 (文件路径, 结果字典)；出错时结果字典包含 error"""
+    if 'error' in _worker_state:
+        return order_path, {'error': _worker_state['error']}
+    try:
+        operator_df = _worker_state['operator_df']
+        cost_df = _worker_state['cost_df']
+        order_df = read_analysis_table('order', order_path, _worker_state['encoding'])
+        if _worker_state['indexes'] is None:
+            # 对照表的查找索引在进程中第一次分析时建立，之后的文件复用
+            columns = resolve_columns(order_df, operator_df, cost_df)
+            _worker_state['indexes'] = build_join_indexes(operator_df, cost_df, columns)
+        result = run_analysis(order_df, operator_df, cost_df, indexes=_worker_state['indexes'])
+    except Exception as e:
+        return order_path, {'error': f"{type(e).__name__}: {e}"}
+    return order_path, {
+        'summary': result.result_df,
+        'partial': partial_summary(result.merged_df),
+        'order_count': result.order_count,
+        'other_count': result.other_count,
+        'missing_cost_count': result.missing_cost_count,
+        'warnings': result.warnings(),
+    }
+
+
+def write_table(df, path):
+    """按扩展名写出 CSV（带 BOM，便于 Excel 打开）或 xlsx"""
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(path, index=False)
+
+
+def relative_names(order_paths):
+    """每个订单文件相对于所有文件共同上级目录的路径（用 / 分隔），用于概览和报告命名"""
+    paths = [os.path.abspath(path) for path in order_paths]
+    try:
+        base = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    except ValueError:
+        # Windows 上位于不同盘符的文件没有共同上级目录
+        base = None
+    names = {}
+    for order_path, path in zip(order_paths, paths):
+        name = os.path.relpath(path, base) if base is not None else path.replace(':', '')
+        names[order_path] = name.replace(os.sep, '/').strip('/')
+    return names
+
+
+def shop_names(order_paths):
+    """每个订单文件的报告名称（不含扩展名，目录分隔符换成 _）
+
+    只有扩展名不同的文件（如 a.csv 和 a.xlsx）保留扩展名以区分；
+    仍然重名时（不区分大小写）抛出 ValueError，而不是让报告互相覆盖。
+    """
+    relative = relative_names(order_paths)
+    stems = {path: os.path.splitext(name) for path, name in relative.items()}
+    stem_counts = Counter(stem.lower() for stem, _ in stems.values())
+    names = {}
+    for path, (stem, ext) in stems.items():
+        name = stem if stem_counts[stem.lower()] == 1 else stem + ext.replace('.', '_')
+        names[path] = name.replace('/', '_')
+    name_counts = Counter(name.lower() for name in names.values())
+    collisions = sorted(relative[path] for path, name in names.items() if name_counts[name.lower()] > 1)
+    if collisions:
+        raise ValueError("以下订单文件的报告文件名相同: " + ", ".join(collisions))
+    return names
+
+
+def run_batch(order_paths, operator_path, cost_path, output_dir, encoding_setting='auto',
+              workers=None, output_format='csv', log=print):
+    """分析所有订单文件并写出报告，返回 (合并汇总, 概览, {文件: 错误信息})
+
+    workers 为 1 时在当前进程中依次分析，否则使用进程池（默认进程数为 CPU 核数）。
+    报告文件名会重名时在分析前抛出 ValueError。
+    """
+    relative = relative_names(order_paths)
+    names = shop_names(order_paths)
+    os.makedirs(output_dir, exist_ok=True)
+    outcomes = {}
+    if workers == 1:
+        _init_worker(operator_path, cost_path, encoding_setting)
+        completed = (analyze_file(path) for path in order_paths)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(operator_path, cost_path, encoding_setting))
+        futures = [executor.submit(analyze_file, path) for path in order_paths]
+        completed = (future.result() for future in as_completed(futures))
+
+    try:
+        warned = set()
+        for done, (order_path, outcome) in enumerate(completed, 1):
+            outcomes[order_path] = outcome
+            if 'error' in outcome:
+                log(f"[{done}/{len(order_paths)}] {order_path}: 失败 - {outcome['error']}")
+                continue
+            write_table(outcome['summary'], os.path.join(output_dir, f"{names[order_path]}_汇总.{output_format}"))
+            total = outcome['summary']['总盈亏'].sum()
+            log(f"[{done}/{len(order_paths)}] {order_path}: {outcome['order_count']} 单, 总盈亏 {total:.2f}")
+            # 对照表的警告每种只显示一次
+            for warning in outcome['warnings']:
+                if warning not in warned:
+                    warned.add(warning)
+                    log("警告: " + warning.replace("\n\n", " ").replace("\n", " "))
+    finally:
+        if workers != 1:
+            executor.shutdown()
+
+    succeeded = [path for path in order_paths if path in outcomes and 'error' not in outcomes[path]]
+    errors = {path: outcome['error'] for path, outcome in outcomes.items() if 'error' in outcome}
+
+    combined = None
+    if succeeded:
+        partial = combine_partials([outcomes[path]['partial'] for path in succeeded])
+        combined = format_summary(finalize_summary(partial))
+        write_table(combined, os.path.join(output_dir, f"combined_summary.{output_format}"))
+
+    overview = pd.DataFrame([{
+        '文件': relative[path],
+        '订单数': outcomes[path]['order_count'],
+        '总盈亏': round(outcomes[path]['summary']['总盈亏'].sum(), 2),
+        '待确认盈利': round(outcomes[path]['summary']['待确认盈利'].sum(), 2),
+        '未匹配运营的订单': outcomes[path]['other_count'],
+        '未匹配成本的订单': outcomes[path]['missing_cost_count'],
+    } for path in succeeded], columns=['文件', '订单数', '总盈亏', '待确认盈利', '未匹配运营的订单', '未匹配成本的订单'])
+    write_table(overview, os.path.join(output_dir, f"shops.{output_format}"))
+    return combined, overview, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量计算订单盈亏（无界面）")
+    parser.add_argument('orders', nargs='+', help="订单文件、目录或通配符，例如 exports/ 或 \"exports/*.csv\"")
+    parser.add_argument('--operator', required=True, help="运营对照表文件")
+    parser.add_argument('--cost', required=True, help="成本对照表文件")
+    parser.add_argument('-o', '--output-dir', required=True, help="报告输出目录")
+    parser.add_argument('--encoding', default='auto', help="CSV文件编码，默认自动检测")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认为CPU核数；1 表示不使用进程池")
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help="报告文件格式")
+    args = parser.parse_args(argv)
+
+    order_paths = expand_order_paths(args.orders, exclude=[args.operator, args.cost])
+    if not order_paths:
+        print("没有找到订单文件", file=sys.stderr)
+        return 2
+
+    print(f"共 {len(order_paths)} 个订单文件")
+    try:
+        _, overview, errors = run_batch(order_paths, args.operator, args.cost, args.output_dir,
+                                        args.encoding, args.workers, args.format)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"完成: {len(overview)} 个文件成功, {len(errors)} 个失败，报告已保存到 {args.output_dir}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
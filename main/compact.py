@@ -0,0 +1,62 @@
+"""紧凑内存模式：把重复度高的文本列转换为分类类型，并缩小整数列的类型"""
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRING = 'string[pyarrow]'
+except ImportError:  # 未安装 pyarrow 时高基数文本列保持原样
+    ARROW_STRING = None
+
+# 不同取值占行数的比例不超过该值的文本列转换为分类类型
+CATEGORY_MAX_RATIO = 0.5
+
+
+def memory_bytes(df):
+    """数据表占用的内存字节数（包括文本内容）"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def format_bytes(size):
+    """把字节数格式化为 KB/MB/GB 文本"""
+    for unit in ('KB', 'MB'):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+    return f"{size / 1024:.2f}GB"
+
+
+def _is_text(series):
+    return series.dtype == object or pd.api.types.is_string_dtype(series.dtype)
+
+
+def compact_series(series):
+    """返回类型更紧凑的列，取值不变
+
+    - 重复度高的文本列（商品编码、订单状态、运营人员等）转换为分类类型
+    - 其余文本列在安装了 pyarrow 时转换为 Arrow 字符串
+    - 整数列缩小为能容纳所有取值的最小整数类型
+    - 小数列保持 float64，避免金额精度变化导致汇总结果不同
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if _is_text(series):
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+            # 混合类型的列（如部分为数字）转换后取值类型会改变，保持原样
+            return series
+        if len(series) and series.nunique(dropna=True) <= len(series) * CATEGORY_MAX_RATIO:
+            return series.astype('category')
+        if ARROW_STRING is not None:
+            return series.astype(ARROW_STRING)
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    return series
+
+
+def compact_table(df):
+    """返回各列都转换为紧凑类型的新数据表（不修改传入的数据表）"""
+    if df is None:
+        return None
+    return pd.DataFrame({column: compact_series(df[column]) for column in df.columns}, index=df.index)
@@ -0,0 +1,226 @@
+"""运营人员 × 商品编码 × 日期 × 状态 的预聚合立方体
+
+分析时由逐单明细聚合一次，之后的钻取（某个运营人员的商品、某个商品的每日走势）、
+按周/月重新分桶和 Top-N 商品都只在立方体上计算，不再扫描订单。
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from profit_engine import to_number
+from status_rules import (
+    N_STATUS_CODES, OTHER, PENDING, RECEIVED, RETURNED, SHIPPED, classify_statuses, count_flags,
+    status_categories
+)
+from summary import PROFIT_COUNT, finalize_summary
+
+# 维度列；订单表没有日期列时立方体不含日期维度
+OPERATOR = '运营人员'
+SKU = '商品编码'
+DATE = '日期'
+STATUS_CODE = '状态编码'
+DIMENSIONS = [OPERATOR, SKU, DATE, STATUS_CODE]
+
+# 汇总时显示的状态维度（按盈亏计算规则取第一个匹配的规则）
+STATUS = '状态'
+STATUS_LABELS = {
+    RECEIVED: '已收货',
+    RETURNED: '退货',
+    SHIPPED: '已发货待收货',
+    PENDING: '待发货',
+    OTHER: '其他',
+}
+
+# 可累加的指标列
+ROW_COUNT = '订单行数'
+MEASURES = [ROW_COUNT, '订单总数', '商品数量', '实收金额', '商品总成本', '总盈亏', '待确认盈利总额', PROFIT_COUNT]
+
+# 重新分桶的周期（界面名称 → pandas 周期）
+FREQUENCIES = {'日': 'D', '周': 'W', '月': 'M'}
+
+# 逐单明细中的订单日期列（由 normalize_orders 统一列名）
+ORDER_DATE = '订单日期'
+
+# 立方体在 DataFrame.attrs 中记录无法解析为日期的订单日期个数
+UNPARSED_DATES_ATTR = 'unparsed_dates'
+
+
+def _parse_dates(values):
+    """把订单日期列解析为日期（精确到天），返回 (日期, 无法解析的个数)
+
+    先按第一个值推断的格式整列解析，格式不同的值（如 '2024/6/2 11:00' 与 '2024-06-01 10:00:00'
+    混在一起）再逐个解析，因此结果与分块方式无关。空白和缺失的日期不算作无法解析。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.dt.floor('D'), 0
+    with warnings.catch_warnings():
+        # 格式不统一时由下面逐个解析，不需要 pandas 的提示
+        warnings.simplefilter('ignore', UserWarning)
+        dates = pd.to_datetime(values, errors='coerce')
+    failed = dates.isna().to_numpy() & values.notna().to_numpy()
+    if failed.any():
+        # 逐个解析较慢，相同的值只解析一次
+        codes, uniques = pd.factorize(values[failed])
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce', format='mixed')
+        dates[failed] = parsed.to_numpy()[codes]
+        failed &= dates.isna().to_numpy()
+        failed[failed] = values[failed].astype(str).str.strip().to_numpy() != ''
+    return dates.dt.floor('D'), int(failed.sum())
+
+
+def build_cube(merged_df):
+    """由逐单明细（含运营人员、商品成本、状态分类、盈亏列）聚合出立方体
+
+    各维度分别编码后合成一个组合编码，所有指标都用 bincount 按组合编码一次求和。
+    缺失的商品编码和日期单独成组，不会丢失订单。
+    """
+    keys = {OPERATOR: merged_df['运营人员'], SKU: merged_df['商品编码']}
+    unparsed = 0
+    if ORDER_DATE in merged_df.columns:
+        keys[DATE], unparsed = _parse_dates(merged_df[ORDER_DATE])
+
+    codes = []
+    uniques = []
+    for values in keys.values():
+        value_codes, value_uniques = pd.factorize(values, use_na_sentinel=False)
+        codes.append(value_codes)
+        uniques.append(value_uniques)
+    if '状态分类' in merged_df.columns:
+        codes.append(merged_df['状态分类'].cat.codes.to_numpy().astype(np.int64))
+    else:
+        codes.append(classify_statuses(merged_df['订单状态']).codes.astype(np.int64))
+    uniques.append(pd.Index(np.arange(N_STATUS_CODES)))
+
+    shape = tuple(max(len(u), 1) for u in uniques)
+    combined = np.ravel_multi_index(codes, shape)
+    group_ids, group_keys = pd.factorize(combined)
+    n_groups = len(group_keys)
+
+    def grouped_sum(values):
+        return np.bincount(group_ids, weights=values, minlength=n_groups)
+
+    quantity = to_number(merged_df['商品数量'], 1)
+    cost_missing = merged_df['商品成本'].isna().to_numpy()
+    profit_loss = merged_df['盈亏'].to_numpy(dtype='float64')
+    profit_valid = ~np.isnan(profit_loss)
+
+    # 由组合编码还原各维度的取值
+    key_codes = np.unravel_index(group_keys, shape)
+    cube = pd.DataFrame({name: value_uniques.take(value_codes) for name, value_uniques, value_codes
+                         in zip(list(keys) + [STATUS_CODE], uniques, key_codes)})
+    cube[STATUS_CODE] = cube[STATUS_CODE].astype(np.int8)
+    cube[ROW_COUNT] = np.bincount(group_ids, minlength=n_groups)
+    cube['订单总数'] = grouped_sum(merged_df['商品ID'].notna().to_numpy(dtype='float64')).astype('int64')
+    cube['商品数量'] = grouped_sum(quantity)
+    cube['实收金额'] = grouped_sum(to_number(merged_df['实收金额'], 0))
+    cube['商品总成本'] = grouped_sum(np.where(cost_missing, 0.0, to_number(merged_df['商品成本'], 0) * quantity))
+    cube['总盈亏'] = grouped_sum(np.where(profit_valid, profit_loss, 0.0))
+    cube['待确认盈利总额'] = grouped_sum(np.nan_to_num(merged_df['待确认盈利'].to_numpy(dtype='float64')))
+    cube[PROFIT_COUNT] = grouped_sum(profit_valid.astype('float64')).astype('int64')
+    cube.attrs[UNPARSED_DATES_ATTR] = unparsed
+    return cube
+
+
+def _dimensions(cube):
+    return [name for name in DIMENSIONS if name in cube.columns]
+
+
+def combine_cubes(cubes):
+    """合并多个立方体（流式分析的各块、多核分析的各分片），相同维度组合的指标相加"""
+    cubes = [cube for cube in cubes if cube is not None]
+    if not cubes:
+        return None
+    if len(cubes) == 1:
+        return cubes[0]
+    dimensions = _dimensions(cubes[0])
+    combined = (pd.concat(cubes, ignore_index=True)
+                .groupby(dimensions, dropna=False, sort=False)[MEASURES].sum()
+                .reset_index())
+    combined[STATUS_CODE] = combined[STATUS_CODE].astype(np.int8)
+    combined.attrs[UNPARSED_DATES_ATTR] = sum(unparsed_dates(cube) for cube in cubes)
+    return combined
+
+
+def unparsed_dates(cube):
+    """立方体中无法解析为日期的订单日期个数（这些订单归入日期缺失的组）"""
+    return 0 if cube is None else cube.attrs.get(UNPARSED_DATES_ATTR, 0)
+
+
+def has_dates(cube):
+    return cube is not None and DATE in cube.columns
+
+
+def status_labels(status_codes):
+    """状态编码对应的显示名称（按盈亏计算规则的优先级）"""
+    categories = status_categories(np.asarray(status_codes, dtype=np.int64))
+    return pd.Series(categories).map(STATUS_LABELS).to_numpy()
+
+
+def rollup(cube, by=(OPERATOR,), freq=None, filters=None):
+    """按指定维度汇总立方体，返回各指标之和及平均每单盈亏
+
+    by 中可以使用 运营人员 / 商品编码 / 日期 / 状态；freq 为 'D' / 'W' / 'M' 时把日期
+    重新分桶为该周期的第一天；filters 为 {维度: 取值或取值列表}。
+    """
+    by = list(by)
+    if DATE in by and not has_dates(cube):
+        raise ValueError("订单表中没有日期列，不能按日期汇总")
+    df = cube
+    for column, value in (filters or {}).items():
+        if column == STATUS:
+            mask = np.isin(status_labels(df[STATUS_CODE]), np.atleast_1d(value))
+        elif isinstance(value, (list, tuple, set)):
+            mask = df[column].isin(value).to_numpy()
+        else:
+            mask = (df[column] == value).to_numpy()
+        df = df[mask]
+    extra = {}
+    if DATE in by and freq and freq != 'D':
+        extra[DATE] = df[DATE].dt.to_period(freq).dt.start_time
+    if STATUS in by:
+        extra[STATUS] = status_labels(df[STATUS_CODE])
+    if extra:
+        df = df.assign(**extra)
+    result = df.groupby(by, dropna=False, sort=True)[MEASURES].sum().reset_index()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['平均每单盈亏'] = (result['总盈亏'].to_numpy(dtype='float64') /
+                             result[PROFIT_COUNT].to_numpy(dtype='float64'))
+    return result.drop(columns=PROFIT_COUNT)
+
+
+def top_skus(cube, n=10, operator=None, measure='总盈亏', largest=False):
+    """按指标排序的前 n 个商品（n 为 None 时返回全部）；默认取总盈亏最低（亏损最多）的商品"""
+    filters = None if operator is None else {OPERATOR: operator}
+    skus = rollup(cube, by=[SKU], filters=filters)
+    skus = skus.sort_values(measure, ascending=not largest, kind='stable')
+    if n is not None:
+        skus = skus.head(n)
+    return skus.reset_index(drop=True)
+
+
+def drilldown(cube, dimension, operator=None, freq=None, top_n=None):
+    """钻取视图：某个运营人员（None 为全部）按 商品编码 / 日期 / 状态 汇总
+
+    按商品汇总时按总盈亏从低到高排序，top_n 不为空时只取前 top_n 个；
+    按日期汇总时 freq 为重新分桶的周期。
+    """
+    if dimension == SKU:
+        return top_skus(cube, top_n, operator)
+    filters = None if operator is None else {OPERATOR: operator}
+    return rollup(cube, by=[dimension], freq=freq, filters=filters)
+
+
+def summary_from_cube(cube):
+    """由立方体得到与 summarize_by_operator 相同的按运营人员汇总"""
+    count_names, flags = count_flags()
+    codes = cube[STATUS_CODE].to_numpy(dtype=np.int64)
+    rows = cube[ROW_COUNT].to_numpy()
+    columns = {'订单总数': cube['订单总数']}
+    for j, name in enumerate(count_names):
+        columns[name] = rows * flags[codes, j]
+    for name in ('总盈亏', '待确认盈利总额', PROFIT_COUNT):
+        columns[name] = cube[name]
+    partial = pd.DataFrame(columns).groupby(cube[OPERATOR], sort=True).sum()
+    partial.index.name = '运营人员'
+    return finalize_summary(partial)
@@ -0,0 +1,242 @@
+"""虚拟化表格控件：数据保存在 DataFrame 中，Treeview 只显示可见的几十行"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import pandas as pd
+
+# 表头和每行的大致像素高度，用于由控件高度估算可见行数
+HEADER_HEIGHT = 25
+DEFAULT_ROW_HEIGHT = 20
+
+
+class DataTable:
+    """基于 ttk.Treeview 的表格，只为当前可见窗口内的行创建条目
+
+    滚动时复用已有条目、只更新其中的值；点击表头时在 DataFrame 上排序
+    （只计算一次排序后的行号，不复制数据）；清空时只删除可见的条目。
+    选中的行按 DataFrame 的行号记录（条目在滚动时会显示其他行），滚动和排序后保持不变。
+    formatters 为 {列名: 函数}，用于把值格式化为显示文本。
+    """
+
+    def __init__(self, parent, height=10, formatters=None, column_widths=None,
+                 default_width=100, anchor=tk.CENTER):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, show="headings", height=height)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+
+        self.formatters = formatters or {}
+        self.column_widths = column_widths or {}
+        self.default_width = default_width
+        self.anchor = anchor
+        self.visible_rows = height
+
+        self._df = None
+        self._columns = []
+        # 显示顺序：第 i 个显示行对应 DataFrame 的第 _order[i] 行（None 表示原顺序）
+        self._order = None
+        self._sort_column = None
+        self._ascending = True
+        self._offset = 0
+        self._items = []
+        # 选中行在 DataFrame 中的行号
+        self._selected = set()
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(3))
+        self.tree.bind('<Configure>', self._on_resize)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def __len__(self):
+        return 0 if self._df is None else len(self._df)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def set_columns(self, columns):
+        """设置表头（没有数据时也显示列名）"""
+        self._columns = list(columns)
+        self.tree["columns"] = self._columns
+        for column in self._columns:
+            self.tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=self.column_widths.get(column, self.default_width),
+                             anchor=self.anchor)
+
+    def set_data(self, df, columns=None):
+        """显示数据表（不复制数据），columns 为要显示的列，默认为全部列"""
+        columns = list(df.columns) if columns is None else list(columns)
+        if columns != self._columns:
+            self.set_columns(columns)
+        self._df = df
+        self._order = None
+        self._sort_column = None
+        self._offset = 0
+        self._selected = set()
+        self._update_headings()
+        self._render()
+
+    def clear(self):
+        """清空数据：只需删除可见窗口内的条目，与数据行数无关"""
+        self._df = None
+        self._order = None
+        self._sort_column = None
+        self._offset = 0
+        self._selected = set()
+        if self._items:
+            self.tree.delete(*self._items)
+            self._items = []
+        self._update_headings()
+        self._update_scrollbar()
+
+    def sort_by(self, column, ascending=None):
+        """按列排序；再次点击同一列时切换升序/降序"""
+        if self._df is None or column not in self._df.columns:
+            return
+        if ascending is None:
+            ascending = not self._ascending if column == self._sort_column else True
+        values = self._df[column].reset_index(drop=True)
+        try:
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index
+        except TypeError:
+            # 混合类型的列按文本排序
+            order = values.astype(str).sort_values(ascending=ascending, kind='stable').index
+        self._order = order.to_numpy()
+        self._sort_column = column
+        self._ascending = ascending
+        self._offset = 0
+        self._update_headings()
+        self._render()
+
+    def scroll(self, rows):
+        self.scroll_to(self._offset + rows)
+
+    def scroll_to(self, offset):
+        """滚动到指定的首行位置"""
+        offset = max(0, min(int(offset), len(self) - self.visible_rows))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def selected_positions(self):
+        """选中各行在 DataFrame 中的行号（按显示顺序）"""
+        positions = np.array(sorted(self._selected), dtype=np.int64)
+        if self._order is not None and len(positions):
+            rank = np.empty(len(self._order), dtype=np.int64)
+            rank[self._order] = np.arange(len(self._order))
+            positions = positions[np.argsort(rank[positions], kind='stable')]
+        return positions
+
+    def selected_values(self):
+        """选中各行在显示列上的原始值（取自 DataFrame，不是显示文本）"""
+        if self._df is None:
+            return []
+        rows = self._df.iloc[self.selected_positions()][self._columns]
+        return list(rows.itertuples(index=False, name=None))
+
+    def visible_values(self):
+        """当前显示的各行文本（用于测试和复制）"""
+        return [tuple(self.tree.item(item)['values']) for item in self._items]
+
+    def _update_headings(self):
+        for column in self._columns:
+            text = column
+            if column == self._sort_column:
+                text += " ▲" if self._ascending else " ▼"
+            self.tree.heading(column, text=text)
+
+    def _window_positions(self):
+        """当前窗口内各行在 DataFrame 中的行号（按显示顺序）"""
+        end = min(self._offset + self.visible_rows, len(self))
+        if self._order is None:
+            return np.arange(self._offset, end)
+        return self._order[self._offset:end]
+
+    def _window(self):
+        """取出当前窗口内的行（按显示顺序）"""
+        return self._df.iloc[self._window_positions()][self._columns]
+
+    def _on_select(self, event=None):
+        # 只更新窗口内的行，窗口外已选中的行保持选中
+        if self._df is None:
+            return
+        selection = set(self.tree.selection() or ())
+        for item, position in zip(self._items, self._window_positions().tolist()):
+            if item in selection:
+                self._selected.add(position)
+            else:
+                self._selected.discard(position)
+
+    def _format_rows(self, window):
+        formatted = []
+        formatters = [self.formatters.get(column) for column in self._columns]
+        for row in window.itertuples(index=False, name=None):
+            formatted.append([fmt(value) if fmt is not None else _display(value)
+                              for fmt, value in zip(formatters, row)])
+        return formatted
+
+    def _render(self):
+        rows = [] if self._df is None else self._format_rows(self._window())
+        # 复用已有条目，只增删数量差
+        while len(self._items) > len(rows):
+            self.tree.delete(self._items.pop())
+        for i, values in enumerate(rows):
+            if i < len(self._items):
+                self.tree.item(self._items[i], values=values)
+            else:
+                self._items.append(self.tree.insert("", tk.END, values=values))
+        # 条目现在显示的行可能不同，按行号恢复选中状态
+        positions = [] if self._df is None else self._window_positions().tolist()
+        self.tree.selection_set([item for item, position in zip(self._items, positions)
+                                 if position in self._selected])
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self)
+        if total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self._offset / total, (self._offset + self.visible_rows) / total)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(float(value) * len(self))
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll(int(value) * step)
+
+    def _on_mousewheel(self, event):
+        # Windows 上每格为 120，macOS 上为 1
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self.scroll(-3 * delta)
+        return 'break'
+
+    def _on_resize(self, event):
+        row_height = DEFAULT_ROW_HEIGHT
+        try:
+            row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or DEFAULT_ROW_HEIGHT)
+        except (tk.TclError, ValueError):
+            pass
+        rows = max(1, (event.height - HEADER_HEIGHT) // row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.scroll_to(self._offset)
+            self._render()
+
+
+def _display(value):
+    """默认显示格式：缺失值显示为空"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return value
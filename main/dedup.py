@@ -0,0 +1,225 @@
+"""合并多个订单文件时去除重复订单（各平台导出的周报、日报等文件之间有重叠）
+
+每行的键为订单号（同一订单的多个商品再按商品ID、商品编码区分），订单表没有订单号列
+时为整行内容。同一文件中键相同的行按出现次序编号，(键, 次序) 的哈希值作为该行的指纹：
+后面的文件中指纹已出现过的行是重复订单，同一文件内的相同行仍视为不同的订单。
+已出现的指纹保存为有序的 uint64 数组（每行 8 字节），可以保存到磁盘，
+追加文件时只需计算新文件各行的指纹。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import ORDER_NUMBER_NAMES, PRODUCT_CODE_NAMES, PRODUCT_ID_NAMES, find_column
+
+# 合并后的订单表在 DataFrame.attrs 中记录去除的重复订单数
+DUPLICATE_COUNT_ATTR = 'duplicate_count'
+
+
+def key_columns(df):
+    """返回 (订单号列, 区分同一订单内各行的列)；没有订单号列时订单号列为 None，按所有列区分"""
+    order_number = find_column(df, ORDER_NUMBER_NAMES)
+    if order_number is None:
+        return None, sorted(df.columns, key=str)
+    extra = [find_column(df, PRODUCT_ID_NAMES), find_column(df, PRODUCT_CODE_NAMES)]
+    return order_number, [order_number] + [c for c in extra if c]
+
+
+def hash_rows(df, columns):
+    """各行在指定列上的哈希值（uint64）
+
+    数值列统一按 float64、分类列按原始取值计算，不同文件推断出的列类型不同
+    （如整数列因缺失值变为浮点数，或紧凑模式缩小了类型）时相同的值哈希值相同。
+    """
+    frame = {}
+    for column in columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        elif pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            values = values.astype('float64')
+        frame[column] = values.to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(frame), index=False).to_numpy()
+
+
+def row_keys(df):
+    """每行的键哈希值；缺少订单号的行使用整行内容"""
+    order_number, columns = key_columns(df)
+    keys = hash_rows(df, columns)
+    if order_number is not None:
+        missing = df[order_number].isna().to_numpy()
+        if missing.any():
+            # pandas 的写时复制下 to_numpy() 返回只读数组
+            keys = keys.copy()
+            keys[missing] = hash_rows(df[missing], sorted(df.columns, key=str))
+    return keys
+
+
+def sorted_unique(values, return_counts=False):
+    """排序后去重（对已由若干有序段拼接成的数组，稳定排序只需归并各段）"""
+    values = np.sort(np.asarray(values, dtype=np.uint64), kind='stable')
+    starts = np.ones(len(values), dtype=bool)
+    np.not_equal(values[1:], values[:-1], out=starts[1:])
+    if not return_counts:
+        return values[starts]
+    positions = np.flatnonzero(starts)
+    return values[positions], np.diff(np.append(positions, len(values)))
+
+
+def _search(run, sorted_hashes):
+    """sorted_hashes 中各值是否在有序数组 run 中，以及所在位置（按顺序查询，内存访问连续）"""
+    positions = np.searchsorted(run, sorted_hashes)
+    positions[positions == len(run)] = 0
+    return run[positions] == sorted_hashes, positions
+
+
+class SeenSet:
+    """已出现的指纹集合：若干个有序数组，新增的数组与前一个大小相近时合并
+
+    合并的总代价为 O(n log n)，查询时在每个数组中二分查找。
+    """
+
+    def __init__(self, runs=()):
+        self._runs = [run for run in runs if len(run)]
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    def copy(self):
+        # 各数组创建后不再修改，可以共用
+        return SeenSet(self._runs)
+
+    def contains(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        order = np.argsort(hashes)
+        sorted_hashes = hashes[order]
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            found[order] |= _search(run, sorted_hashes)[0]
+        return found
+
+    def add(self, hashes):
+        run = sorted_unique(hashes)
+        if not len(run):
+            return
+        self._runs.append(run)
+        while len(self._runs) > 1 and len(self._runs[-1]) * 2 >= len(self._runs[-2]):
+            last = self._runs.pop()
+            self._runs[-1] = sorted_unique(np.concatenate([self._runs[-1], last]))
+
+    def values(self):
+        """合并为一个有序数组"""
+        if len(self._runs) > 1:
+            self._runs = [sorted_unique(np.concatenate(self._runs))]
+        return self._runs[0] if self._runs else np.empty(0, dtype=np.uint64)
+
+    def save(self, path):
+        """先写入临时文件再替换，避免读取到不完整的文件"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.values())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取保存的集合，文件不存在或损坏时返回空集合"""
+        try:
+            return cls([np.load(path)])
+        except (OSError, ValueError):
+            return cls()
+
+
+class KeyCounts:
+    """当前文件中各键已出现的次数：与 SeenSet 相同，按若干个 (有序键数组, 次数数组) 保存
+
+    查询一个块只需在每个数组中二分查找该块的键，代价不随文件中已有的键数线性增长。
+    """
+
+    def __init__(self):
+        self._runs = []
+
+    def lookup(self, keys):
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        counts = np.zeros(len(keys), dtype=np.int64)
+        for run_keys, run_counts in self._runs:
+            found, positions = _search(run_keys, sorted_keys)
+            counts[order[found]] += run_counts[positions[found]]
+        return counts
+
+    def add(self, keys):
+        run_keys, run_counts = sorted_unique(keys, return_counts=True)
+        if not len(run_keys):
+            return
+        self._runs.append((run_keys, run_counts))
+        while len(self._runs) > 1 and len(self._runs[-1][0]) * 2 >= len(self._runs[-2][0]):
+            last_keys, last_counts = self._runs.pop()
+            keys = np.concatenate([self._runs[-1][0], last_keys])
+            counts = np.concatenate([self._runs[-1][1], last_counts])
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            starts = np.ones(len(keys), dtype=bool)
+            np.not_equal(keys[1:], keys[:-1], out=starts[1:])
+            positions = np.flatnonzero(starts)
+            self._runs[-1] = (keys[positions], np.add.reduceat(counts[order], positions))
+
+
+class Deduplicator:
+    """按文件依次去除重复订单：start_file() 后把该文件的各块依次交给 filter()
+
+    seen 可以是任何提供 contains(hashes) 和 add(hashes) 的指纹集合（如订单库中的指纹）。
+    """
+
+    def __init__(self, seen=None):
+        self.seen = seen if seen is not None else SeenSet()
+        self.removed = 0
+        self._counts = None
+
+    def start_file(self):
+        """开始一个新文件（键的出现次序从0重新编号）"""
+        self._counts = KeyCounts()
+
+    def filter(self, df):
+        """返回 df 中没有在之前的文件中出现过的行"""
+        if self._counts is None:
+            self.start_file()
+        keys = row_keys(df)
+        # 键在本文件中的出现次序（接着前面的块编号）
+        previous = self._counts.lookup(keys)
+        occurrence = previous + pd.Series(keys).groupby(keys).cumcount().to_numpy()
+        self._counts.add(keys)
+
+        fingerprints = pd.util.hash_pandas_object(
+            pd.DataFrame({'key': keys, 'occurrence': occurrence}), index=False).to_numpy()
+        duplicated = self.seen.contains(fingerprints)
+        self.seen.add(fingerprints[~duplicated])
+        self.removed += int(duplicated.sum())
+        if not duplicated.any():
+            return df
+        return df[~duplicated]
+
+
+def combine_order_frames(frames, dedup=None, base=None):
+    """按顺序合并多个订单文件的数据表，去除后面的文件中与前面重复的订单
+
+    base 为之前合并好的订单表（其订单指纹已在 dedup 中；dedup 为空时先记录它的指纹），
+    新文件中去重后的订单追加在它后面。
+    返回合并后的数据表，累计去除的行数记录在 attrs[DUPLICATE_COUNT_ATTR] 中。
+    """
+    dedup = dedup or Deduplicator()
+    removed = 0
+    parts = []
+    if base is not None:
+        if not len(dedup.seen):
+            dedup.start_file()
+            dedup.filter(base)
+        removed = base.attrs.get(DUPLICATE_COUNT_ATTR, 0)
+        parts.append(base)
+    removed_before = dedup.removed
+    for df in frames:
+        dedup.start_file()
+        parts.append(dedup.filter(df))
+    combined = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+    combined.attrs[DUPLICATE_COUNT_ATTR] = removed + dedup.removed - removed_before
+    return combined
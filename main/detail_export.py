@@ -0,0 +1,189 @@
+"""逐单明细导出：分块写入 CSV / Parquet / XLSX，内存占用与订单数无关"""
+import os
+
+import pandas as pd
+
+from analysis import check_cancelled
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不能导出 Parquet
+    pq = None
+
+try:
+    import xlsxwriter
+except ImportError:  # 未安装 xlsxwriter 时使用 openpyxl 的只写模式
+    xlsxwriter = None
+
+# Excel 工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1_048_576
+
+# 内存中的逐单明细每次写入的行数
+DEFAULT_EXPORT_CHUNK_SIZE = 100_000
+
+# 只在计算时使用、不导出的列
+INTERNAL_COLUMNS = ['状态分类']
+
+DETAIL_FORMATS = ('.csv', '.parquet', '.xlsx')
+
+
+class ExportError(Exception):
+    """导出逐单明细时的错误（如格式不支持或缺少依赖）"""
+
+
+def detail_frame(merged_df):
+    """整理为导出用的表格：去掉内部列，分类列还原为原始取值"""
+    df = merged_df.drop(columns=[c for c in INTERNAL_COLUMNS if c in merged_df.columns])
+    categorical = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if categorical:
+        df = df.astype({c: object for c in categorical})
+    return df
+
+
+def iter_frame_chunks(df, chunksize=DEFAULT_EXPORT_CHUNK_SIZE):
+    """把内存中的数据表按行切分为多个块（不复制数据）"""
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def _python_rows(df):
+    """逐行生成 Python 原生类型的值，缺失值为 None（供 Excel 写入）"""
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        missing = values.isna().to_numpy()
+        columns.append([None if m else v for v, m in zip(values.tolist(), missing)])
+    return zip(*columns)
+
+
+class CsvDetailWriter:
+    """CSV 使用 utf-8-sig 编码（与导出结果相同，便于 Excel 打开），表头只写一次"""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetDetailWriter:
+    """Parquet 每块写入一个行组，各块的列类型与第一块一致"""
+
+    def __init__(self, path):
+        if pq is None:
+            raise ExportError("导出 Parquet 格式需要安装 pyarrow")
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        schema = None if self._writer is None else self._writer.schema
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class XlsxDetailWriter:
+    """XLSX 逐行写入（xlsxwriter 常量内存模式或 openpyxl 只写模式）
+
+    超过 Excel 行数上限时续写到新的工作表（明细、明细2、……），每个工作表都有表头。
+    """
+
+    def __init__(self, path, max_rows=EXCEL_MAX_ROWS):
+        self.max_rows = max_rows
+        self._sheet = None
+        self._sheet_count = 0
+        self._row = 0
+        self._columns = None
+        if xlsxwriter is not None:
+            self._workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            self._path = None
+        else:
+            try:
+                from openpyxl import Workbook
+            except ImportError:
+                raise ExportError("导出 xlsx 格式需要安装 xlsxwriter 或 openpyxl") from None
+            self._workbook = Workbook(write_only=True)
+            self._path = path
+
+    def _new_sheet(self):
+        self._sheet_count += 1
+        name = "明细" if self._sheet_count == 1 else f"明细{self._sheet_count}"
+        if xlsxwriter is not None:
+            self._sheet = self._workbook.add_worksheet(name)
+        else:
+            self._sheet = self._workbook.create_sheet(name)
+        self._row = 0
+        self._append(self._columns)
+
+    def _append(self, values):
+        if xlsxwriter is not None:
+            self._sheet.write_row(self._row, 0, values)
+        else:
+            self._sheet.append(values)
+        self._row += 1
+
+    def write(self, df):
+        if self._columns is None:
+            self._columns = [str(c) for c in df.columns]
+        for values in _python_rows(df):
+            if self._sheet is None or self._row >= self.max_rows:
+                self._new_sheet()
+            self._append(values)
+
+    def close(self):
+        if self._columns is None:
+            # 没有数据时也生成一个只有表头的工作表
+            self._columns = []
+            self._new_sheet()
+        if self._path is None:
+            self._workbook.close()
+        else:
+            self._workbook.save(self._path)
+
+
+def open_detail_writer(path):
+    """按扩展名选择写入器"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CsvDetailWriter(path)
+    if ext == '.parquet':
+        return ParquetDetailWriter(path)
+    if ext == '.xlsx':
+        return XlsxDetailWriter(path)
+    raise ExportError(f"不支持的导出格式: {ext or path}（支持 {', '.join(DETAIL_FORMATS)}）")
+
+
+def write_detail(chunks, path, progress=None, cancel_event=None):
+    """把逐单明细块依次写入文件，返回写入的行数
+
+    progress(rows_written) 在每块写入后调用；cancel_event 被设置或出错时删除未写完的文件。
+    """
+    writer = open_detail_writer(path)
+    rows = 0
+    completed = False
+    try:
+        for chunk in chunks:
+            check_cancelled(cancel_event)
+            writer.write(detail_frame(chunk))
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows)
+        completed = True
+    finally:
+        try:
+            writer.close()
+        finally:
+            if not completed and os.path.exists(path):
+                os.remove(path)
+    return rows
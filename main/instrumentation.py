@@ -0,0 +1,265 @@
+"""分阶段性能记录：耗时、输入输出行数和内存峰值，可写入 JSON 日志"""
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录进程内存峰值
+    resource = None
+
+# 默认日志目录和保留的日志数量
+DEFAULT_LOG_DIR = os.path.join(os.path.expanduser('~'), '.profit_calculator', 'logs')
+MAX_LOG_FILES = 50
+
+# tracemalloc 是进程级的，多个同时进行的记录共用一次 start/stop
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def max_rss_bytes():
+    """进程启动以来的最大常驻内存（字节），无法获取时返回 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def count_rows(value):
+    """估计阶段结果的行数：数据表/数组取长度，元组取第一个元素，其他返回 None"""
+    if isinstance(value, tuple):
+        return count_rows(value[0]) if value else None
+    if hasattr(value, 'shape') or isinstance(value, list):
+        return len(value)
+    return None
+
+
+class StageRecord:
+    """一个阶段的记录；同名阶段多次执行（如流式分析的每一块）时累加"""
+
+    def __init__(self, name, label):
+        self.name = name
+        self.label = label
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows_in = None
+        self.rows_out = None
+        self.peak_bytes = None
+        self.max_rss_bytes = None
+        self.reused = False
+
+    def add_rows(self, attr, rows):
+        if rows is not None:
+            setattr(self, attr, (getattr(self, attr) or 0) + rows)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'label': self.label,
+            'seconds': round(self.seconds, 6),
+            'calls': self.calls,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_mb': None if self.peak_bytes is None else round(self.peak_bytes / 1024 ** 2, 3),
+            'max_rss_mb': None if self.max_rss_bytes is None else round(self.max_rss_bytes / 1024 ** 2, 1),
+            'reused': self.reused,
+        }
+
+
+class _RowsSetter:
+    """stage() 返回给调用方的对象，用于在阶段结束前设置输出行数"""
+
+    def __init__(self):
+        self.rows_out = None
+
+
+class RunProfiler:
+    """记录一次运行（加载文件或分析）中各阶段的耗时、行数和内存
+
+    耗时和行数总是记录；track_memory 为真时用 tracemalloc 记录各阶段新分配内存的峰值
+    （会使运行变慢，且同时进行的其他任务的分配也会计入）；profile 为真时对每个阶段
+    做 cProfile 剖析，写日志时只保存最慢阶段的剖析结果。
+    """
+
+    def __init__(self, kind, track_memory=False, profile=False):
+        self.kind = kind
+        self.track_memory = track_memory
+        self.profile = profile
+        self.started_at = datetime.datetime.now()
+        self.records = {}
+        self.total_seconds = None
+        self._start = time.perf_counter()
+        self._profiles = {}
+        self._lock = threading.Lock()
+        if track_memory:
+            _start_tracing()
+
+    def _record(self, name, label):
+        with self._lock:
+            record = self.records.get(name)
+            if record is None:
+                record = self.records[name] = StageRecord(name, label or name)
+            return record
+
+    @contextlib.contextmanager
+    def stage(self, name, label=None, rows_in=None):
+        """记录一个阶段：with profiler.stage(...) as stage: ...; stage.rows_out = n"""
+        record = self._record(name, label)
+        setter = _RowsSetter()
+        profiler = cProfile.Profile() if self.profile else None
+        if self.track_memory:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # 其他线程正在剖析（Python 3.12 起剖析器是进程级的），本阶段不剖析
+                profiler = None
+        try:
+            yield setter
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.seconds += time.perf_counter() - start
+            record.calls += 1
+            record.add_rows('rows_in', rows_in)
+            record.add_rows('rows_out', setter.rows_out)
+            record.max_rss_bytes = max_rss_bytes()
+            if self.track_memory:
+                peak = max(tracemalloc.get_traced_memory()[1] - current, 0)
+                record.peak_bytes = max(record.peak_bytes or 0, peak)
+            if profiler is not None:
+                with self._lock:
+                    if name in self._profiles:
+                        self._profiles[name].append(profiler)
+                    else:
+                        self._profiles[name] = [profiler]
+
+    def reused(self, name, label=None):
+        """记录一个直接复用缓存结果、未重新计算的阶段"""
+        record = self._record(name, label)
+        record.reused = True
+
+    def child(self, prefix, label_prefix=''):
+        """返回一个给阶段名加前缀的视图，用于区分同一运行中不同数据表的同类阶段"""
+        return _ScopedProfiler(self, prefix, label_prefix)
+
+    def finish(self):
+        """结束记录并返回总耗时"""
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._start
+            if self.track_memory:
+                _stop_tracing()
+        return self.total_seconds
+
+    def hot_stage(self):
+        """耗时最长的阶段记录"""
+        records = [record for record in self.records.values() if record.calls]
+        return max(records, key=lambda record: record.seconds, default=None)
+
+    def summary_text(self, limit=4):
+        """状态栏显示的简短耗时明细，例如 "耗时 2.31s: 合并 1.20s, 盈亏计算 0.40s" """
+        total = self.finish()
+        records = sorted((r for r in self.records.values() if r.calls),
+                         key=lambda r: r.seconds, reverse=True)[:limit]
+        parts = [f"{record.label} {record.seconds:.2f}s" for record in records]
+        return f"耗时 {total:.2f}s" + (": " + ", ".join(parts) if parts else "")
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': round(self.finish(), 6),
+            'track_memory': self.track_memory,
+            'stages': [record.to_dict() for record in self.records.values()],
+        }
+
+    def write_log(self, log_dir=DEFAULT_LOG_DIR, extra=None):
+        """把本次运行的记录写成 JSON 文件，开启剖析时同时保存最慢阶段的 .prof 文件
+
+        返回 JSON 文件路径；只保留最近的 MAX_LOG_FILES 份日志。
+        """
+        data = self.to_dict()
+        if extra:
+            data.update(extra)
+        os.makedirs(log_dir, exist_ok=True)
+        base = os.path.join(log_dir, f"{self.started_at:%Y%m%d-%H%M%S-%f}-{self.kind}")
+
+        hot = self.hot_stage()
+        if hot is not None and hot.name in self._profiles:
+            profiles = self._profiles[hot.name]
+            profiles[0].create_stats()
+            stats = pstats.Stats(profiles[0])
+            for extra_profile in profiles[1:]:
+                stats.add(extra_profile)
+            stats.dump_stats(base + '.prof')
+            data['profile'] = {'stage': hot.name, 'path': base + '.prof'}
+
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        _prune_logs(log_dir)
+        return base + '.json'
+
+
+class _ScopedProfiler:
+    def __init__(self, parent, prefix, label_prefix):
+        self.parent = parent
+        self.prefix = prefix
+        self.label_prefix = label_prefix
+
+    def stage(self, name, label=None, rows_in=None):
+        return self.parent.stage(f"{self.prefix}.{name}", self.label_prefix + (label or name), rows_in)
+
+    def reused(self, name, label=None):
+        self.parent.reused(f"{self.prefix}.{name}", self.label_prefix + (label or name))
+
+
+@contextlib.contextmanager
+def _untracked_stage():
+    yield _RowsSetter()
+
+
+def timed_stage(profiler, name, label=None, rows_in=None):
+    """profiler 为 None 时不做记录的 profiler.stage()"""
+    if profiler is None:
+        return _untracked_stage()
+    return profiler.stage(name, label, rows_in)
+
+
+def _prune_logs(log_dir):
+    """删除最旧的日志，只保留最近的 MAX_LOG_FILES 次运行"""
+    names = sorted(name for name in os.listdir(log_dir) if name.endswith('.json'))
+    for name in names[:-MAX_LOG_FILES]:
+        for ext in ('.json', '.prof'):
+            path = os.path.join(log_dir, name[:-len('.json')] + ext)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,307 @@
+"""数据文件读取（CSV/Excel）"""
+import codecs
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import chardet
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # 未安装 pyarrow 时使用 pandas 的 C 解析器
+    pa_csv = None
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:  # 未安装 python-calamine 时使用 pandas 默认的 Excel 引擎
+    EXCEL_ENGINE = None
+
+# 自动检测的编码无法解码时依次尝试的编码
+FALLBACK_ENCODINGS = ['gbk', 'gb2312', 'utf-8', 'latin1', 'iso-8859-1']
+
+# 流式读取时每块的默认行数
+DEFAULT_CHUNK_SIZE = 200000
+
+
+# 编码检测时采样的字节数
+SAMPLE_SIZE = 10000
+
+# 按 (路径, 文件大小, 修改时间) 缓存的编码判断结果，同一文件再次读取时跳过检测
+_encoding_cache = {}
+
+
+def _cache_key(file_path):
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _can_decode(sample, encoding):
+    """判断采样能否用指定编码解码（采样末尾被截断的多字节字符不算错误）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def _guess_encoding(sample):
+    """根据文件开头的采样判断编码"""
+    result = chardet.detect(sample)
+    encoding = result.get('encoding') or 'utf-8'
+    confidence = result.get('confidence') or 0
+
+    # 如果置信度低于阈值，用同一份采样尝试常见的中文编码
+    if confidence < 0.7:
+        for enc in ['gbk', 'gb2312', 'utf-8']:
+            if _can_decode(sample, enc):
+                return enc
+    return encoding
+
+
+def detect_encoding(file_path):
+    """检测文件编码（只读取一次文件开头的采样，结果按文件缓存）"""
+    try:
+        key = _cache_key(file_path)
+        cached = _encoding_cache.get(key)
+        if cached:
+            return cached
+        with open(file_path, 'rb') as f:
+            sample = f.read(SAMPLE_SIZE)
+        encoding = _guess_encoding(sample)
+        _encoding_cache[key] = encoding
+        return encoding
+    except Exception as e:
+        # 如果检测失败，返回常见的中文编码
+        return 'gbk'
+
+
+def remember_encoding(file_path, encoding):
+    """记录文件实际使用的编码，下次读取同一文件时直接使用"""
+    try:
+        _encoding_cache[_cache_key(file_path)] = encoding
+    except OSError:
+        pass
+
+
+def candidate_encodings(file_path, encoding_setting='auto'):
+    """返回按顺序尝试的编码列表：检测到（或指定）的编码在前，其余常见编码在后"""
+    if encoding_setting == 'auto':
+        encoding = detect_encoding(file_path)
+    else:
+        encoding = encoding_setting
+    return [encoding] + [enc for enc in FALLBACK_ENCODINGS if enc != encoding]
+
+
+class TranscodingReader(io.TextIOBase):
+    """边读取边解码的文本文件对象
+
+    按块读取原始字节并用当前编码增量解码；某一块解码失败时，
+    从这一块（连同上一块末尾未解码完的字节）起改用下一个候选编码，
+    之前已经解码的内容保留不变，不会重新读取整个文件。
+    """
+
+    def __init__(self, file_path, encodings, block_size=1 << 20):
+        self.file_path = file_path
+        self._encodings = list(encodings)
+        self._index = 0
+        self._decoder = self._new_decoder()
+        self._raw = open(file_path, 'rb')
+        self._block_size = block_size
+        self._buffer = ''
+        self._eof = False
+        self.switched = False
+
+    @property
+    def encoding(self):
+        return self._encodings[self._index]
+
+    def readable(self):
+        return True
+
+    def _new_decoder(self):
+        return codecs.getincrementaldecoder(self.encoding)(errors='strict')
+
+    def _fill(self):
+        """读取并解码下一块数据，到达文件末尾时返回 False"""
+        if self._eof:
+            return False
+        block = self._raw.read(self._block_size)
+        final = not block
+        while True:
+            pending = self._decoder.getstate()[0]
+            try:
+                self._buffer += self._decoder.decode(block, final=final)
+                break
+            except UnicodeDecodeError:
+                if self._index == len(self._encodings) - 1:
+                    raise
+                # 切换到下一个候选编码，只重新解码当前块
+                self._index += 1
+                self._decoder = self._new_decoder()
+                self.switched = True
+                block = pending + block
+        if final:
+            self._eof = True
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while self._fill():
+                pass
+            size = len(self._buffer)
+        else:
+            while len(self._buffer) < size and self._fill():
+                pass
+        text, self._buffer = self._buffer[:size], self._buffer[size:]
+        return text
+
+    def readline(self, size=-1):
+        while '\n' not in self._buffer and self._fill():
+            pass
+        end = self._buffer.find('\n') + 1 or len(self._buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        line, self._buffer = self._buffer[:end], self._buffer[end:]
+        return line
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+            # 读取中途切换过编码时，记录最终使用的编码
+            if self.switched:
+                remember_encoding(self.file_path, self.encoding)
+        super().close()
+
+
+def open_csv_text(file_path, encoding_setting='auto'):
+    """以自动校验编码的文本方式打开CSV文件"""
+    return TranscodingReader(file_path, candidate_encodings(file_path, encoding_setting))
+
+
+def read_csv_with_encoding(file_path, encoding_setting='auto', **kwargs):
+    """使用指定编码读取CSV文件，解码失败时在读取过程中切换编码"""
+    with open_csv_text(file_path, encoding_setting) as reader:
+        try:
+            return pd.read_csv(reader, **kwargs)
+        except UnicodeDecodeError:
+            # 如果所有编码都失败，抛出异常
+            raise Exception(f"无法读取文件 {file_path}，尝试了多种编码均失败")
+
+
+def read_header(file_path, encoding_setting='auto'):
+    """只读取表头，返回列名列表"""
+    if file_path.endswith('.csv'):
+        return list(read_csv_with_encoding(file_path, encoding_setting, nrows=0).columns)
+    return list(pd.read_excel(file_path, nrows=0, engine=EXCEL_ENGINE).columns)
+
+
+def _read_csv_arrow(file_path, encoding_setting, usecols, text_columns):
+    """用 pyarrow 多线程解析整个CSV文件；无法解码等失败时返回 None"""
+    encoding = candidate_encodings(file_path, encoding_setting)[0]
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=list(usecols or []),
+        column_types={column: pa.string() for column in text_columns},
+        # 与 pandas 一致：空字符串读取为缺失值
+        strings_can_be_null=True,
+    )
+    try:
+        table = pa_csv.read_csv(file_path,
+                                read_options=pa_csv.ReadOptions(encoding=encoding, use_threads=True),
+                                convert_options=convert_options)
+    except (pa.ArrowInvalid, UnicodeDecodeError, LookupError):
+        return None
+    return table.to_pandas()
+
+
+def read_table(file_path, encoding_setting='auto', nrows=None, usecols=None, text_columns=()):
+    """按扩展名读取CSV或Excel文件
+
+    nrows 不为空时只读取前几行；usecols 不为空时只读取这些列；
+    text_columns 中的列按文本读取，不做类型推断。
+    安装了 pyarrow 时完整读取CSV使用多线程解析（失败时改用逐块校验编码的读取方式），
+    安装了 python-calamine 时用它读取Excel。
+    """
+    dtype = {column: str for column in text_columns} or None
+    if file_path.endswith('.csv'):
+        if nrows is None and pa_csv is not None:
+            df = _read_csv_arrow(file_path, encoding_setting, usecols, text_columns)
+            if df is not None:
+                return df
+        return read_csv_with_encoding(file_path, encoding_setting, nrows=nrows, usecols=usecols, dtype=dtype)
+    return pd.read_excel(file_path, nrows=nrows, usecols=usecols, dtype=dtype, engine=EXCEL_ENGINE)
+
+
+def _iter_csv_chunks(file_path, encoding_setting, chunksize, usecols, dtype):
+    with open_csv_text(file_path, encoding_setting) as text:
+        with pd.read_csv(text, chunksize=chunksize, usecols=usecols, dtype=dtype) as reader:
+            for chunk in reader:
+                yield chunk
+
+
+def _cell_text(value):
+    """与 pd.read_excel(dtype=str) 相同地把单元格转为文本：空单元格保持缺失，整数值的浮点数不带小数点"""
+    if pd.isna(value):
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _iter_xlsx_chunks(file_path, chunksize, usecols=None, text_columns=()):
+    """用 openpyxl 只读模式逐行读取xlsx，按块生成数据框"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+        # 只保留需要的列
+        positions = [i for i, col in enumerate(columns) if usecols is None or col in usecols]
+        columns = [columns[i] for i in positions]
+
+        # openpyxl 把数字单元格读为数值：text_columns 中的列与 read_table 一样转为文本，
+        # 否则数字订单号等在流式读取和整表读取时类型不同，去重指纹也随之不同
+        text = [column for column in columns if column in set(text_columns)]
+
+        def make_chunk(buffer):
+            if usecols is None:
+                df = pd.DataFrame(buffer, columns=columns)
+            else:
+                df = pd.DataFrame([[row[i] if i < len(row) else None for i in positions] for row in buffer],
+                                  columns=columns)
+            for column in text:
+                df[column] = pd.Series([_cell_text(value) for value in df[column]], index=df.index)
+            return df
+
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunksize:
+                yield make_chunk(buffer)
+                buffer = []
+        if buffer:
+            yield make_chunk(buffer)
+    finally:
+        workbook.close()
+
+
+def iter_table_chunks(file_path, encoding_setting='auto', chunksize=DEFAULT_CHUNK_SIZE,
+                      usecols=None, text_columns=()):
+    """按固定行数分块读取数据文件，内存占用只与块大小有关
+
+    CSV 边读取边校验编码并分块解析；xlsx 使用 openpyxl 只读模式逐行读取；
+    其他格式（如 .xls）无法流式读取，整体读取后作为一个块返回。
+    usecols / text_columns 的含义与 read_table 相同。
+    """
+    dtype = {column: str for column in text_columns} or None
+    if file_path.endswith('.csv'):
+        return _iter_csv_chunks(file_path, encoding_setting, chunksize, usecols, dtype)
+    if file_path.endswith('.xlsx'):
+        return _iter_xlsx_chunks(file_path, chunksize, usecols, text_columns)
+    return iter([pd.read_excel(file_path, usecols=usecols, dtype=dtype, engine=EXCEL_ENGINE)])
@@ -0,0 +1,69 @@
+"""对照表的键→值查找索引（替代每次分析时的 pd.merge）"""
+import numpy as np
+import pandas as pd
+
+_NUMERIC_TYPES = {'integer', 'floating', 'mixed-integer-float', 'decimal'}
+
+
+def _key_kind(values):
+    """粗略判断键列是数值还是字符串，用于发现两张表的键类型不一致"""
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred in _NUMERIC_TYPES:
+        return 'number'
+    if inferred == 'string':
+        return 'string'
+    return None
+
+
+class LookupIndex:
+    """由对照表建立的查找索引：键唯一，重复键在建立时保留第一条并记录数量
+
+    查找结果与订单逐行对齐，输出行数始终等于输入行数。
+    """
+
+    def __init__(self, key_columns, index, values, duplicate_count):
+        self.key_columns = list(key_columns)
+        self.index = index
+        # 末尾追加一个缺失值，未匹配的位置（-1）正好取到它
+        if values.dtype.kind in 'iuf':
+            values = values.astype('float64')
+        else:
+            values = values.astype(object)
+        self._values = np.append(values, [np.nan])
+        self.duplicate_count = duplicate_count
+
+    @classmethod
+    def build(cls, df, key_columns, value_column):
+        """由数据表建立索引，重复键保留第一条"""
+        key_columns = list(key_columns)
+        duplicate_mask = df.duplicated(subset=key_columns, keep=False)
+        duplicate_count = int(duplicate_mask.sum())
+        if duplicate_count:
+            df = df.drop_duplicates(subset=key_columns, keep='first')
+
+        if len(key_columns) == 1:
+            index = pd.Index(df[key_columns[0]])
+        else:
+            index = pd.MultiIndex.from_frame(df[key_columns])
+        return cls(key_columns, index, df[value_column].to_numpy(), duplicate_count)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _check_key_types(self, df):
+        for i, column in enumerate(self.key_columns):
+            own = self.index if len(self.key_columns) == 1 else self.index.get_level_values(i)
+            own_kind, order_kind = _key_kind(own), _key_kind(df[column])
+            if own_kind and order_kind and own_kind != order_kind:
+                raise ValueError(f"订单表与对照表的 {column} 列类型不一致（{order_kind} / {own_kind}），无法匹配")
+
+    def positions(self, df):
+        """返回订单每一行在索引中的位置，未匹配为 -1"""
+        self._check_key_types(df)
+        if len(self.key_columns) == 1:
+            return self.index.get_indexer(df[self.key_columns[0]])
+        return self.index.get_indexer(pd.MultiIndex.from_frame(df[self.key_columns]))
+
+    def lookup(self, df):
+        """按订单的键列查找对应的值，未匹配为缺失值"""
+        return self._values[self.positions(df)]
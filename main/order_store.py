@@ -0,0 +1,397 @@
+"""增量订单库：订单批次追加到本地 SQLite，按运营人员和状态的汇总随每个批次增量更新
+
+月中每天追加一批订单时，只需计算新批次的订单，报告直接由汇总表得到；
+已导入过的批次（文件内容相同）会被识别并跳过；与之前批次重叠的订单（如周报与日报）
+按订单指纹去除，已导入订单的指纹与批次在同一个事务中保存在订单库中，导入新批次时只计算新文件的指纹。
+"""
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from analysis import (
+    AnalysisResult, JoinSummary, as_paths, format_summary, read_analysis_table, run_analysis
+)
+from cube import STATUS, STATUS_CODE, status_labels
+from dedup import Deduplicator, SeenSet
+from result_cache import rules_fingerprint
+from status_rules import count_flags
+from summary import PROFIT_COUNT, finalize_summary, partial_summary
+from table_cache import file_fingerprint
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser('~'), '.profit_calculator', 'orders.sqlite')
+
+# 订单库保存的逐单列（没有的列保存为空）
+ORDER_COLUMNS = ['商品ID', '商品编码', '订单状态', '实收金额', '商品数量', '运费', '订单日期',
+                 '运营人员', '商品成本', STATUS_CODE, '盈亏', '待确认盈利']
+# 重新计算时读取的原始订单列
+RAW_COLUMNS = ['商品ID', '商品编码', '订单状态', '实收金额', '商品数量', '运费', '订单日期']
+
+# 重新计算汇总时每次读取的订单行数
+REBUILD_CHUNK_SIZE = 200_000
+
+
+def frame_fingerprint(df):
+    """数据表内容（含列名）的哈希值"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(json.dumps([str(c) for c in df.columns], ensure_ascii=False).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def mapping_fingerprint(operator_df, cost_df):
+    """对照表内容和计算规则的版本；变化时订单库中的运营人员、成本和汇总需要重新计算"""
+    return f"{frame_fingerprint(operator_df)}-{frame_fingerprint(cost_df)}-{rules_fingerprint()}"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _summary_columns():
+    """按运营人员汇总表的指标列（与 partial_summary 的列相同）"""
+    count_names, _ = count_flags()
+    return ['订单总数'] + count_names + ['总盈亏', '待确认盈利总额', PROFIT_COUNT]
+
+
+STATUS_MEASURES = ['订单行数', '总盈亏', '待确认盈利总额']
+
+
+class StoredSeenSet:
+    """订单库中已导入订单的指纹，供 Deduplicator 使用
+
+    查询在订单库中进行；本批次新增的指纹（new）保存在内存中，由 add_batch 与批次一起写入。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.new = SeenSet()
+
+    def __len__(self):
+        return self.store.seen_count() + len(self.new)
+
+    def contains(self, hashes):
+        return self.store.contains_seen(hashes) | self.new.contains(hashes)
+
+    def add(self, hashes):
+        self.new.add(hashes)
+
+
+class OrderStore:
+    """本地 SQLite 订单库
+
+    - batches：已导入的批次（文件内容哈希唯一）及各批次的统计
+    - orders：逐单明细，按 商品ID / 商品编码 建立索引
+    - operator_summary / status_summary：按运营人员、按运营人员 × 状态的可累加汇总，
+      每导入一个批次只把该批次的汇总加进去
+    - seen_orders：已导入订单的指纹（uint64 按位存为有符号整数），与批次一起写入
+    对照表或计算规则变化时，由已保存的原始订单列重新匹配并重建汇总。
+    每次操作使用单独的连接，可以在后台线程中调用。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        # 较早版本把已导入订单的指纹保存在订单库旁边的文件中，打开时移入订单库
+        self.legacy_seen_path = os.path.splitext(path)[0] + '-seen.npy'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as con:
+            self._create_tables(con)
+        if os.path.exists(self.legacy_seen_path):
+            with self._connect() as con:
+                self._add_seen(con, SeenSet.load(self.legacy_seen_path).values())
+            os.remove(self.legacy_seen_path)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """打开连接并在一个事务中执行（正常结束时提交，出错时回滚），结束后关闭连接
+
+        sqlite3 连接本身的 with 只提交或回滚而不关闭，未关闭的连接在 Windows 上会锁住数据库文件。
+        """
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _create_tables(self, con):
+        order_columns = ", ".join(_quote(c) for c in ORDER_COLUMNS)
+        summary_columns = ", ".join(f"{_quote(c)} REAL NOT NULL DEFAULT 0" for c in _summary_columns())
+        status_columns = ", ".join(f"{_quote(c)} REAL NOT NULL DEFAULT 0" for c in STATUS_MEASURES)
+        con.executescript(f"""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL UNIQUE,
+                file_name TEXT,
+                imported_at TEXT,
+                order_count INTEGER,
+                other_count INTEGER,
+                missing_cost_count INTEGER,
+                duplicate_count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS orders (batch_id INTEGER NOT NULL, {order_columns});
+            CREATE INDEX IF NOT EXISTS orders_product_id ON orders ("商品ID");
+            CREATE INDEX IF NOT EXISTS orders_product_code ON orders ("商品编码");
+            CREATE INDEX IF NOT EXISTS orders_batch ON orders (batch_id);
+            CREATE TABLE IF NOT EXISTS operator_summary ("运营人员" TEXT PRIMARY KEY, {summary_columns});
+            CREATE TABLE IF NOT EXISTS status_summary (
+                "运营人员" TEXT NOT NULL, "{STATUS_CODE}" INTEGER NOT NULL, {status_columns},
+                PRIMARY KEY ("运营人员", "{STATUS_CODE}")
+            );
+            CREATE TABLE IF NOT EXISTS seen_orders (fingerprint INTEGER PRIMARY KEY);
+        """)
+        # 较早版本创建的订单库没有重复订单数列
+        batch_columns = [row[1] for row in con.execute("PRAGMA table_info(batches)")]
+        if 'duplicate_count' not in batch_columns:
+            con.execute("ALTER TABLE batches ADD COLUMN duplicate_count INTEGER NOT NULL DEFAULT 0")
+
+    def _meta(self, con, key, default=None):
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def _set_meta(self, con, key, value):
+        con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False)))
+
+    def has_batch(self, fingerprint):
+        with self._connect() as con:
+            row = con.execute("SELECT 1 FROM batches WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return row is not None
+
+    def batches(self):
+        """已导入的批次列表"""
+        with self._connect() as con:
+            return pd.read_sql("SELECT * FROM batches ORDER BY batch_id", con)
+
+    def seen(self):
+        """已导入订单的指纹集合（在订单库中查询，不把已导入的指纹读入内存）"""
+        return StoredSeenSet(self)
+
+    def contains_seen(self, fingerprints):
+        """各指纹是否已导入：把待查的指纹写入临时表，按 seen_orders 的主键查找"""
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        with self._connect() as con:
+            con.execute("CREATE TEMP TABLE lookup (fingerprint INTEGER PRIMARY KEY)")
+            con.executemany("INSERT OR IGNORE INTO lookup (fingerprint) VALUES (?)",
+                            ((value,) for value in fingerprints.view(np.int64).tolist()))
+            found = [row[0] for row in con.execute(
+                "SELECT fingerprint FROM lookup JOIN seen_orders USING (fingerprint)")]
+        return np.isin(fingerprints, np.array(found, dtype=np.int64).view(np.uint64))
+
+    def seen_count(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM seen_orders").fetchone()[0]
+
+    def _add_seen(self, con, fingerprints):
+        values = np.asarray(fingerprints, dtype=np.uint64).view(np.int64)
+        con.executemany("INSERT OR IGNORE INTO seen_orders (fingerprint) VALUES (?)",
+                        ((value,) for value in values.tolist()))
+
+    def mapping(self):
+        """订单库当前使用的对照表和规则版本（空库为 None）"""
+        with self._connect() as con:
+            return self._meta(con, 'mapping')
+
+    def add_batch(self, fingerprint, file_name, result, mapping, fingerprints=None):
+        """把一个批次的分析结果（需包含逐单明细）追加到订单库并累加汇总
+
+        fingerprints 为该批次新增的订单指纹，与批次在同一个事务中写入。
+        返回 False 表示该批次已导入过（不做任何修改）。
+        """
+        merged_df = result.merged_df
+        with self._connect() as con:
+            if con.execute("SELECT 1 FROM batches WHERE fingerprint = ?", (fingerprint,)).fetchone():
+                return False
+            cursor = con.execute(
+                "INSERT INTO batches (fingerprint, file_name, imported_at, order_count, other_count,"
+                " missing_cost_count, duplicate_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, file_name, datetime.datetime.now().isoformat(timespec='seconds'),
+                 result.order_count, result.other_count, result.missing_cost_count,
+                 result.duplicate_count or 0))
+            self._insert_orders(con, cursor.lastrowid, merged_df)
+            self._add_summaries(con, merged_df)
+            self._set_meta(con, 'mapping', mapping)
+            self._set_join(con, result, result.quantity_col)
+            if fingerprints is not None:
+                self._add_seen(con, fingerprints)
+        return True
+
+    def _set_join(self, con, result, quantity_col):
+        """保存最近一次匹配的合并方式和对照表重复记录数（报告中显示）"""
+        self._set_meta(con, 'join', {
+            'merge_on_operator': list(result.merge_on_operator),
+            'operator_duplicate_count': result.operator_duplicate_count,
+            'cost_duplicate_count': result.cost_duplicate_count,
+            'quantity_col': quantity_col,
+        })
+
+    def _insert_orders(self, con, batch_id, merged_df):
+        rows = pd.DataFrame({'batch_id': batch_id}, index=merged_df.index)
+        for column in ORDER_COLUMNS:
+            if column == STATUS_CODE:
+                rows[column] = merged_df['状态分类'].cat.codes.astype('int64')
+            elif column in merged_df.columns:
+                values = merged_df[column]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    values = values.astype(object)
+                elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+                    values = values.dt.strftime('%Y-%m-%d %H:%M:%S')
+                rows[column] = values
+            else:
+                rows[column] = None
+        placeholders = ", ".join("?" for _ in rows.columns)
+        names = ", ".join(_quote(c) for c in rows.columns)
+        # 缺失值写为 NULL，numpy 数值转换为 Python 数值
+        values = rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None)
+        con.executemany(f"INSERT INTO orders ({names}) VALUES ({placeholders})", values)
+
+    def _add_summaries(self, con, merged_df):
+        """把一批订单的汇总加到汇总表上（同一运营人员 / 状态的计数和求和相加）"""
+        partial = partial_summary(merged_df)
+        columns = _summary_columns()
+        _upsert_add(con, 'operator_summary', ['运营人员'], columns,
+                    ([str(operator)] + [float(v) for v in row]
+                     for operator, row in zip(partial.index, partial[columns].to_numpy())))
+
+        status = pd.DataFrame({
+            '运营人员': merged_df['运营人员'].astype(object).to_numpy(),
+            STATUS_CODE: merged_df['状态分类'].cat.codes.to_numpy(),
+            '订单行数': 1.0,
+            '总盈亏': merged_df['盈亏'].to_numpy(dtype='float64'),
+            '待确认盈利总额': merged_df['待确认盈利'].to_numpy(dtype='float64'),
+        }).fillna({'总盈亏': 0.0, '待确认盈利总额': 0.0})
+        grouped = status.groupby(['运营人员', STATUS_CODE], sort=False)[STATUS_MEASURES].sum()
+        _upsert_add(con, 'status_summary', ['运营人员', STATUS_CODE], STATUS_MEASURES,
+                    ([str(operator), int(code)] + [float(v) for v in row]
+                     for (operator, code), row in zip(grouped.index, grouped.to_numpy())))
+
+    def report(self):
+        """由汇总表得到与一次性分析全部批次相同的按运营人员汇总结果（AnalysisResult）
+
+        订单库为空时返回 None。
+        """
+        with self._connect() as con:
+            partial = pd.read_sql("SELECT * FROM operator_summary ORDER BY \"运营人员\"", con,
+                                  index_col='运营人员')
+            totals = con.execute("SELECT COUNT(*), SUM(order_count), SUM(other_count),"
+                                 " SUM(missing_cost_count), SUM(duplicate_count) FROM batches").fetchone()
+            join = self._meta(con, 'join')
+        if not totals[0]:
+            return None
+        count_columns = [c for c in partial.columns if c not in ('总盈亏', '待确认盈利总额')]
+        partial[count_columns] = partial[count_columns].round().astype('int64')
+        result_df = format_summary(finalize_summary(partial))
+        indexes = JoinSummary(join['merge_on_operator'], join['operator_duplicate_count'],
+                              join['cost_duplicate_count'])
+        return AnalysisResult(result_df, None, indexes, join['quantity_col'],
+                              int(totals[1]), int(totals[2]), int(totals[3]), duplicate_count=int(totals[4]))
+
+    def status_report(self):
+        """按运营人员 × 状态的汇总（状态按盈亏计算规则显示名称）"""
+        with self._connect() as con:
+            df = pd.read_sql("SELECT * FROM status_summary", con)
+        df[STATUS] = status_labels(df[STATUS_CODE])
+        result = df.groupby(['运营人员', STATUS], sort=True)[STATUS_MEASURES].sum().reset_index()
+        result['订单行数'] = result['订单行数'].round().astype('int64')
+        return result
+
+    def rebuild(self, operator_df, cost_df, mapping, cancel_event=None):
+        """对照表或规则变化后，用保存的原始订单列重新匹配、计算盈亏并重建所有汇总"""
+        raw = ", ".join(_quote(c) for c in RAW_COLUMNS)
+        with self._connect() as con:
+            con.execute("DELETE FROM operator_summary")
+            con.execute("DELETE FROM status_summary")
+            batch_ids = [row[0] for row in con.execute("SELECT batch_id FROM batches ORDER BY batch_id")]
+            for batch_id in batch_ids:
+                orders = pd.read_sql(f"SELECT rowid AS row_id, {raw} FROM orders WHERE batch_id = ?",
+                                     con, params=(batch_id,))
+                orders = orders.set_index('row_id')
+                if orders['订单日期'].isna().all():
+                    orders = orders.drop(columns='订单日期')
+                result = run_analysis(orders, operator_df, cost_df, cancel_event=cancel_event)
+                merged_df = result.merged_df
+                con.executemany(
+                    f"UPDATE orders SET \"运营人员\" = ?, \"商品成本\" = ?, \"{STATUS_CODE}\" = ?,"
+                    " \"盈亏\" = ?, \"待确认盈利\" = ? WHERE rowid = ?",
+                    zip(merged_df['运营人员'].astype(object),
+                        merged_df['商品成本'].astype(object).where(merged_df['商品成本'].notna(), None),
+                        merged_df['状态分类'].cat.codes.astype(int).tolist(),
+                        merged_df['盈亏'].astype(float).tolist(),
+                        merged_df['待确认盈利'].astype(float).tolist(),
+                        merged_df.index.astype(int).tolist()))
+                con.execute("UPDATE batches SET other_count = ?, missing_cost_count = ? WHERE batch_id = ?",
+                            (result.other_count, result.missing_cost_count, batch_id))
+                self._add_summaries(con, merged_df)
+                self._set_join(con, result, self._meta(con, 'join', {}).get('quantity_col'))
+            self._set_meta(con, 'mapping', mapping)
+        return len(batch_ids)
+
+    def clear(self):
+        """删除所有批次、订单和汇总"""
+        with self._connect() as con:
+            for table in ('meta', 'batches', 'orders', 'operator_summary', 'status_summary', 'seen_orders'):
+                con.execute(f"DELETE FROM {table}")
+
+
+def _upsert_add(con, table, keys, columns, rows):
+    """插入汇总行；键已存在时把各指标加到已有的值上"""
+    names = [_quote(c) for c in keys + columns]
+    updates = ", ".join(f"{_quote(c)} = {_quote(c)} + excluded.{_quote(c)}" for c in columns)
+    con.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        f" ON CONFLICT ({', '.join(_quote(k) for k in keys)}) DO UPDATE SET {updates}",
+        rows)
+
+
+def run_store_analysis(store, order_path, operator_df, cost_df, encoding_setting='auto',
+                       order_df=None, indexes=None, progress=None, cancel_event=None, profiler=None):
+    """把订单文件作为批次导入订单库（已导入过则跳过），返回 (全部批次的汇总结果, 状态说明)
+
+    order_path 可以是多个订单文件，每个文件是一个批次；order_df 为已加载的（单个）订单表。
+    只有新批次的订单需要读取和计算，与之前批次重复的订单不计入；
+    对照表或规则与订单库中的不同时先重建订单库的汇总。
+    """
+    report = progress or (lambda stage: None)
+    mapping = mapping_fingerprint(operator_df, cost_df)
+    notes = []
+    stored_mapping = store.mapping()
+    if stored_mapping is not None and stored_mapping != mapping:
+        report('merge')
+        rebuilt = store.rebuild(operator_df, cost_df, mapping, cancel_event)
+        notes.append(f"对照表或计算规则已变化，已重新计算订单库中的 {rebuilt} 个批次")
+
+    order_paths = as_paths(order_path)
+    for path in order_paths:
+        fingerprint = file_fingerprint(path)
+        file_name = os.path.basename(path)
+        if store.has_batch(fingerprint):
+            notes.append(f"{file_name} 已导入过，跳过")
+            continue
+        batch_df = order_df if len(order_paths) == 1 else None
+        if batch_df is None:
+            report('read')
+            batch_df = read_analysis_table('order', path, encoding_setting)
+        dedup = Deduplicator(store.seen())
+        dedup.start_file()
+        batch_df = dedup.filter(batch_df)
+        result = run_analysis(batch_df, operator_df, cost_df, progress=progress,
+                              cancel_event=cancel_event, indexes=indexes, profiler=profiler)
+        result.duplicate_count = dedup.removed
+        store.add_batch(fingerprint, file_name, result, mapping, dedup.seen.new.values())
+        note = f"已导入 {file_name} ({result.order_count} 单"
+        if dedup.removed:
+            note += f", 去除重复 {dedup.removed} 单"
+        notes.append(note + ")")
+
+    report('aggregate')
+    result = store.report()
+    batch_count = len(store.batches())
+    notes.append(f"订单库共 {batch_count} 个批次")
+    return result, ", ".join(notes)
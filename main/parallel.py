@@ -0,0 +1,265 @@
+"""多进程分片分析：把很大的订单表按行切分，在多个进程中合并、计算盈亏并部分汇总
+
+进程池在第一次使用时启动并一直保留（工作进程只导入一次 pandas），之后的分析复用。
+订单表由主进程一次写入临时文件，每个分片一段，工作进程各自读取自己的分片；
+对照表的查找索引也写入文件，每个工作进程只在其变化后读取一次。
+"""
+import atexit
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from analysis import (
+    STAGE_LABELS, AnalysisCancelled, AnalysisResult, add_profit_columns, build_join_indexes,
+    check_cancelled, count_unmatched, format_summary, merge_orders, normalize_orders, resolve_columns
+)
+from cube import build_cube, combine_cubes
+from instrumentation import timed_stage
+from summary import combine_partials, finalize_summary, partial_summary
+
+try:
+    import pyarrow as pa
+except ImportError:  # 未安装 pyarrow 时每个分片写一个 pickle 文件
+    pa = None
+
+# 每个分片至少包含的行数；订单较少时进程启动和传输数据的开销大于并行的收益
+MIN_SHARD_ROWS = 200_000
+
+# 工作进程中已读取的查找索引（按索引文件路径，只在变化后重新读取）
+_worker_state = {}
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def shard_bounds(n_rows, n_shards):
+    """把 n_rows 行尽量均匀地切分为 n_shards 个连续区间 [(起始行, 结束行), ...]"""
+    n_shards = max(1, min(n_shards, n_rows))
+    step, extra = divmod(n_rows, n_shards)
+    bounds = []
+    start = 0
+    for i in range(n_shards):
+        end = start + step + (1 if i < extra else 0)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def analyze_shard(shard, indexes, columns):
+    """处理一个分片：返回 (部分汇总, 未匹配运营数, 未匹配成本数, 汇总立方体)"""
+    merged_df = merge_orders(normalize_orders(shard, columns), indexes)
+    add_profit_columns(merged_df)
+    return (partial_summary(merged_df), *count_unmatched(merged_df), build_cube(merged_df))
+
+
+def write_shards(order_df, bounds, directory):
+    """把订单表写入临时文件，每个分片一段，返回各分片的 (文件路径, 段号)
+
+    有 pyarrow 时写成一个 Arrow IPC 文件（每个分片一个记录批次），工作进程只读取自己的批次；
+    否则（或订单表含有 Arrow 无法表示的列时）每个分片写一个 pickle 文件。
+    """
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(order_df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            table = None
+        if table is not None:
+            path = os.path.join(directory, 'orders.arrow')
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                for start, end in bounds:
+                    writer.write_batch(table.slice(start, end - start).combine_chunks().to_batches()[0])
+            return [(path, i) for i in range(len(bounds))]
+    shards = []
+    for i, (start, end) in enumerate(bounds):
+        path = os.path.join(directory, f'orders_{i}.pkl')
+        order_df.iloc[start:end].to_pickle(path)
+        shards.append((path, 0))
+    return shards
+
+
+def read_shard(path, index):
+    """读取 write_shards 写出的一个分片"""
+    if path.endswith('.arrow'):
+        with pa.OSFile(path) as source:
+            reader = pa.ipc.open_file(source)
+            return pa.Table.from_batches([reader.get_batch(index)], schema=reader.schema).to_pandas()
+    return pd.read_pickle(path)
+
+
+def _worker_indexes(indexes_path):
+    """工作进程中的查找索引：同一个索引文件只读取一次"""
+    if _worker_state.get('indexes_path') != indexes_path:
+        with open(indexes_path, 'rb') as f:
+            _worker_state['indexes'] = pickle.load(f)
+        _worker_state['indexes_path'] = indexes_path
+    return _worker_state['indexes']
+
+
+def analyze_shard_file(shard, indexes_path, columns, cancel_path):
+    """在工作进程中处理文件中的一个分片；主进程取消分析（写出 cancel_path）后在下一步之前停止"""
+    def check():
+        if os.path.exists(cancel_path):
+            raise AnalysisCancelled()
+
+    check()
+    indexes = _worker_indexes(indexes_path)
+    df = read_shard(*shard)
+    check()
+    merged_df = merge_orders(normalize_orders(df, columns), indexes)
+    check()
+    add_profit_columns(merged_df)
+    return (partial_summary(merged_df), *count_unmatched(merged_df), build_cube(merged_df))
+
+
+class ShardPool:
+    """长期保留的分片计算进程池
+
+    进程池使用 spawn 方式启动，避免在有后台线程的界面进程中 fork；工作进程在第一次分析时启动，
+    之后的分析复用（不再重新导入 pandas）。查找索引对象不变时不再重新写出。
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._dir = tempfile.mkdtemp(prefix='profit_shards_')
+        # (查找索引对象, 索引文件路径)
+        self._indexes = None
+        self._runs = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _indexes_path(self, indexes):
+        if self._indexes is None or self._indexes[0] is not indexes:
+            self._runs += 1
+            path = os.path.join(self._dir, f'indexes_{self._runs}.pkl')
+            with open(path, 'wb') as f:
+                pickle.dump(indexes, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if self._indexes is not None:
+                os.remove(self._indexes[1])
+            self._indexes = (indexes, path)
+        return self._indexes[1]
+
+    def run(self, order_df, bounds, indexes, columns, report, cancel_event):
+        """处理各分片，按分片顺序返回结果
+
+        取消时通知正在运行的分片停止并等待它们结束，工作进程留在池中供下次使用。
+        """
+        with self._lock:
+            run_dir = tempfile.mkdtemp(dir=self._dir)
+            cancel_path = os.path.join(run_dir, 'cancelled')
+            futures = []
+            try:
+                indexes_path = self._indexes_path(indexes)
+                shards = write_shards(order_df, bounds, run_dir)
+                check_cancelled(cancel_event)
+                executor = self._get_executor()
+                futures = [executor.submit(analyze_shard_file, shard, indexes_path, columns, cancel_path)
+                           for shard in shards]
+                report('profit')
+                pending = set(futures)
+                while pending:
+                    check_cancelled(cancel_event)
+                    _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                return [future.result() for future in futures]
+            except BrokenProcessPool:
+                # 工作进程异常退出后进程池不可再用，下次分析时重新启动
+                self._executor = None
+                raise
+            finally:
+                if any(not future.done() for future in futures):
+                    open(cancel_path, 'w').close()
+                    for future in futures:
+                        future.cancel()
+                    wait(futures)
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            self._indexes = None
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """返回共用的分片进程池（进程数变化时重新创建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ShardPool(workers)
+        return _pool
+
+
+@atexit.register
+def shutdown_pool():
+    """关闭共用的分片进程池并删除临时文件"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def run_parallel_analysis(order_df, operator_df, cost_df, workers=None, progress=None,
+                          cancel_event=None, indexes=None, profiler=None,
+                          min_shard_rows=MIN_SHARD_ROWS):
+    """按行把订单表切分为多个分片，在进程池中分别合并、计算盈亏和部分汇总，再合并结果
+
+    各分片的计数、求和以及盈亏计数相加后再计算平均每单盈亏，结果与 run_analysis 一致
+    （不保留逐单明细）。订单行数不足两个分片时直接在当前进程中计算，
+    否则使用共用的分片进程池（见 ShardPool）。
+    注意：多核机器上相对单进程分析的加速尚未实测；单核时分片只会增加读写临时文件和进程间通信的开销。
+    """
+    report = progress or (lambda stage: None)
+    columns = resolve_columns(order_df, operator_df, cost_df)
+    workers = workers or default_workers()
+    n_shards = min(workers, len(order_df) // min_shard_rows) if min_shard_rows else workers
+    bounds = shard_bounds(len(order_df), max(n_shards, 1))
+
+    check_cancelled(cancel_event)
+    report('merge')
+    if indexes is None:
+        with timed_stage(profiler, 'index', "对照表索引", len(operator_df) + len(cost_df)):
+            indexes = build_join_indexes(operator_df, cost_df, columns)
+
+    with timed_stage(profiler, 'shards', f"分片计算({len(bounds)}个)", len(order_df)) as timing:
+        if len(bounds) == 1:
+            outcomes = [analyze_shard(order_df, indexes, columns)]
+        else:
+            outcomes = get_pool(workers).run(order_df, bounds, indexes, columns, report, cancel_event)
+        timing.rows_out = len(order_df)
+
+    check_cancelled(cancel_event)
+    report('aggregate')
+    with timed_stage(profiler, 'aggregate', STAGE_LABELS['aggregate'], len(outcomes)) as timing:
+        result_df = format_summary(finalize_summary(combine_partials([o[0] for o in outcomes])))
+        timing.rows_out = len(result_df)
+    with timed_stage(profiler, 'cube', "汇总立方体", len(outcomes)) as timing:
+        cube = combine_cubes([o[3] for o in outcomes])
+        timing.rows_out = len(cube)
+
+    other_count = sum(o[1] for o in outcomes)
+    missing_cost_count = sum(o[2] for o in outcomes)
+    return AnalysisResult(result_df, None, indexes, columns['quantity'],
+                          len(order_df), other_count, missing_cost_count, cube=cube)
+
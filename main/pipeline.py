@@ -0,0 +1,180 @@
+"""分阶段缓存的分析流程：只重新计算依赖发生变化的阶段"""
+from analysis import (
+    AnalysisResult, JoinIndexes, build_cost_index, build_operator_index, check_cancelled,
+    count_unmatched, format_summary, lookup_operators, merge_lookups, normalize_orders,
+    resolve_columns
+)
+from cube import build_cube
+from instrumentation import count_rows, timed_stage
+from profit_engine import compute_profit
+from status_rules import classify_statuses
+from summary import summarize_by_operator
+
+# 各列映射所包含的键
+ORDER_COLUMN_KEYS = ['product_id', 'product_code', 'status', 'amount', 'quantity', 'order_date']
+OPERATOR_COLUMN_KEYS = ['operator_product_id', 'operator_product_code', 'operator']
+COST_COLUMN_KEYS = ['cost_product_code', 'cost']
+
+# 阶段在界面上显示的名称
+STAGE_NAMES = {
+    'order_columns': '订单表列识别',
+    'operator_columns': '运营对照表列识别',
+    'cost_columns': '成本对照表列识别',
+    'normalize': '订单规范化',
+    'operator_index': '运营对照表索引',
+    'operator_join': '运营人员匹配',
+    'cost_index': '成本对照表索引',
+    'cost_join': '成本匹配',
+    'status': '状态分类',
+    'profit': '盈亏计算',
+    'detail': '逐单明细',
+    'aggregate': '汇总',
+    'cube': '汇总立方体',
+}
+
+
+class _StageEntry:
+    def __init__(self, key, version, value):
+        self.key = key
+        self.version = version
+        self.value = value
+
+
+class AnalysisPipeline:
+    """分阶段执行并缓存分析结果
+
+    每个阶段记录计算时所依赖的输入/上游阶段的版本号，依赖未变化时直接复用；
+    输入数据表以对象身份判断是否变化（重新加载文件会得到新的数据表）。
+    列识别阶段结果不变时不会提升版本号，因此只改了成本表时
+    只会重新计算成本索引、成本匹配及其之后的阶段。
+    """
+
+    def __init__(self):
+        self._inputs = {}
+        self._input_versions = {}
+        self._stages = {}
+        # 最近一次运行中重新计算的阶段
+        self.recomputed = []
+        self._profiler = None
+
+    def _input(self, name, df):
+        """返回输入数据表的版本号（对象变化时加一）"""
+        if self._inputs.get(name) is not df:
+            self._inputs[name] = df
+            self._input_versions[name] = self._input_versions.get(name, 0) + 1
+        return self._input_versions[name]
+
+    def _stage(self, name, deps, func, cutoff=False, rows_in=None):
+        """计算或复用一个阶段，返回 (结果, 版本号)
+
+        deps 为依赖的版本号元组；cutoff 为真时，重新计算得到相等的结果不提升版本号。
+        """
+        entry = self._stages.get(name)
+        if entry is not None and entry.key == deps:
+            if self._profiler is not None:
+                self._profiler.reused(name, STAGE_NAMES[name])
+            return entry.value, entry.version
+        with timed_stage(self._profiler, name, STAGE_NAMES[name], rows_in) as timing:
+            value = func()
+            timing.rows_out = count_rows(value)
+        self.recomputed.append(name)
+        if entry is not None and cutoff and value == entry.value:
+            version = entry.version
+        else:
+            version = entry.version + 1 if entry is not None else 1
+        self._stages[name] = _StageEntry(deps, version, value)
+        return value, version
+
+    def run(self, order_df, operator_df, cost_df, progress=None, cancel_event=None, profiler=None):
+        """执行分析，结果与 analysis.run_analysis 相同
+
+        profiler 为 RunProfiler 时记录每个阶段的耗时和行数（复用的阶段标记为已复用）。
+        """
+        report = progress or (lambda stage: None)
+        self.recomputed = []
+        self._profiler = profiler
+        try:
+            return self._run(order_df, operator_df, cost_df, report, cancel_event)
+        finally:
+            self._profiler = None
+
+    def _run(self, order_df, operator_df, cost_df, report, cancel_event):
+        order_v = self._input('order', order_df)
+        operator_v = self._input('operator', operator_df)
+        cost_v = self._input('cost', cost_df)
+
+        # 列识别很快，每次都检查；拆成三部分后各自只在映射变化时影响下游
+        columns = resolve_columns(order_df, operator_df, cost_df)
+
+        def pick(keys):
+            return lambda: {key: columns[key] for key in keys}
+
+        order_columns, order_columns_v = self._stage(
+            'order_columns', (order_v,), pick(ORDER_COLUMN_KEYS), cutoff=True)
+        operator_columns, operator_columns_v = self._stage(
+            'operator_columns', (operator_v,), pick(OPERATOR_COLUMN_KEYS), cutoff=True)
+        cost_columns, cost_columns_v = self._stage(
+            'cost_columns', (cost_v,), pick(COST_COLUMN_KEYS), cutoff=True)
+
+        check_cancelled(cancel_event)
+        report('merge')
+        orders, normalize_v = self._stage(
+            'normalize', (order_v, order_columns_v),
+            lambda: normalize_orders(order_df, order_columns), rows_in=len(order_df))
+        (operator_index, merge_on_operator), operator_index_v = self._stage(
+            'operator_index', (operator_v, operator_columns_v),
+            lambda: build_operator_index(operator_df, operator_columns), rows_in=len(operator_df))
+        operators, operator_join_v = self._stage(
+            'operator_join', (normalize_v, operator_index_v),
+            lambda: lookup_operators(orders, operator_index), rows_in=len(orders))
+        cost_index, cost_index_v = self._stage(
+            'cost_index', (cost_v, cost_columns_v),
+            lambda: build_cost_index(cost_df, cost_columns), rows_in=len(cost_df))
+        costs, cost_join_v = self._stage(
+            'cost_join', (normalize_v, cost_index_v),
+            lambda: cost_index.lookup(orders), rows_in=len(orders))
+
+        check_cancelled(cancel_event)
+        report('profit')
+        status, status_v = self._stage(
+            'status', (normalize_v,), lambda: classify_statuses(orders['订单状态']), rows_in=len(orders))
+
+        def profit():
+            frame = orders.copy(deep=False)
+            frame['商品成本'] = costs
+            frame['状态分类'] = status
+            return compute_profit(frame)
+
+        (profit_loss, pending_profit), profit_v = self._stage(
+            'profit', (normalize_v, cost_join_v, status_v), profit, rows_in=len(orders))
+
+        def detail():
+            merged_df = merge_lookups(orders, operators, costs)
+            merged_df['状态分类'] = status
+            merged_df['盈亏'] = profit_loss
+            merged_df['待确认盈利'] = pending_profit
+            return merged_df
+
+        merged_df, detail_v = self._stage(
+            'detail', (normalize_v, operator_join_v, cost_join_v, status_v, profit_v), detail,
+            rows_in=len(orders))
+
+        check_cancelled(cancel_event)
+        report('aggregate')
+        (result_df, unmatched), _ = self._stage(
+            'aggregate', (detail_v,),
+            lambda: (format_summary(summarize_by_operator(merged_df)), count_unmatched(merged_df)),
+            rows_in=len(merged_df))
+        cube, _ = self._stage('cube', (detail_v,), lambda: build_cube(merged_df), rows_in=len(merged_df))
+
+        indexes = JoinIndexes(operator_index, cost_index, merge_on_operator)
+        return AnalysisResult(result_df, merged_df, indexes, order_columns['quantity'],
+                              len(orders), *unmatched, cube=cube)
+
+    def reuse_message(self):
+        """描述最近一次运行复用了多少缓存，全部重新计算时返回空字符串"""
+        if not self.recomputed:
+            return "全部复用上次结果"
+        if len(self.recomputed) == len(STAGE_NAMES):
+            return ""
+        return "重新计算: " + ", ".join(STAGE_NAMES[name] for name in self.recomputed)
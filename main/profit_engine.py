@@ -0,0 +1,123 @@
+"""订单盈亏计算引擎（列式向量化实现）"""
+import numpy as np
+import pandas as pd
+
+from status_rules import (
+    RECEIVED, RETURNED, SHIPPED, PENDING,
+    rule_keywords, classify_statuses, status_categories
+)
+
+# 订单状态关键字（按优先级排列，与界面中的计算规则说明一致）
+RECEIVED_KEYWORDS = rule_keywords(RECEIVED)
+RETURN_KEYWORDS = rule_keywords(RETURNED)
+SHIPPED_KEYWORDS = rule_keywords(SHIPPED)
+PENDING_KEYWORDS = rule_keywords(PENDING)
+
+# 盈亏计算规则版本，计算方式变化时需要递增（缓存的分析结果随之失效）
+RULES_VERSION = 1
+
+
+def calculate_profit_loss(row):
+    """逐行计算盈亏和待确认盈利（参考实现，用于校验向量化结果）"""
+    status = str(row['订单状态']).strip().lower()
+
+    # 处理实收金额，确保是数字
+    try:
+        received_amount = float(row['实收金额']) if pd.notna(row['实收金额']) else 0
+    except (ValueError, TypeError):
+        received_amount = 0
+
+    # 处理商品成本，确保是数字
+    # 如果成本表中未找到商品编码，商品成本将为NaN，此时将盈利记为0
+    if pd.isna(row['商品成本']):
+        # 成本表中未找到商品编码，盈亏记为0
+        return pd.Series([0, 0])
+
+    try:
+        cost = float(row['商品成本']) if pd.notna(row['商品成本']) else 0
+    except (ValueError, TypeError):
+        cost = 0
+
+    # 处理商品数量，确保是数字
+    try:
+        quantity = float(row['商品数量']) if pd.notna(row['商品数量']) else 1
+    except (ValueError, TypeError):
+        quantity = 1
+
+    # 计算总成本 = 商品成本 × 商品数量
+    total_cost = cost * quantity
+
+    # 初始化盈亏和待确认盈利
+    profit_loss = 0
+    pending_profit = 0
+
+    # 根据状态计算盈亏
+    if any(s in status for s in RECEIVED_KEYWORDS):
+        profit_loss = received_amount - total_cost
+    elif any(s in status for s in RETURN_KEYWORDS):
+        # 假设退货订单有运费字段，如果没有，可以设置为0
+        try:
+            shipping_cost = float(row.get('运费', 0)) if pd.notna(row.get('运费')) else 0
+        except (ValueError, TypeError):
+            shipping_cost = 0
+        profit_loss = -total_cost - shipping_cost
+    elif any(s in status for s in SHIPPED_KEYWORDS):
+        # 已发货待收货状态，计算待确认盈利
+        pending_profit = received_amount - total_cost
+        # 这种状态的订单不计入已实现盈亏
+        profit_loss = 0
+    elif any(s in status for s in PENDING_KEYWORDS):
+        profit_loss = 0  # 不计算盈亏
+    else:
+        # 其他状态默认计算方式
+        profit_loss = received_amount - total_cost
+
+    return pd.Series([profit_loss, pending_profit])
+
+
+def to_number(values, default):
+    """将一列转换为浮点数，无法转换或缺失的值使用默认值"""
+    return pd.to_numeric(values, errors='coerce').fillna(default).to_numpy(dtype='float64')
+
+
+def compute_profit(df):
+    """一次性计算整张表的盈亏和待确认盈利，返回两个numpy数组
+
+    规则与 calculate_profit_loss 完全一致：状态按优先级匹配，
+    成本缺失的订单记为0，退货订单扣除运费，缺失数量按1计算。
+    如果表中已有状态分类列则直接使用，否则先对订单状态分类。
+    """
+    received_amount = to_number(df['实收金额'], 0)
+    quantity = to_number(df['商品数量'], 1)
+
+    # 成本表中未找到商品编码的订单（原始值缺失）盈亏记为0；无法解析的成本按0计算
+    cost_missing = df['商品成本'].isna().to_numpy(dtype=bool)
+    cost = to_number(df['商品成本'], 0)
+
+    # 没有运费列（或合并后运费列名冲突）时运费按0计算
+    if '运费' in df.columns:
+        shipping_cost = to_number(df['运费'], 0)
+    else:
+        shipping_cost = np.zeros(len(df))
+
+    total_cost = cost * quantity
+    net_amount = received_amount - total_cost
+
+    if '状态分类' in df.columns:
+        status_codes = df['状态分类'].cat.codes.to_numpy()
+    else:
+        status_codes = classify_statuses(df['订单状态']).codes
+    category = status_categories(status_codes)
+
+    # np.select 按条件顺序取第一个满足的分支，与逐行 if/elif 的优先级一致
+    is_shipped = category == SHIPPED
+    profit_loss = np.select(
+        [category == RECEIVED, category == RETURNED, is_shipped, category == PENDING],
+        [net_amount, -total_cost - shipping_cost, 0.0, 0.0],
+        default=net_amount
+    )
+    pending_profit = np.where(is_shipped, net_amount, 0.0)
+
+    profit_loss[cost_missing] = 0.0
+    pending_profit[cost_missing] = 0.0
+    return profit_loss, pending_profit
@@ -0,0 +1,231 @@
+"""分析结果缓存：按三个输入文件的内容哈希、编码设置、列映射和计算规则版本索引"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from analysis import AnalysisResult, JoinSummary, as_paths, resolve_columns
+from loaders import read_header
+from profit_engine import RULES_VERSION
+from status_rules import STATUS_RULES
+from table_cache import FINGERPRINT_ATTR, file_fingerprint
+
+# 默认缓存目录、磁盘容量上限和内存中保留的结果数
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.profit_calculator', 'results')
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+DEFAULT_MAX_ENTRIES = 32
+
+# 缓存格式版本，保存的内容变化时需要递增
+CACHE_VERSION = 3
+
+
+def rules_fingerprint():
+    """状态分类规则和盈亏计算规则的版本：修改关键字或递增 RULES_VERSION 后旧结果失效"""
+    rules = json.dumps([RULES_VERSION, STATUS_RULES], ensure_ascii=False)
+    return hashlib.blake2b(rules.encode(), digest_size=8).hexdigest()
+
+
+def header_columns(file_path, encoding_setting='auto', df=None):
+    """返回数据表的列名：已加载的数据表直接取列名，否则只读取表头"""
+    if df is not None:
+        return list(df.columns)
+    # 多个订单文件时用第一个文件的表头
+    return read_header(as_paths(file_path)[0], encoding_setting)
+
+
+def table_fingerprints(file_path, df=None):
+    """数据表对应文件的内容哈希：已加载的数据表使用读取时记录的哈希，文件之后被修改也不影响"""
+    paths = as_paths(file_path)
+    recorded = None if df is None else df.attrs.get(FINGERPRINT_ATTR)
+    if recorded is not None and len(recorded) == len(paths):
+        return list(recorded)
+    return [file_fingerprint(path) for path in paths]
+
+
+def source_fingerprints(paths, frames=None):
+    """各数据表对应文件的内容哈希 {类型: [哈希, ...]}，已加载的数据表使用读取时记录的哈希"""
+    frames = frames or {}
+    return {kind: table_fingerprints(path, frames.get(kind)) for kind, path in paths.items()}
+
+
+def changed_tables(paths, fingerprints, frames=None):
+    """内容与 fingerprints 中记录的不同（或已无法读取）的数据表类型"""
+    frames = frames or {}
+    changed = []
+    for kind, recorded in fingerprints.items():
+        try:
+            current = table_fingerprints(paths[kind], frames.get(kind))
+        except OSError:
+            current = None
+        if current != list(recorded):
+            changed.append(kind)
+    return changed
+
+
+def result_key(paths, encoding_setting='auto', frames=None):
+    """由三个输入文件的内容哈希、编码设置、列映射和规则版本得到结果缓存键
+
+    paths / frames 为 {'order': ..., 'operator': ..., 'cost': ...}（订单表可以是多个文件），
+    frames 中已加载的数据表用于确定列映射和文件哈希（读取时记录的），未加载的只读取表头。
+    缺少必要列时抛出 MissingColumnsError。
+    """
+    frames = frames or {}
+    headers = [pd.DataFrame(columns=header_columns(paths[kind], encoding_setting, frames.get(kind)))
+               for kind in ('order', 'operator', 'cost')]
+    settings = json.dumps({
+        'version': CACHE_VERSION,
+        'rules': rules_fingerprint(),
+        'encoding': encoding_setting,
+        'columns': resolve_columns(*headers),
+        'files': [table_fingerprints(paths[kind], frames.get(kind)) for kind in ('order', 'operator', 'cost')],
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(settings.encode(), digest_size=16).hexdigest()
+
+
+def _to_entry(result):
+    return {
+        'result_df': result.result_df,
+        'quantity_col': result.quantity_col,
+        'order_count': result.order_count,
+        'other_count': result.other_count,
+        'missing_cost_count': result.missing_cost_count,
+        'merge_on_operator': list(result.merge_on_operator),
+        'operator_duplicate_count': result.operator_duplicate_count,
+        'cost_duplicate_count': result.cost_duplicate_count,
+        'cube': result.cube,
+        'duplicate_count': result.duplicate_count,
+    }
+
+
+def _from_entry(entry):
+    join = JoinSummary(entry['merge_on_operator'], entry['operator_duplicate_count'],
+                       entry['cost_duplicate_count'])
+    result = AnalysisResult(entry['result_df'].copy(), None, join, entry['quantity_col'],
+                            entry['order_count'], entry['other_count'], entry['missing_cost_count'],
+                            cube=entry['cube'], duplicate_count=entry['duplicate_count'])
+    result.from_cache = True
+    return result
+
+
+class ResultCache:
+    """分析结果的两级缓存：内存中保留最近的 max_entries 个结果，磁盘上按最近使用时间淘汰
+
+    只保存汇总结果、汇总立方体和统计信息（不含逐单明细），命中时无需读取数据文件。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    def get(self, key):
+        """返回缓存的 AnalysisResult（from_cache 为真），不存在时返回 None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._remember(key, entry)
+        return _from_entry(entry)
+
+    def put(self, key, result):
+        """保存分析结果；写入磁盘失败时只保留在内存中"""
+        entry = _to_entry(result)
+        self._remember(key, entry)
+        try:
+            self._store(key, entry)
+        except OSError:
+            pass
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            # 缓存文件损坏时删除
+            _remove(path)
+            return None
+        # 更新修改时间作为最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, key, entry):
+        """先写入临时文件再替换，避免读取到不完整的文件"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def _entries(self):
+        """返回磁盘上的 (路径, 大小, 最近使用时间) 列表"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """磁盘上的总大小超过上限时按最近使用时间从旧到新删除"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                _remove(path)
+                total -= size
+
+    def clear(self):
+        """删除内存和磁盘上的所有结果"""
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._entries():
+                _remove(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,149 @@
+"""成本情景窗口：添加替换成本表、调价表或统一调整比例，对比各运营人员在各情景下的总盈亏"""
+import os
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+import pandas as pd
+
+from analysis import read_analysis_table
+from data_table import DataTable
+from loaders import read_table
+from scenarios import ScenarioError, adjustment_scenarios, cost_table_scenario, uniform_scenarios
+
+
+def _money(value):
+    return "" if pd.isna(value) else f"¥{value:.2f}"
+
+
+class ScenarioWindow:
+    """情景列表和对比表
+
+    compute(scenarios, on_result) 由主界面提供：在后台计算所有情景，
+    完成后在界面线程中调用 on_result(对比表, 状态信息)。
+    """
+
+    def __init__(self, parent, compute, encoding_setting='auto'):
+        self.compute = compute
+        self.encoding_setting = encoding_setting
+        self.scenarios = []
+        self.table_df = None
+        self.window = tk.Toplevel(parent)
+        self.window.title("成本情景分析")
+        self.window.geometry("950x600")
+
+        controls = ttk.Frame(self.window, padding="10")
+        controls.pack(fill=tk.X)
+        ttk.Button(controls, text="添加替换成本表", command=self.add_cost_tables).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(controls, text="添加调价表", command=self.add_adjustment_table).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(controls, text="全部商品成本调整(%):").pack(side=tk.LEFT)
+        self.uniform_var = tk.StringVar()
+        ttk.Entry(controls, textvariable=self.uniform_var, width=12).pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Button(controls, text="添加", command=self.add_uniform).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(controls, text="删除选中", command=self.remove_selected).pack(side=tk.LEFT, padx=(0, 10))
+
+        list_frame = ttk.Frame(self.window, padding=(10, 0, 10, 0))
+        list_frame.pack(fill=tk.X)
+        ttk.Label(list_frame, text="情景 (替换成本表中没有的商品按成本缺失处理，调整比例相对当前成本):").pack(anchor=tk.W)
+        self.listbox = tk.Listbox(list_frame, height=5, selectmode=tk.EXTENDED)
+        self.listbox.pack(fill=tk.X)
+
+        buttons = ttk.Frame(self.window, padding="10")
+        buttons.pack(fill=tk.X)
+        self.compute_button = ttk.Button(buttons, text="计算对比", command=self.run)
+        self.compute_button.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons, text="导出对比", command=self.export).pack(side=tk.LEFT)
+
+        table_frame = ttk.Frame(self.window, padding=(10, 0, 10, 0))
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        table_frame.columnconfigure(0, weight=1)
+        table_frame.rowconfigure(0, weight=1)
+        self.table = DataTable(table_frame, height=15, column_widths={'运营': 120})
+        self.table.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.status_var = tk.StringVar(value="添加情景后点击“计算对比”")
+        ttk.Label(self.window, textvariable=self.status_var, padding="10").pack(fill=tk.X)
+
+    def add_scenarios(self, scenarios):
+        self.scenarios.extend(scenarios)
+        for scenario in scenarios:
+            self.listbox.insert(tk.END, scenario.name)
+
+    def add_cost_tables(self):
+        """每个替换成本表是一个情景，情景名称为文件名"""
+        filenames = filedialog.askopenfilenames(
+            title="选择替换成本表",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        for filename in filenames:
+            try:
+                df = read_analysis_table('cost', filename, self.encoding_setting)
+            except Exception as e:
+                messagebox.showerror("错误", f"读取成本表时出错: {str(e)}")
+                continue
+            self.add_scenarios([cost_table_scenario(df, filename)])
+
+    def add_adjustment_table(self):
+        """调价表：一列商品编码，其余每列是一个情景的成本调整比例（写成 10% 或 0.1）"""
+        filename = filedialog.askopenfilename(
+            title="选择调价表",
+            filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            self.add_scenarios(adjustment_scenarios(read_table(filename, self.encoding_setting)))
+        except ScenarioError as e:
+            messagebox.showerror("错误", str(e))
+        except Exception as e:
+            messagebox.showerror("错误", f"读取调价表时出错: {str(e)}")
+
+    def add_uniform(self):
+        try:
+            self.add_scenarios(uniform_scenarios(self.uniform_var.get()))
+        except ScenarioError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        self.uniform_var.set("")
+
+    def remove_selected(self):
+        for index in sorted(self.listbox.curselection(), reverse=True):
+            self.listbox.delete(index)
+            del self.scenarios[index]
+
+    def run(self):
+        if not self.scenarios:
+            messagebox.showwarning("警告", "请先添加情景")
+            return
+        self.compute_button.configure(state=tk.DISABLED)
+        self.status_var.set(f"正在计算 {len(self.scenarios)} 个情景 ...")
+        self.compute(list(self.scenarios), self.show)
+
+    def show(self, table, message):
+        """显示计算结果；table 为 None 表示计算失败或已取消"""
+        self.compute_button.configure(state=tk.NORMAL)
+        self.status_var.set(message)
+        if table is None:
+            return
+        self.table_df = table
+        self.table.formatters = {column: _money for column in table.columns if column != '运营'}
+        self.table.set_data(table)
+
+    def export(self):
+        if self.table_df is None:
+            messagebox.showwarning("警告", "没有可导出的对比结果")
+            return
+        filename = filedialog.asksaveasfilename(
+            title="保存情景对比",
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
+        )
+        if not filename:
+            return
+        try:
+            if filename.endswith('.csv'):
+                self.table_df.to_csv(filename, index=False, encoding='utf-8-sig')
+            else:
+                self.table_df.to_excel(filename, index=False, sheet_name='情景对比')
+            self.status_var.set(f"情景对比已导出: {os.path.basename(filename)}")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出情景对比时出错: {str(e)}")
@@ -0,0 +1,232 @@
+"""成本情景分析：在同一批已合并的订单上一次计算多组假设成本下各运营人员的总盈亏
+
+盈亏对商品成本是线性的：已实现盈亏 = 金额 - 数量 × 成本（退货为 -运费 - 数量 × 成本），
+待确认盈利同理，成本缺失的订单记为0。因此先把订单按 运营人员 × 商品编码 归并出金额和
+数量系数（与情景数无关，只扫描一次订单），再用 分组 × 情景 的成本矩阵一次算出所有情景。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import COST_NAMES, PRODUCT_CODE_NAMES, build_cost_index, check_cancelled, find_column
+from lookup_index import LookupIndex
+from profit_engine import to_number
+from status_rules import PENDING, RETURNED, SHIPPED, classify_statuses, status_categories
+
+# 对比表中当前成本（即分析结果）的列名
+BASELINE = '当前成本'
+TOTAL_ROW = '合计'
+
+# 运营人员 × 商品编码 分组中可累加的系数列
+COEFFICIENTS = ['订单行数', '已实现金额', '已实现数量', '待确认金额', '待确认数量']
+
+
+class ScenarioError(Exception):
+    """情景设置有误（如调价表缺少商品编码列或调整比例无法解析）"""
+
+
+class Scenario:
+    """一组假设成本
+
+    cost_df 为替换的成本对照表（未列出的商品按成本缺失处理，与正常分析相同），
+    为 None 时在当前成本上调整；adjustments 为 商品编码 → 调整比例（0.1 为 +10%）的 Series，
+    与成本表相同按 LookupIndex 匹配订单的商品编码（两边类型不一致时报错而不是匹配不到），
+    uniform 为对所有商品的调整比例，两者同时给出时相乘。
+    计算后 unmatched 为调价表中没有匹配到任何订单的商品编码个数。
+    """
+
+    def __init__(self, name, cost_df=None, adjustments=None, uniform=0.0):
+        self.name = name
+        self.cost_df = cost_df
+        self.adjustments = adjustments
+        self.uniform = uniform
+        self.unmatched = 0
+
+    def costs(self, skus, base_costs):
+        """返回该情景下各商品编码的成本（缺失为 NaN）"""
+        if self.cost_df is None:
+            costs = base_costs.copy()
+        else:
+            columns = {'cost_product_code': find_column(self.cost_df, PRODUCT_CODE_NAMES),
+                       'cost': find_column(self.cost_df, COST_NAMES)}
+            if not all(columns.values()):
+                raise ScenarioError(f"情景 {self.name} 的成本表缺少商品编码列或商品成本列")
+            raw = pd.Series(build_cost_index(self.cost_df, columns).lookup(pd.DataFrame({'商品编码': skus})))
+            # 与正常分析相同：未匹配为缺失，无法解析的成本按0计算
+            costs = np.where(raw.isna().to_numpy(), np.nan, to_number(raw, 0))
+        factor = np.full(len(skus), 1.0 + self.uniform)
+        if self.adjustments is not None:
+            table = pd.DataFrame({'商品编码': self.adjustments.index, '调整比例': self.adjustments.to_numpy()})
+            index = LookupIndex.build(table, ['商品编码'], '调整比例')
+            try:
+                adjustments = index.lookup(pd.DataFrame({'商品编码': skus}))
+            except ValueError as e:
+                raise ScenarioError(f"情景 {self.name} 的调价表: {e}")
+            self.unmatched = int((~index.index.isin(skus)).sum())
+            adjustments = np.nan_to_num(adjustments.astype('float64'))
+            factor *= 1.0 + adjustments
+        return costs * factor
+
+
+def scenario_groups(merged_df):
+    """把一块逐单明细按 运营人员 × 商品编码 归并为情景计算用的系数和当前成本"""
+    if '状态分类' in merged_df.columns:
+        status_codes = merged_df['状态分类'].cat.codes.to_numpy()
+    else:
+        status_codes = classify_statuses(merged_df['订单状态']).codes
+    category = status_categories(status_codes)
+    amount = to_number(merged_df['实收金额'], 0)
+    quantity = to_number(merged_df['商品数量'], 1)
+    if '运费' in merged_df.columns:
+        shipping = to_number(merged_df['运费'], 0)
+    else:
+        shipping = np.zeros(len(merged_df))
+
+    returned = category == RETURNED
+    shipped = category == SHIPPED
+    # 已收货和其他状态按 金额 - 成本 计算，退货为 -运费 - 成本
+    realized = ~(returned | shipped | (category == PENDING))
+    costs = merged_df['商品成本']
+    df = pd.DataFrame({
+        '运营人员': merged_df['运营人员'].astype(object).to_numpy(),
+        '商品编码': merged_df['商品编码'].astype(object).to_numpy(),
+        '订单行数': 1,
+        '已实现金额': np.where(realized, amount, np.where(returned, -shipping, 0.0)),
+        '已实现数量': np.where(realized | returned, quantity, 0.0),
+        '待确认金额': np.where(shipped, amount, 0.0),
+        '待确认数量': np.where(shipped, quantity, 0.0),
+        BASELINE: np.where(costs.isna().to_numpy(), np.nan, to_number(costs, 0)),
+    })
+    return _combine(df)
+
+
+def _combine(df):
+    aggregations = dict.fromkeys(COEFFICIENTS, 'sum')
+    # 同一商品编码的成本来自同一条成本记录
+    aggregations[BASELINE] = 'first'
+    return df.groupby(['运营人员', '商品编码'], dropna=False, sort=False).agg(aggregations).reset_index()
+
+
+def combine_groups(groups):
+    """合并多块订单的分组系数（流式重新计算时逐块归并）"""
+    groups = [g for g in groups if g is not None]
+    if len(groups) == 1:
+        return groups[0]
+    return _combine(pd.concat(groups, ignore_index=True))
+
+
+def groups_from_chunks(chunks, cancel_event=None):
+    """由逐块的逐单明细得到分组系数，内存占用只与 运营人员 × 商品编码 的组合数有关"""
+    groups = []
+    for merged_df in chunks:
+        check_cancelled(cancel_event)
+        groups.append(scenario_groups(merged_df))
+    return combine_groups(groups)
+
+
+def evaluate_scenarios(groups, scenarios):
+    """一次计算所有情景，返回 (总盈亏, 待确认盈利) 两个 运营人员 × 情景 的表（第一列为当前成本）"""
+    names = [BASELINE] + [s.name for s in scenarios]
+    if len(set(names)) != len(names):
+        raise ScenarioError("情景名称不能重复")
+    sku_codes, skus = pd.factorize(groups['商品编码'], use_na_sentinel=False)
+    # 每个商品编码的当前成本
+    base_costs = np.full(len(skus), np.nan)
+    base_costs[sku_codes] = groups[BASELINE].to_numpy(dtype='float64')
+
+    # 商品 × 情景 的成本矩阵，按分组展开为 分组 × 情景
+    cost_matrix = np.column_stack([base_costs] + [s.costs(skus, base_costs) for s in scenarios])
+    costs = cost_matrix[sku_codes]
+    valid = ~np.isnan(costs)
+    costs = np.nan_to_num(costs)
+
+    def linear(amount_column, quantity_column):
+        amount = groups[amount_column].to_numpy(dtype='float64')[:, None]
+        quantity = groups[quantity_column].to_numpy(dtype='float64')[:, None]
+        return np.where(valid, amount - quantity * costs, 0.0)
+
+    operator_codes, operators = pd.factorize(groups['运营人员'], sort=True)
+
+    def by_operator(values):
+        totals = np.zeros((len(operators), values.shape[1]))
+        np.add.at(totals, operator_codes, values)
+        return pd.DataFrame(totals, index=pd.Index(operators, name='运营人员'), columns=names)
+
+    return (by_operator(linear('已实现金额', '已实现数量')),
+            by_operator(linear('待确认金额', '待确认数量')))
+
+
+def comparison_table(profit):
+    """整理为显示 / 导出用的对比表：各情景的总盈亏及相对当前成本的变化，末行为合计
+
+    行的顺序与分析结果相同（按当前总盈亏从高到低，“其他”在最后）。
+    """
+    profit = profit.round(2)
+    table = pd.DataFrame({'运营': profit.index.astype(object), BASELINE: profit[BASELINE].to_numpy()})
+    for name in profit.columns[1:]:
+        table[name] = profit[name].to_numpy()
+        table[f"{name} 变化"] = (profit[name] - profit[BASELINE]).round(2).to_numpy()
+    order = np.lexsort((-table[BASELINE].to_numpy(), (table['运营'] == '其他').to_numpy()))
+    table = table.iloc[order].reset_index(drop=True)
+    total = table.drop(columns='运营').sum().round(2)
+    total['运营'] = TOTAL_ROW
+    return pd.concat([table, total.to_frame().T[table.columns]], ignore_index=True)
+
+
+def parse_percent(value):
+    """把调整比例解析为小数，缺失或空白为 0
+
+    只有以 % 结尾的文字按百分数解析（'10%' / '+10%' 为 0.1）；不带 % 的数字（包括 Excel
+    中设置为百分比格式的单元格，10% 保存为 0.1）按小数解析，0.1 即 +10%。
+    不带 % 的数字绝对值大于 1 时无法确定是否漏写了 %（10 是 +10% 还是 +1000%），报错。
+    """
+    if pd.isna(value):
+        return 0.0
+    text = str(value).strip()
+    if not text:
+        return 0.0
+    percent = text.endswith('%')
+    try:
+        number = float(text.rstrip('%').strip())
+    except ValueError:
+        raise ScenarioError(f"无法解析调整比例: {value}")
+    if percent:
+        return number / 100
+    if abs(number) > 1:
+        raise ScenarioError(f"调整比例 {value} 不明确：百分数请写成 {number:g}%，小数请写成 {number / 100:g}")
+    return number
+
+
+def uniform_scenarios(text):
+    """由逗号分隔的百分比（如 “5, -10”，输入框的单位为 %，可以省略 % 号）得到对所有商品统一调整成本的情景"""
+    scenarios = []
+    for part in text.replace('，', ',').split(','):
+        part = part.strip()
+        if part:
+            percent = parse_percent(part if part.endswith('%') else part + '%')
+            scenarios.append(Scenario(f"全部{percent * 100:+g}%", uniform=percent))
+    return scenarios
+
+
+def adjustment_scenarios(df):
+    """由调价表得到情景：商品编码列之外的每一列是一个情景，取值为该商品的成本调整比例（见 parse_percent）"""
+    sku_column = find_column(df, PRODUCT_CODE_NAMES)
+    if sku_column is None:
+        raise ScenarioError("调价表中缺少商品编码列")
+    skus = df[sku_column]
+    scenarios = []
+    for column in df.columns:
+        if column == sku_column:
+            continue
+        adjustments = pd.Series([parse_percent(v) for v in df[column]], index=pd.Index(skus))
+        adjustments = adjustments[~adjustments.index.duplicated(keep='first')]
+        scenarios.append(Scenario(str(column), adjustments=adjustments))
+    if not scenarios:
+        raise ScenarioError("调价表中没有调整比例列")
+    return scenarios
+
+
+def cost_table_scenario(df, file_path):
+    """以文件名作为情景名称的替换成本表"""
+    return Scenario(os.path.splitext(os.path.basename(file_path))[0], cost_df=df)
@@ -0,0 +1,96 @@
+"""常驻进程中保留在内存里的解析后数据表，供后台分析进程和分析服务的多个请求共用"""
+import threading
+from collections import OrderedDict
+
+from analysis import AnalysisResult, JoinSummary, as_paths, select_columns
+from compact import compact_table
+from dedup import DUPLICATE_COUNT_ATTR, combine_order_frames
+from loaders import read_header
+from table_cache import TableCache, file_fingerprint
+
+# 内存中保留的数据表个数
+MAX_TABLES = 6
+
+KINDS = ('order', 'operator', 'cost')
+
+
+def portable_result(result):
+    """去掉逐单明细和查找索引后的结果，用于在进程之间传递"""
+    join = JoinSummary(result.merge_on_operator, result.operator_duplicate_count,
+                       result.cost_duplicate_count)
+    return AnalysisResult(result.result_df, None, join, result.quantity_col, result.order_count,
+                          result.other_count, result.missing_cost_count, cube=result.cube,
+                          duplicate_count=result.duplicate_count)
+
+
+class SharedTables:
+    """按 (类型, 文件路径, 编码设置, 紧凑模式) 保留最近使用的数据表
+
+    文件内容未变化时返回同一个数据表对象，AnalysisPipeline 据此复用已计算的阶段。
+    可以在多个线程中同时使用；同一张表同时被请求时只读取一次。
+    """
+
+    def __init__(self, table_cache=None, max_tables=MAX_TABLES):
+        self.table_cache = table_cache or TableCache()
+        self.max_tables = max_tables
+        # 键 → (文件哈希, 数据表)，按最近使用排序
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __len__(self):
+        return len(self._tables)
+
+    def _read(self, kind, paths, encoding_setting, compact):
+        frames = []
+        for path in paths:
+            usecols, text_columns = select_columns(kind, read_header(path, encoding_setting))
+            frames.append(self.table_cache.read_table(path, encoding_setting, usecols=usecols,
+                                                      text_columns=text_columns))
+        df = frames[0] if len(frames) == 1 else combine_order_frames(frames)
+        if compact:
+            attrs = dict(df.attrs)
+            df = compact_table(df)
+            df.attrs.update(attrs)
+        return df
+
+    def get(self, kind, paths, encoding_setting='auto', compact=False):
+        """读取数据表（文件未变化时返回内存中的同一个数据表），返回 (数据表, 是否复用)"""
+        paths = tuple(as_paths(paths))
+        key = (kind, paths, encoding_setting, compact)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            fingerprints = tuple(file_fingerprint(path) for path in paths)
+            with self._lock:
+                entry = self._tables.get(key)
+                if entry is not None and entry[0] == fingerprints:
+                    self._tables.move_to_end(key)
+                    return entry[1], True
+            df = self._read(kind, paths, encoding_setting, compact)
+            with self._lock:
+                self._tables[key] = (fingerprints, df)
+                while len(self._tables) > self.max_tables:
+                    evicted, _ = self._tables.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+        return df, False
+
+    def analyze(self, pipeline, paths, encoding_setting='auto', compact=False, progress=None,
+                cancel_event=None):
+        """用 pipeline 分析三张数据表，返回 (不含逐单明细的结果, 复用的内存数据表个数)"""
+        if progress is not None:
+            progress('read')
+        frames = {}
+        reused = 0
+        for kind in KINDS:
+            frames[kind], hit = self.get(kind, paths[kind], encoding_setting, compact)
+            reused += hit
+        result = pipeline.run(frames['order'], frames['operator'], frames['cost'],
+                              progress=progress, cancel_event=cancel_event)
+        if not isinstance(paths['order'], str):
+            result.duplicate_count = frames['order'].attrs.get(DUPLICATE_COUNT_ATTR, 0)
+        return portable_result(result), reused
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
@@ -0,0 +1,82 @@
+"""订单状态分类规则表与状态分类索引"""
+import numpy as np
+import pandas as pd
+
+# 规则编号（同时也是匹配掩码中的位序号），按优先级排列
+RECEIVED = 0
+RETURNED = 1
+SHIPPED = 2
+PENDING = 3
+# 未匹配任何规则的状态
+OTHER = 4
+
+# 状态规则表：(规则编号, 汇总列名, 关键字)
+# 盈亏计算按优先级取第一个匹配的规则；汇总计数则按各规则独立统计
+STATUS_RULES = [
+    (RECEIVED, '已收货订单', ['已收货', '已完成', '完成', '收货']),
+    (RETURNED, '退货订单', ['退货', '退款', '退回']),
+    (SHIPPED, '已发货待收货', ['已发货待收货', '已发货', '待收货']),
+    (PENDING, None, ['待发货', '待处理', '待确认']),
+]
+
+# 匹配掩码的取值个数（每条规则占一位）
+N_STATUS_CODES = 1 << len(STATUS_RULES)
+
+
+def rule_keywords(rule):
+    """返回指定规则的关键字列表"""
+    return STATUS_RULES[rule][2]
+
+
+def match_status(value):
+    """计算单个订单状态的规则匹配掩码，非字符串（含缺失值）不匹配任何规则"""
+    if not isinstance(value, str):
+        return 0
+    status = value.strip().lower()
+    mask = 0
+    for rule, _, keywords in STATUS_RULES:
+        if any(s in status for s in keywords):
+            mask |= 1 << rule
+    return mask
+
+
+def classify_statuses(status):
+    """将订单状态列映射为紧凑的分类列（分类编码即规则匹配掩码）
+
+    每个不同的状态值只分类一次，耗时与状态种类数相关而与订单数无关。
+    """
+    codes, uniques = pd.factorize(status, use_na_sentinel=True)
+    unique_masks = np.array([match_status(v) for v in uniques] + [0], dtype=np.int8)
+    # 缺失值的编码为-1，正好取到末尾追加的0
+    row_masks = unique_masks[codes]
+    return pd.Categorical.from_codes(row_masks, categories=range(N_STATUS_CODES))
+
+
+def _build_category_table():
+    """预先计算每个匹配掩码对应的盈亏计算分类（第一个匹配的规则）"""
+    table = np.full(N_STATUS_CODES, OTHER, dtype=np.int8)
+    for mask in range(N_STATUS_CODES):
+        for rule, _, _ in STATUS_RULES:
+            if mask & (1 << rule):
+                table[mask] = rule
+                break
+    return table
+
+
+CATEGORY_BY_CODE = _build_category_table()
+
+
+def status_categories(status_codes):
+    """由分类编码得到每行的盈亏计算分类"""
+    return CATEGORY_BY_CODE[np.asarray(status_codes)]
+
+
+def count_flags():
+    """返回 (汇总列名列表, 编码×列 的0/1矩阵)，用于由编码计数得到各状态订单数"""
+    rules = [(rule, name) for rule, name, _ in STATUS_RULES if name]
+    flags = np.zeros((N_STATUS_CODES, len(rules)), dtype=np.int64)
+    for j, (rule, _) in enumerate(rules):
+        for mask in range(N_STATUS_CODES):
+            if mask & (1 << rule):
+                flags[mask, j] = 1
+    return [name for _, name in rules], flags
@@ -0,0 +1,73 @@
+"""按运营人员汇总订单盈亏"""
+import numpy as np
+import pandas as pd
+
+from status_rules import N_STATUS_CODES, classify_statuses, count_flags
+
+# 部分汇总中用于计算平均每单盈亏的计数列
+PROFIT_COUNT = '盈亏计数'
+
+
+def partial_summary(df):
+    """按运营人员计算可累加的部分汇总（各项计数、求和以及盈亏的计数）
+
+    所有计数和求和都基于运营人员编码和状态分类编码用 bincount 完成，
+    多个部分汇总可以用 combine_partials 合并，再由 finalize_summary 得到最终结果。
+    """
+    operator_codes, operators = pd.factorize(df['运营人员'], sort=True)
+    n_operators = len(operators)
+    valid = operator_codes >= 0
+    operator_codes = operator_codes[valid]
+
+    if '状态分类' in df.columns:
+        status_codes = df['状态分类'].cat.codes.to_numpy()
+    else:
+        status_codes = classify_statuses(df['订单状态']).codes
+    status_codes = status_codes[valid].astype(np.int64)
+
+    def grouped_sum(values):
+        return np.bincount(operator_codes, weights=values[valid], minlength=n_operators)
+
+    # 运营人员 × 状态分类 的订单数矩阵，再按规则标志合并为各状态订单数
+    code_counts = np.bincount(
+        operator_codes * N_STATUS_CODES + status_codes,
+        minlength=n_operators * N_STATUS_CODES
+    ).reshape(n_operators, N_STATUS_CODES)
+    count_names, flags = count_flags()
+    status_counts = code_counts @ flags
+
+    profit_loss = df['盈亏'].to_numpy(dtype='float64')
+    profit_valid = ~np.isnan(profit_loss)
+
+    partial = pd.DataFrame(index=pd.Index(operators, name='运营人员'))
+    partial['订单总数'] = grouped_sum(df['商品ID'].notna().to_numpy(dtype='float64')).astype('int64')
+    for j, name in enumerate(count_names):
+        partial[name] = status_counts[:, j]
+    partial['总盈亏'] = grouped_sum(np.where(profit_valid, profit_loss, 0.0))
+    partial['待确认盈利总额'] = grouped_sum(np.nan_to_num(df['待确认盈利'].to_numpy(dtype='float64')))
+    partial[PROFIT_COUNT] = grouped_sum(profit_valid.astype('float64')).astype('int64')
+    return partial
+
+
+def combine_partials(partials):
+    """合并多个部分汇总（同一运营人员的计数和求和相加）"""
+    partials = [p for p in partials if p is not None]
+    if not partials:
+        return None
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials).groupby(level=0, sort=True).sum()
+
+
+def finalize_summary(partial):
+    """由部分汇总计算平均每单盈亏，得到与 summarize_by_operator 相同的结果"""
+    result = partial.drop(columns=PROFIT_COUNT).reset_index()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['平均每单盈亏'] = (partial['总盈亏'].to_numpy(dtype='float64') /
+                             partial[PROFIT_COUNT].to_numpy(dtype='float64'))
+    return result
+
+
+def summarize_by_operator(df):
+    """按运营人员一次性分组汇总订单数、各状态订单数及盈亏"""
+    return finalize_summary(partial_summary(df))
@@ -0,0 +1,190 @@
+"""解析后数据表的本地列式缓存（按文件内容哈希和读取设置索引）"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from instrumentation import timed_stage
+from loaders import detect_encoding, read_table
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # 未安装 pyarrow 时使用 pickle 格式
+    feather = None
+
+# 默认缓存目录和容量上限
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.profit_calculator', 'tables')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# 缓存格式版本，读取逻辑变化导致解析结果不同时需要递增
+CACHE_VERSION = 2
+
+# 读取的数据表在 DataFrame.attrs 中记录读取时各文件的内容哈希（之后文件可能被修改）
+FINGERPRINT_ATTR = 'file_fingerprints'
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+# 按 (路径, 文件大小, 修改时间) 记录已计算的文件哈希
+_fingerprints = {}
+
+
+def file_fingerprint(file_path):
+    """计算文件内容的哈希值（同一 路径/大小/修改时间 只计算一次）"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    digest = _fingerprints.get(memo_key)
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        _fingerprints[memo_key] = digest
+    return digest
+
+
+class TableCache:
+    """把解析后的数据表以列式格式保存在本地目录，按最近使用时间淘汰
+
+    有 pyarrow 时使用 Feather 格式并以内存映射方式读取，否则使用 pickle。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def cache_key(self, file_path, encoding_setting='auto', sheet=0, usecols=None, text_columns=()):
+        """由文件内容哈希和读取设置（编码、工作表、读取的列）得到缓存键"""
+        settings = json.dumps({
+            'version': CACHE_VERSION,
+            'encoding': encoding_setting if file_path.endswith('.csv') else None,
+            'sheet': None if file_path.endswith('.csv') else sheet,
+            'usecols': None if usecols is None else list(usecols),
+            'text_columns': list(text_columns),
+        }, sort_keys=True, ensure_ascii=False)
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(file_fingerprint(file_path).encode())
+        hasher.update(settings.encode())
+        return hasher.hexdigest()
+
+    def _entries(self):
+        """返回缓存目录中的 (路径, 大小, 最近使用时间) 列表"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(('.feather', '.pkl')):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def load(self, key):
+        """读取缓存的数据表，不存在时返回 None"""
+        for ext in ('.feather', '.pkl'):
+            path = os.path.join(self.cache_dir, key + ext)
+            if not os.path.exists(path):
+                continue
+            try:
+                if ext == '.feather':
+                    df = feather.read_table(path, memory_map=True).to_pandas()
+                else:
+                    df = pd.read_pickle(path)
+            except Exception:
+                # 缓存文件损坏时删除并重新解析
+                self._remove(path)
+                return None
+            # 更新修改时间作为最近使用时间
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return df
+        return None
+
+    def store(self, key, df):
+        """保存数据表（先写入临时文件再替换，避免并发读取到不完整的文件）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            ext = '.pkl'
+            if feather is not None:
+                try:
+                    feather.write_feather(df, tmp_path)
+                    ext = '.feather'
+                except Exception:
+                    # 列名或混合类型列无法转换为 Arrow 时退回 pickle
+                    pass
+            if ext == '.pkl':
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, os.path.join(self.cache_dir, key + ext))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def read_table(self, file_path, encoding_setting='auto', profiler=None, usecols=None, text_columns=()):
+        """读取数据文件，内容和读取设置都未变化时直接使用缓存
+
+        usecols / text_columns 的含义与 loaders.read_table 相同。
+        profiler 不为空时分别记录计算哈希、读取缓存、检测编码、解析文件和写入缓存的耗时。
+        """
+        with timed_stage(profiler, 'hash', "计算文件哈希"):
+            fingerprint = file_fingerprint(file_path)
+            key = self.cache_key(file_path, encoding_setting, usecols=usecols, text_columns=text_columns)
+        with timed_stage(profiler, 'cache_load', "读取缓存") as timing:
+            df = self.load(key)
+            timing.rows_out = None if df is None else len(df)
+        if df is None:
+            if file_path.endswith('.csv') and encoding_setting == 'auto':
+                # 编码检测结果会被记住，解析时不会重复检测
+                with timed_stage(profiler, 'detect_encoding', "检测编码"):
+                    detect_encoding(file_path)
+            with timed_stage(profiler, 'parse', "解析文件") as timing:
+                df = read_table(file_path, encoding_setting, usecols=usecols, text_columns=text_columns)
+                timing.rows_out = len(df)
+            with timed_stage(profiler, 'cache_store', "写入缓存", len(df)):
+                try:
+                    self.store(key, df)
+                except OSError:
+                    # 缓存写入失败不影响读取结果
+                    pass
+        df.attrs[FINGERPRINT_ATTR] = (fingerprint,)
+        return df
+
+    def evict(self):
+        """缓存总大小超过上限时按最近使用时间从旧到新删除"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def size(self):
+        """缓存占用的总字节数"""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """删除所有缓存文件"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,297 @@
+"""常驻后台分析进程：保持 pandas 等库已导入、解析后的数据表保留在内存中，多次启动界面时复用
+
+后台进程由界面第一次使用时启动（python main.py --warm-process），与界面进程分离，
+界面关闭后继续运行，空闲超过 idle_timeout 后自动退出。进程只监听本机地址，
+地址和随机生成的认证密钥写在只有当前用户可读的状态文件中，界面通过
+multiprocessing.connection 发送分析请求，进度和结果（不含逐单明细）随后返回。
+程序文件更新后，旧版本的后台进程会被关闭并重新启动。
+"""
+import hashlib
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from analysis import AnalysisCancelled, AnalysisError, check_cancelled
+from pipeline import AnalysisPipeline
+from shared_tables import SharedTables
+
+# 状态文件：后台进程的地址、认证密钥和进程号
+STATE_PATH = os.path.join(os.path.expanduser('~'), '.profit_calculator', 'warm_process.json')
+# 启动后台进程时传给 main.py 的参数（与 main.py 中的 WARM_PROCESS_FLAG 相同）
+LAUNCH_FLAG = '--warm-process'
+# 空闲多久后退出（秒）
+DEFAULT_IDLE_TIMEOUT = 4 * 3600
+# 等待新启动的后台进程就绪的时间（导入 pandas 需要几秒）
+START_TIMEOUT = 30
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class WarmProcessError(Exception):
+    """后台分析进程无法启动或连接中断"""
+
+
+def code_version():
+    """程序文件的版本标识（文件大小和修改时间的哈希），程序更新后与运行中的后台进程不同"""
+    names = sorted(name for name in os.listdir(MODULE_DIR) if name.endswith('.py'))
+    paths = [os.path.join(MODULE_DIR, name) for name in names] or [sys.executable]
+    hasher = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        stat = os.stat(path)
+        hasher.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return hasher.hexdigest()
+
+
+def read_state(state_path=STATE_PATH):
+    """读取状态文件，不存在或损坏时返回 None"""
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(state_path, state):
+    """状态文件中有认证密钥，只允许当前用户读取"""
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = state_path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+class WarmServer:
+    """后台分析进程中的服务：每个连接一个线程，分析请求依次执行"""
+
+    def __init__(self, state_path=STATE_PATH, table_cache=None, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 check_interval=60):
+        self.state_path = state_path
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.version = code_version()
+        self.pipeline = AnalysisPipeline()
+        self.tables = SharedTables(table_cache)
+        self._lock = threading.Lock()
+        self._activity_lock = threading.Lock()
+        self._connections = 0
+        self._last_active = time.monotonic()
+        self._stopping = False
+        self._authkey = secrets.token_bytes(32)
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        self.address = self._listener.address
+
+    def _touch(self, delta=0):
+        with self._activity_lock:
+            self._connections += delta
+            self._last_active = time.monotonic()
+
+    def _idle(self):
+        with self._activity_lock:
+            return self._connections == 0 and time.monotonic() - self._last_active > self.idle_timeout
+
+    def serve_forever(self):
+        """写入状态文件并处理连接，直到 stop() 或空闲超时"""
+        _write_state(self.state_path, {
+            'host': self.address[0], 'port': self.address[1], 'authkey': self._authkey.hex(),
+            'pid': os.getpid(), 'version': self.version,
+        })
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (AuthenticationError, EOFError, OSError):
+                    if self._stopping:
+                        break
+                    continue
+                if self._stopping:
+                    conn.close()
+                    break
+                self._touch(1)
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._listener.close()
+            # 状态文件已被新启动的后台进程覆盖时保留
+            state = read_state(self.state_path)
+            if state is not None and state.get('pid') == os.getpid() and state.get('port') == self.address[1]:
+                try:
+                    os.remove(self.state_path)
+                except OSError:
+                    pass
+
+    def stop(self):
+        """停止接受新的连接（连接一次自身使 accept 返回）"""
+        self._stopping = True
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except (AuthenticationError, EOFError, OSError):
+            pass
+
+    def _watch_idle(self):
+        while not self._stopping:
+            time.sleep(self.check_interval)
+            if self._idle():
+                self.stop()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    command, kwargs = conn.recv()
+                except EOFError:
+                    return
+                self._touch()
+                try:
+                    value = self._dispatch(command, kwargs, conn)
+                except AnalysisCancelled:
+                    # 界面取消了分析并关闭了连接
+                    return
+                except AnalysisError as e:
+                    reply = ('analysis_error', str(e))
+                except Exception as e:
+                    reply = ('error', str(e))
+                else:
+                    reply = ('ok', value)
+                conn.send(reply)
+                if command == 'shutdown':
+                    self.stop()
+                    return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            self._touch(-1)
+
+    def _dispatch(self, command, kwargs, conn):
+        if command == 'ping':
+            return {'pid': os.getpid(), 'version': self.version, 'tables': len(self.tables)}
+        if command == 'shutdown':
+            return None
+        if command == 'analyze':
+            def progress(*args):
+                try:
+                    conn.send(('progress', args))
+                except OSError:
+                    raise AnalysisCancelled()
+            return self.analyze(progress=progress, **kwargs)
+        raise ValueError(f"未知的请求: {command}")
+
+    def analyze(self, paths, encoding_setting='auto', compact=False, progress=None):
+        """分析三张数据表，返回 (不含逐单明细的结果, 复用的内存数据表个数)"""
+        with self._lock:
+            return self.tables.analyze(self.pipeline, paths, encoding_setting, compact, progress=progress)
+
+
+def serve(state_path=STATE_PATH, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """后台进程的入口"""
+    WarmServer(state_path, idle_timeout=idle_timeout).serve_forever()
+
+
+def start_process():
+    """启动与当前进程分离的后台分析进程（打包为可执行文件时由可执行文件带参数启动）"""
+    if getattr(sys, 'frozen', False):
+        command = [sys.executable, LAUNCH_FLAG]
+    else:
+        command = [sys.executable, os.path.join(MODULE_DIR, 'main.py'), LAUNCH_FLAG]
+    options = {}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, close_fds=True, **options)
+
+
+class WarmClient:
+    """界面进程中的客户端，需要时启动后台进程"""
+
+    def __init__(self, state_path=STATE_PATH, start_timeout=START_TIMEOUT, launcher=start_process):
+        self.state_path = state_path
+        self.start_timeout = start_timeout
+        self.launcher = launcher
+
+    def _connect(self):
+        state = read_state(self.state_path)
+        if state is None:
+            raise WarmProcessError("后台分析进程未运行")
+        try:
+            return Client((state['host'], state['port']), authkey=bytes.fromhex(state['authkey']))
+        except (AuthenticationError, EOFError, OSError, KeyError, ValueError) as e:
+            raise WarmProcessError(f"无法连接后台分析进程: {e}")
+
+    def _request(self, command, progress=None, cancel_event=None, **kwargs):
+        conn = self._connect()
+        try:
+            conn.send((command, kwargs))
+            while True:
+                check_cancelled(cancel_event)
+                if not conn.poll(0.1):
+                    continue
+                kind, value = conn.recv()
+                if kind == 'progress':
+                    if progress is not None:
+                        progress(*value)
+                    continue
+                if kind == 'analysis_error':
+                    raise AnalysisError(value)
+                if kind == 'error':
+                    raise RuntimeError(value)
+                return value
+        except (EOFError, OSError) as e:
+            raise WarmProcessError(f"与后台分析进程的连接中断: {e}")
+        finally:
+            # 取消时关闭连接，后台进程在下一个阶段开始时停止
+            conn.close()
+
+    def ping(self):
+        return self._request('ping')
+
+    def running(self):
+        """后台进程是否在运行（且与当前程序版本相同）"""
+        try:
+            return self.ping()['version'] == code_version()
+        except WarmProcessError:
+            return False
+
+    def ensure_running(self):
+        """连接后台进程，未运行或版本不同时启动新的后台进程，返回其状态"""
+        try:
+            info = self.ping()
+            if info['version'] == code_version():
+                return info
+            self.shutdown()
+        except WarmProcessError:
+            pass
+        self.launcher()
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                info = self.ping()
+                if info['version'] == code_version():
+                    return info
+            except WarmProcessError:
+                pass
+            if time.monotonic() > deadline:
+                raise WarmProcessError("后台分析进程启动超时")
+            time.sleep(0.2)
+
+    def analyze(self, paths, encoding_setting='auto', compact=False, progress=None, cancel_event=None):
+        """在后台进程中分析，返回 (结果, 状态栏说明)"""
+        self.ensure_running()
+        result, reused = self._request('analyze', progress=progress, cancel_event=cancel_event,
+                                       paths=paths, encoding_setting=encoding_setting, compact=compact)
+        return result, f"后台分析进程 (复用内存中的数据表 {reused}/3)"
+
+    def shutdown(self):
+        """关闭后台进程（未运行时不做任何事）"""
+        try:
+            self._request('shutdown')
+        except WarmProcessError:
+            pass
@@ -0,0 +1,128 @@
+"""后台任务：在工作线程中执行耗时操作，并通过 root.after 把结果送回界面线程"""
+import queue
+import threading
+
+from analysis import AnalysisCancelled, check_cancelled
+
+
+class BackgroundTask:
+    """在后台线程中运行 func(progress, cancel_event)
+
+    progress 可在工作线程中任意调用，回调 on_progress / on_done / on_error /
+    on_cancel 都在 Tk 主线程中执行，因此可以直接更新界面控件。
+    """
+
+    def __init__(self, root, func, on_progress=None, on_done=None, on_error=None,
+                 on_cancel=None, poll_interval=50):
+        self.root = root
+        self.func = func
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.poll_interval = poll_interval
+        self.cancel_event = threading.Event()
+        self._messages = queue.Queue()
+        self._thread = None
+        self._finished = False
+        # 工作线程结束时设置，供其他线程通过 wait() 取得结果
+        self._completed = threading.Event()
+        self._outcome = None
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._finished
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_interval, self._poll)
+        return self
+
+    def cancel(self):
+        """请求取消任务（在下一个阶段开始前生效）"""
+        self.cancel_event.set()
+
+    def _progress(self, *args):
+        self._messages.put(('progress', args))
+
+    def wait(self, cancel_event=None, interval=0.1):
+        """在另一个工作线程中等待本任务结束并返回其结果
+
+        任务出错时抛出同样的异常，任务被取消时抛出 AnalysisCancelled；
+        cancel_event 被设置时停止等待并抛出 AnalysisCancelled。
+        """
+        while not self._completed.wait(interval):
+            check_cancelled(cancel_event)
+        kind, value = self._outcome
+        if kind == 'done':
+            return value
+        if kind == 'cancel':
+            raise AnalysisCancelled()
+        raise value
+
+    def _run(self):
+        try:
+            result = self.func(self._progress, self.cancel_event)
+        except AnalysisCancelled:
+            self._outcome = ('cancel', None)
+            self._messages.put(('cancel', ()))
+        except Exception as e:
+            self._outcome = ('error', e)
+            self._messages.put(('error', (e,)))
+        else:
+            self._outcome = ('done', result)
+            self._messages.put(('done', (result,)))
+        self._completed.set()
+
+    def _poll(self):
+        """在主线程中处理工作线程发来的消息"""
+        try:
+            while True:
+                kind, args = self._messages.get_nowait()
+                if kind == 'progress':
+                    if self.on_progress:
+                        self.on_progress(*args)
+                    continue
+                self._finished = True
+                callback = {'done': self.on_done, 'error': self.on_error,
+                            'cancel': self.on_cancel}[kind]
+                if callback:
+                    callback(*args)
+                return
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_interval, self._poll)
+
+
+def run_concurrently(funcs, cancel_event=None, interval=0.1):
+    """在各自的后台线程中同时运行 {名称: 无参函数}，返回 ({名称: 结果}, {名称: 异常})
+
+    某个函数出错不影响其他函数继续运行；cancel_event 被设置时不再等待，
+    抛出 AnalysisCancelled（已开始的函数在后台运行完毕后结果被丢弃）。
+    pandas 的 C 解析器和 pyarrow 解析时会释放 GIL，多个文件可以真正并行读取。
+    """
+    messages = queue.Queue()
+
+    def run(name, func):
+        try:
+            messages.put((name, True, func()))
+        except Exception as e:
+            messages.put((name, False, e))
+
+    for name, func in funcs.items():
+        threading.Thread(target=run, args=(name, func), daemon=True).start()
+
+    results = {}
+    errors = {}
+    while len(results) + len(errors) < len(funcs):
+        check_cancelled(cancel_event)
+        try:
+            name, ok, value = messages.get(timeout=interval)
+        except queue.Empty:
+            continue
+        if ok:
+            results[name] = value
+        else:
+            errors[name] = value
+    return results, errors
@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+from analysis import (  # noqa: E402
+    AnalysisCancelled, MissingColumnsError, format_summary, run_analysis, run_streaming_analysis
+)
+from profit_engine import calculate_profit_loss  # noqa: E402
+
+
+def make_tables(n=300, seed=7):
+    rng = np.random.default_rng(seed)
+    statuses = np.array(["已收货", "交易完成", "退货退款", "已发货", "待发货", "已取消"], dtype=object)
+    order_df = pd.DataFrame({
+        "商品id": rng.integers(1, 30, n),
+        "SKU": [f"SKU{i:03d}" for i in rng.integers(1, 40, n)],
+        "状态": statuses[rng.integers(0, len(statuses), n)],
+        "实收金额": rng.uniform(10, 300, n).round(2),
+        "数量": rng.integers(1, 5, n),
+        "运费": rng.choice([0, 6, 8], n),
+    })
+    operator_df = pd.DataFrame({
+        "商品ID": list(range(1, 26)) + [3, 4],
+        "运营": [f"运营{i % 4}" for i in range(1, 26)] + ["重复A", "重复B"],
+    })
+    cost_df = pd.DataFrame({
+        "商品编码": [f"SKU{i:03d}" for i in range(1, 35)],
+        "成本价": rng.uniform(5, 100, 34).round(2),
+    })
+    return order_df, operator_df, cost_df
+
+
+def reference_summary(order_df, operator_df, cost_df):
+    order_df = order_df.rename(columns={"商品id": "商品ID", "SKU": "商品编码", "状态": "订单状态", "数量": "商品数量"})
+    operator_df = operator_df.rename(columns={"运营": "运营人员"}).drop_duplicates(subset=["商品ID"], keep="first")
+    cost_df = cost_df.rename(columns={"成本价": "商品成本"})
+    merged = pd.merge(order_df, operator_df, on=["商品ID"], how="left")
+    merged["运营人员"] = merged["运营人员"].fillna("其他")
+    merged = pd.merge(merged, cost_df, on="商品编码", how="left")
+    merged[["盈亏", "待确认盈利"]] = merged.apply(calculate_profit_loss, axis=1)
+    summary = merged.groupby("运营人员").agg(
+        订单总数=("商品ID", "count"),
+        已收货订单=("订单状态", lambda x: x.str.contains("已收货|已完成|完成|收货", case=False, na=False).sum()),
+        退货订单=("订单状态", lambda x: x.str.contains("退货|退款|退回", case=False, na=False).sum()),
+        已发货待收货=("订单状态", lambda x: x.str.contains("已发货待收货|已发货|待收货", case=False, na=False).sum()),
+        总盈亏=("盈亏", "sum"),
+        待确认盈利总额=("待确认盈利", "sum"),
+        平均每单盈亏=("盈亏", "mean")
+    ).reset_index()
+    return format_summary(summary)
+
+
+class TestRunAnalysis(unittest.TestCase):
+    def test_matches_reference_pipeline(self):
+        order_df, operator_df, cost_df = make_tables()
+        result = run_analysis(order_df, operator_df, cost_df)
+        expected = reference_summary(order_df, operator_df, cost_df)
+        pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                      expected.reset_index(drop=True), check_dtype=False)
+        self.assertEqual(result.operator_duplicate_count, 4)
+        self.assertEqual(result.merge_on_operator, ["商品ID"])
+        self.assertEqual(result.result_df["运营"].iloc[-1], "其他")
+
+    def test_input_frames_are_not_modified(self):
+        order_df, operator_df, cost_df = make_tables()
+        before = [df.copy() for df in (order_df, operator_df, cost_df)]
+        run_analysis(order_df, operator_df, cost_df)
+        for original, df in zip(before, (order_df, operator_df, cost_df)):
+            pd.testing.assert_frame_equal(original, df)
+
+    def test_progress_and_cancel(self):
+        order_df, operator_df, cost_df = make_tables(n=20)
+        stages = []
+        run_analysis(order_df, operator_df, cost_df, progress=stages.append)
+        self.assertEqual(stages, ["merge", "profit", "aggregate"])
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            run_analysis(order_df, operator_df, cost_df, cancel_event=cancel_event)
+
+    def test_missing_columns(self):
+        order_df, operator_df, cost_df = make_tables(n=5)
+        with self.assertRaises(MissingColumnsError) as ctx:
+            run_analysis(order_df.drop(columns=["状态"]), operator_df, cost_df)
+        self.assertIn("订单表中缺少订单状态列", str(ctx.exception))
+
+
+class TestStreamingAnalysis(unittest.TestCase):
+    def test_chunked_csv_matches_in_memory_path(self):
+        order_df, operator_df, cost_df = make_tables(n=1000, seed=11)
+        expected = run_analysis(order_df, operator_df, cost_df)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            order_df.to_csv(path, index=False, encoding="gbk")
+            progress = []
+            result = run_streaming_analysis(path, operator_df, cost_df, "gbk", chunksize=128,
+                                            progress=lambda stage, rows: progress.append(rows))
+
+        pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                      expected.result_df.reset_index(drop=True))
+        self.assertIsNone(result.merged_df)
+        self.assertEqual(result.order_count, 1000)
+        self.assertEqual(result.other_count, expected.other_count)
+        self.assertEqual(result.missing_cost_count, expected.missing_cost_count)
+        self.assertEqual(max(progress), 896)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import AnalysisCancelled, AnalysisError, run_analysis  # noqa: E402
+from analysis_service import (  # noqa: E402
+    AnalysisService, ServiceBusy, ServiceClient, ServiceError, ServiceServer, frame_from_json, frame_to_json,
+    main
+)
+from shared_tables import SharedTables  # noqa: E402
+from table_cache import TableCache  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class BlockingTables(SharedTables):
+    """分析开始后等待 release 被设置，用于测试排队"""
+
+    def __init__(self, table_cache):
+        super().__init__(table_cache)
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def analyze(self, *args, **kwargs):
+        self.started.set()
+        self.release.wait(10)
+        return super().analyze(*args, **kwargs)
+
+
+class TestAnalysisService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=600)
+        self.paths = {}
+        for kind, df in (("order", self.order_df), ("operator", self.operator_df), ("cost", self.cost_df)):
+            self.paths[kind] = os.path.join(self.tmp.name, f"{kind}.csv")
+            df.to_csv(self.paths[kind], index=False)
+        self.table_cache = TableCache(os.path.join(self.tmp.name, "tables"))
+
+    def start(self, workers=2, max_queue=4, tables=None, token=None):
+        if tables is None:
+            tables = SharedTables(self.table_cache)
+        service = AnalysisService(workers, max_queue, tables)
+        server = ServiceServer(("127.0.0.1", 0), service, token=token)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(service.stop)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return service, f"http://127.0.0.1:{server.server_address[1]}"
+
+    def test_clients_share_tables(self):
+        _, url = self.start()
+        stages = []
+        result, note = ServiceClient(url).analyze(self.paths, progress=stages.append)
+        expected = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+        pd.testing.assert_frame_equal(result.cube, expected.cube)
+        self.assertEqual(result.order_count, expected.order_count)
+        self.assertEqual(result.warnings(), expected.warnings())
+        self.assertIn("read", stages)
+        self.assertIn("0/3", note)
+
+        # 另一个用户分析相同的文件时不再读取
+        result, note = ServiceClient(url).analyze(self.paths)
+        self.assertIn("3/3", note)
+        self.assertEqual(ServiceClient(url).status()["tables"], 3)
+
+    def test_queue_is_bounded(self):
+        tables = BlockingTables(self.table_cache)
+        service, url = self.start(workers=1, max_queue=1, tables=tables)
+        client = ServiceClient(url)
+        running = client.submit(self.paths)
+        tables.started.wait(5)
+        queued = client.submit(self.paths)
+        self.assertEqual(client.job(queued)["position"], 1)
+        with self.assertRaises(ServiceBusy):
+            client.submit(self.paths)
+        self.assertEqual(client.cancel(queued)["state"], "cancelled")
+        waiting = client.submit(self.paths)
+        tables.release.set()
+        events = list(client.events(waiting))
+        self.assertEqual(events[-1]["event"], "done")
+        self.assertEqual(client.job(running)["state"], "done")
+        self.assertEqual(service.status()["queued"], 0)
+
+    def test_errors_and_cancel(self):
+        _, url = self.start()
+        client = ServiceClient(url)
+        cost_path = os.path.join(self.tmp.name, "bad_cost.csv")
+        self.cost_df.drop(columns="成本价").to_csv(cost_path, index=False)
+        with self.assertRaises(AnalysisError):
+            client.analyze(dict(self.paths, cost=cost_path))
+        with self.assertRaises(ServiceError):
+            client.submit({"order": self.paths["order"]})
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            client.analyze(self.paths, cancel_event=cancel_event)
+        with self.assertRaises(ServiceError):
+            ServiceClient("http://127.0.0.1:1").status()
+
+    def test_invalid_paths_are_rejected(self):
+        service, url = self.start()
+        client = ServiceClient(url)
+        for order in (5, None, [], ["a.csv", 3], {"path": "a.csv"}):
+            with self.assertRaises(ServiceError):
+                client.submit(dict(self.paths, order=order))
+        with self.assertRaises(ServiceError):
+            client.submit(dict(self.paths, cost=["cost.csv"]))
+        with self.assertRaises(ValueError):
+            service.submit(dict(self.paths, operator=1))
+        # 出错的请求不影响之后的分析
+        result, _ = client.analyze(dict(self.paths, order=[self.paths["order"]]))
+        self.assertEqual(result.order_count, len(self.order_df))
+
+    def test_non_loopback_host_requires_token(self):
+        with mock.patch.dict(os.environ, {"PROFIT_SERVICE_TOKEN": ""}), \
+                mock.patch("analysis_service.ServiceServer") as server:
+            for host in ("0.0.0.0", "192.168.1.10", ""):
+                with self.assertRaises(SystemExit):
+                    main(["--host", host])
+            server.assert_not_called()
+
+    def test_token(self):
+        _, url = self.start(token="secret")
+        # 缺少令牌、前缀相同的错误令牌和含非 ASCII 字符的令牌都被拒绝
+        for token in (None, "secre", "secrét"):
+            with self.assertRaises(ServiceError):
+                ServiceClient(url, token=token).status()
+        self.assertEqual(ServiceClient(url, token="secret").status()["workers"], 2)
+
+    def test_frame_json_round_trip(self):
+        df = pd.DataFrame({
+            "日期": pd.to_datetime(["2024-01-02", None]),
+            "运营人员": ["运营1", None],
+            "金额": [1.5, np.nan],
+            "状态编码": np.array([1, 2], dtype="int8"),
+            "分类": pd.Categorical(["a", "b"]),
+        })
+        restored = frame_from_json(json.loads(json.dumps(frame_to_json(df))))
+        pd.testing.assert_frame_equal(restored, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis  # noqa: E402
+from batch import expand_order_paths, main, run_batch, shop_names  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.shops = []
+        for seed in range(3):
+            order_df, operator_df, cost_df = make_tables(n=300, seed=seed)
+            path = os.path.join(self.tmp.name, "exports", f"店铺{seed}.csv")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            order_df.to_csv(path, index=False, encoding="gbk")
+            self.shops.append((path, order_df))
+        self.operator_df, self.cost_df = operator_df, cost_df
+        self.operator_path = os.path.join(self.tmp.name, "operator.csv")
+        self.cost_path = os.path.join(self.tmp.name, "cost.csv")
+        operator_df.to_csv(self.operator_path, index=False)
+        cost_df.to_csv(self.cost_path, index=False)
+
+    def test_reports_match_single_analysis(self):
+        out = os.path.join(self.tmp.name, "reports")
+        paths = expand_order_paths([os.path.join(self.tmp.name, "exports")])
+        combined, overview, errors = run_batch(paths, self.operator_path, self.cost_path, out,
+                                               workers=1, log=lambda message: None)
+        self.assertEqual(errors, {})
+        all_orders = pd.concat([df for _, df in self.shops], ignore_index=True)
+        expected = run_analysis(all_orders, self.operator_df, self.cost_df).result_df
+        pd.testing.assert_frame_equal(combined.reset_index(drop=True), expected.reset_index(drop=True))
+
+        shop = pd.read_csv(os.path.join(out, "店铺1_汇总.csv"))
+        expected_shop = run_analysis(self.shops[1][1], self.operator_df, self.cost_df).result_df
+        self.assertAlmostEqual(shop["总盈亏"].sum(), expected_shop["总盈亏"].sum(), places=6)
+        self.assertEqual(overview["订单数"].tolist(), [300, 300, 300])
+
+    def test_process_pool_and_failed_file(self):
+        bad = os.path.join(self.tmp.name, "exports", "损坏.xlsx")
+        with open(bad, "w") as f:
+            f.write("not excel")
+        out = os.path.join(self.tmp.name, "reports")
+        code = main([os.path.join(self.tmp.name, "exports"), "--operator", self.operator_path,
+                     "--cost", self.cost_path, "-o", out, "--workers", "2"])
+        self.assertEqual(code, 1)
+        overview = pd.read_csv(os.path.join(out, "shops.csv"))
+        self.assertEqual(len(overview), 3)
+        self.assertTrue(os.path.exists(os.path.join(out, "combined_summary.csv")))
+
+    def test_same_file_names_in_different_directories(self):
+        # 每个店铺目录中都有一个 orders.csv
+        paths = []
+        for (_, order_df), shop in zip(self.shops[:2], ("店铺A", "店铺B")):
+            path = os.path.join(self.tmp.name, "by_shop", shop, "orders.csv")
+            os.makedirs(os.path.dirname(path))
+            order_df.to_csv(path, index=False)
+            paths.append(path)
+        out = os.path.join(self.tmp.name, "reports")
+        _, overview, errors = run_batch(paths, self.operator_path, self.cost_path, out,
+                                        workers=1, log=lambda message: None)
+        self.assertEqual(errors, {})
+        self.assertEqual(overview["文件"].tolist(), ["店铺A/orders.csv", "店铺B/orders.csv"])
+        for (_, order_df), shop in zip(self.shops[:2], ("店铺A", "店铺B")):
+            report = pd.read_csv(os.path.join(out, f"{shop}_orders_汇总.csv"))
+            expected = run_analysis(order_df, self.operator_df, self.cost_df).result_df
+            self.assertAlmostEqual(report["总盈亏"].sum(), expected["总盈亏"].sum(), places=6)
+
+        # 只有扩展名不同的文件保留扩展名
+        names = shop_names(["exports/a.csv", "exports/a.xlsx", "exports/b.csv"])
+        self.assertEqual(list(names.values()), ["a_csv", "a_xlsx", "b"])
+        # 仍然重名时报错而不是覆盖
+        with self.assertRaises(ValueError):
+            shop_names(["exports/a_b.csv", "exports/a/b.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis  # noqa: E402
+from compact import compact_table, memory_bytes  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestCompactTable(unittest.TestCase):
+    def test_values_kept_and_memory_reduced(self):
+        order_df, _, _ = make_tables(n=5000)
+        compact = compact_table(order_df)
+        self.assertIsInstance(compact["状态"].dtype, pd.CategoricalDtype)
+        self.assertEqual(compact["数量"].dtype.itemsize, 1)
+        self.assertEqual(compact["实收金额"].dtype, "float64")
+        self.assertLess(memory_bytes(compact), memory_bytes(order_df) / 2)
+        pd.testing.assert_frame_equal(compact.astype(object), order_df.astype(object))
+
+    def test_mixed_text_column_unchanged(self):
+        df = pd.DataFrame({"商品编码": ["A", 1, "A", "A"]})
+        self.assertIs(compact_table(df)["商品编码"].dtype, df["商品编码"].dtype)
+
+    def test_analysis_results_match(self):
+        tables = make_tables(n=3000)
+        expected = run_analysis(*tables)
+        result = run_analysis(*[compact_table(df) for df in tables])
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+        self.assertEqual(result.other_count, expected.other_count)
+        self.assertEqual(result.missing_cost_count, expected.missing_cost_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import format_summary, run_analysis, run_streaming_analysis  # noqa: E402
+from cube import DATE, drilldown, rollup, summary_from_cube, top_skus, unparsed_dates  # noqa: E402
+from parallel import run_parallel_analysis  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+def make_dated_tables(n=1200):
+    order_df, operator_df, cost_df = make_tables(n=n)
+    order_df["下单时间"] = pd.date_range("2024-01-01", periods=n, freq="97min").strftime("%Y-%m-%d %H:%M:%S")
+    order_df.loc[5, "下单时间"] = None
+    return order_df, operator_df, cost_df
+
+
+class TestCube(unittest.TestCase):
+    def setUp(self):
+        self.order_df, self.operator_df, self.cost_df = make_dated_tables()
+        self.result = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        self.merged_df = self.result.merged_df
+        self.cube = self.result.cube
+
+    def test_summary_from_cube_matches_result(self):
+        self.assertLess(len(self.cube), len(self.order_df))
+        pd.testing.assert_frame_equal(format_summary(summary_from_cube(self.cube)).reset_index(drop=True),
+                                      self.result.result_df.reset_index(drop=True))
+
+    def test_drilldown_matches_raw_orders(self):
+        operator = "运营1"
+        orders = self.merged_df[self.merged_df["运营人员"] == operator]
+        skus = top_skus(self.cube, n=5, operator=operator)
+        expected = orders.groupby("商品编码")["盈亏"].sum().sort_values(kind="stable")
+        np.testing.assert_allclose(skus["总盈亏"], expected.head(5).to_numpy())
+        self.assertEqual(skus["商品编码"].tolist(), expected.head(5).index.tolist())
+
+        # 按月分桶，缺失日期单独成组，订单数不丢失
+        months = rollup(self.cube, by=[DATE], freq="M")
+        self.assertEqual(int(months["订单行数"].sum()), len(self.order_df))
+        self.assertEqual(int(months[DATE].isna().sum()), 1)
+        dates = pd.to_datetime(self.merged_df["订单日期"]).dt.to_period("M").dt.start_time
+        expected_months = self.merged_df.groupby(dates)["盈亏"].sum()
+        np.testing.assert_allclose(months.dropna(subset=[DATE])["总盈亏"], expected_months.to_numpy())
+
+        statuses = drilldown(self.cube, "状态", operator=operator)
+        self.assertEqual(int(statuses["订单行数"].sum()), len(orders))
+        self.assertIn("退货", statuses["状态"].tolist())
+
+    def test_streaming_and_parallel_cubes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            self.order_df.to_csv(path, index=False, encoding="gbk")
+            streamed = run_streaming_analysis(path, self.operator_df, self.cost_df, chunksize=250).cube
+        sharded = run_parallel_analysis(self.order_df, self.operator_df, self.cost_df, workers=2,
+                                        min_shard_rows=400).cube
+        for cube in (streamed, sharded):
+            pd.testing.assert_frame_equal(summary_from_cube(cube), summary_from_cube(self.cube))
+            pd.testing.assert_frame_equal(rollup(cube, by=["商品编码", DATE], freq="W"),
+                                          rollup(self.cube, by=["商品编码", DATE], freq="W"))
+
+    def test_mixed_date_formats(self):
+        order_df = self.order_df.copy()
+        order_df.loc[100:, "下单时间"] = pd.to_datetime(order_df.loc[100:, "下单时间"]).dt.strftime("%Y/%m/%d %H:%M")
+        order_df.loc[200:210, "下单时间"] = pd.to_datetime(order_df.loc[200:210, "下单时间"]).dt.strftime("%Y-%m-%d")
+        order_df.loc[7, "下单时间"] = "不是日期"
+        order_df.loc[8, "下单时间"] = "  "
+        result = run_analysis(order_df, self.operator_df, self.cost_df)
+        # 格式与第一个值不同的日期照常解析，只有无法解析的值计数并提示
+        self.assertEqual(unparsed_dates(result.cube), 1)
+        self.assertTrue(any("无法解析为日期" in warning for warning in result.warnings()))
+        daily = rollup(result.cube, by=[DATE], freq="D")
+        expected = rollup(self.cube, by=[DATE], freq="D")
+        self.assertEqual(daily["订单行数"].sum(), expected["订单行数"].sum())
+        self.assertEqual(daily.loc[daily[DATE].isna(), "订单行数"].sum(),
+                         expected.loc[expected[DATE].isna(), "订单行数"].sum() + 2)
+
+        # 分块读取时与整表解析的结果相同
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            order_df.to_csv(path, index=False)
+            streamed = run_streaming_analysis(path, self.operator_df, self.cost_df, chunksize=150).cube
+        self.assertEqual(unparsed_dates(streamed), 1)
+        pd.testing.assert_frame_equal(rollup(streamed, by=[DATE], freq="D"), daily)
+
+    def test_without_date_column(self):
+        order_df, operator_df, cost_df = make_tables()
+        cube = run_analysis(order_df, operator_df, cost_df).cube
+        self.assertNotIn(DATE, cube.columns)
+        with self.assertRaises(ValueError):
+            rollup(cube, by=[DATE])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+import data_table  # noqa: E402
+from data_table import DataTable  # noqa: E402
+
+
+class StubWidget:
+    """不需要显示器的控件替身，只记录调用"""
+
+    def __init__(self, *args, **kwargs):
+        self.bindings = {}
+
+    def grid(self, **kwargs):
+        pass
+
+    def pack(self, **kwargs):
+        pass
+
+    def columnconfigure(self, *args, **kwargs):
+        pass
+
+    def rowconfigure(self, *args, **kwargs):
+        pass
+
+    def bind(self, sequence, func):
+        self.bindings[sequence] = func
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+class StubTreeview(StubWidget):
+    """Treeview 替身：条目按插入顺序保存，选中变化时与 Tk 一样产生 <<TreeviewSelect>>"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.items = {}
+        self.headings = {}
+        self._selection = ()
+        self._next_id = 0
+
+    def __setitem__(self, key, value):
+        pass
+
+    def heading(self, column, text=None, command=None):
+        self.headings[column] = text
+
+    def column(self, column, **kwargs):
+        pass
+
+    def insert(self, parent, index, values=()):
+        item = f"I{self._next_id}"
+        self._next_id += 1
+        self.items[item] = list(values)
+        return item
+
+    def item(self, item, values=None):
+        if values is None:
+            return {'values': self.items[item]}
+        self.items[item] = list(values)
+
+    def delete(self, *items):
+        for item in items:
+            del self.items[item]
+        self._selection = tuple(i for i in self._selection if i in self.items)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, items):
+        self._selection = tuple(items)
+        if '<<TreeviewSelect>>' in self.bindings:
+            self.bindings['<<TreeviewSelect>>'](None)
+
+
+STUB_TTK = types.SimpleNamespace(Frame=StubWidget, Treeview=StubTreeview, Scrollbar=StubWidget)
+
+
+class TestDataTable(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(data_table, "ttk", STUB_TTK)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.df = pd.DataFrame({
+            "运营": [f"{i:03d}" for i in range(100)],
+            "金额": [float(i % 7) if i % 10 else np.nan for i in range(100)],
+        })
+        self.table = DataTable(None, height=10)
+        self.table.set_data(self.df)
+
+    def test_window_and_scroll_to_clamping(self):
+        self.assertEqual(len(self.table.tree.items), 10)
+        self.assertEqual(self.table.visible_values()[0], ("000", ""))
+        self.table.scroll_to(50)
+        self.assertEqual([row[0] for row in self.table.visible_values()], [f"{i:03d}" for i in range(50, 60)])
+        self.table.scroll_to(1000)
+        self.assertEqual(self.table.visible_values()[-1][0], "099")
+        self.table.scroll_to(-5)
+        self.assertEqual(self.table.visible_values()[0][0], "000")
+        # 只复用条目，不随滚动增加
+        self.assertEqual(len(self.table.tree.items), 10)
+
+    def test_stable_sort_with_missing_last_and_toggle(self):
+        self.table.sort_by("金额")
+        order = self.table._order
+        amounts = self.df["金额"].to_numpy()[order]
+        self.assertTrue(np.isnan(amounts[-10:]).all())
+        self.assertTrue((np.diff(amounts[:-10]) >= 0).all())
+        # 相同取值保持原来的先后顺序
+        zeros = order[:-10][amounts[:-10] == 0]
+        self.assertTrue((np.diff(zeros) > 0).all())
+        self.assertEqual(self.table.tree.headings["金额"], "金额 ▲")
+
+        self.table.sort_by("金额")
+        order = self.table._order
+        amounts = self.df["金额"].to_numpy()[order]
+        self.assertTrue(np.isnan(amounts[-10:]).all())
+        self.assertTrue((np.diff(amounts[:-10]) <= 0).all())
+        sixes = order[:-10][amounts[:-10] == 6]
+        self.assertTrue((np.diff(sixes) > 0).all())
+        self.assertEqual(self.table.tree.headings["金额"], "金额 ▼")
+
+    def test_selection_follows_rows(self):
+        tree = self.table.tree
+        tree.selection_set([self.table._items[7]])
+        # 滚动后条目显示其他行，选中的仍是原来的行
+        self.table.scroll_to(5)
+        self.assertEqual(tree.selection(), (self.table._items[2],))
+        self.assertEqual(self.table.selected_values(), [("007", 0.0)])
+        self.table.scroll_to(50)
+        self.assertEqual(tree.selection(), ())
+        self.assertEqual(self.table.selected_values(), [("007", 0.0)])
+
+        # 在窗口内再选一行，窗口外已选中的行保持选中；按显示顺序返回
+        tree.selection_set([self.table._items[0]])
+        self.table.sort_by("运营", ascending=False)
+        self.assertEqual([row[0] for row in self.table.selected_values()], ["050", "007"])
+
+    def test_clear(self):
+        self.table.tree.selection_set([self.table._items[1]])
+        self.table.clear()
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(self.table.tree.items, {})
+        self.assertEqual(self.table.visible_values(), [])
+        self.assertEqual(self.table.selected_values(), [])
+        self.table.set_data(self.df)
+        self.assertEqual(self.table.selected_values(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
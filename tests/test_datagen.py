@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+
+from analysis import run_analysis  # noqa: E402
+from datagen import generate_tables, parse_size, write_tables  # noqa: E402
+from loaders import read_table  # noqa: E402
+
+
+class TestDatagen(unittest.TestCase):
+    def test_same_seed_gives_same_tables(self):
+        first = generate_tables(2000, seed=3)
+        second = generate_tables(2000, seed=3)
+        for a, b in zip(first, second):
+            pd.testing.assert_frame_equal(a, b)
+        self.assertFalse(first[0].equals(generate_tables(2000, seed=4)[0]))
+        self.assertEqual(parse_size("100k"), 100_000)
+
+    def test_written_gbk_csv_can_be_analyzed(self):
+        tables = generate_tables(1000, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_tables(tables, tmp, "t", formats=("csv",))
+            loaded = [read_table(paths[(name, "csv")]) for name in ("order", "operator", "cost")]
+        self.assertEqual(len(loaded[0]), 1000)
+        result = run_analysis(*loaded)
+        self.assertGreater(result.missing_cost_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis, run_streaming_analysis  # noqa: E402
+from dedup import DUPLICATE_COUNT_ATTR, Deduplicator, SeenSet, combine_order_frames  # noqa: E402
+from order_store import OrderStore, run_store_analysis  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+def with_order_numbers(order_df):
+    return order_df.assign(订单号=[f"N{i:05d}" for i in range(len(order_df))])
+
+
+class TestDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=600)
+
+    def test_overlapping_files_without_order_numbers(self):
+        weekly = self.order_df.iloc[:400]
+        daily = self.order_df.iloc[300:]
+        combined = combine_order_frames([weekly, daily])
+        self.assertEqual(combined.attrs[DUPLICATE_COUNT_ATTR], 100)
+        pd.testing.assert_frame_equal(combined, self.order_df.reset_index(drop=True))
+
+    def test_identical_rows_counted_as_multiset(self):
+        row = self.order_df.iloc[[0]]
+        # 同一文件内的相同行保留；后面的文件只去除前面已出现的次数
+        first = pd.concat([row, row, self.order_df.iloc[1:3]])
+        second = pd.concat([row, row, row])
+        combined = combine_order_frames([first, second])
+        self.assertEqual(combined.attrs[DUPLICATE_COUNT_ATTR], 2)
+        self.assertEqual(len(combined), 5)
+
+    def test_order_number_key(self):
+        orders = with_order_numbers(self.order_df)
+        # 同一订单的多个商品不是重复订单
+        multi_item = orders.iloc[:2].assign(订单号="N99999")
+        later = orders.iloc[100:200].copy()
+        # 重新导出时金额等字段变化，仍按订单号识别为重复
+        later["实收金额"] = later["实收金额"] + 1
+        combined = combine_order_frames([pd.concat([orders.iloc[:300], multi_item]), later])
+        self.assertEqual(combined.attrs[DUPLICATE_COUNT_ATTR], 100)
+        self.assertEqual(len(combined), 302)
+
+        # 缺少订单号的行按整行内容识别
+        missing = orders.iloc[:20].assign(订单号=None)
+        combined = combine_order_frames([missing, pd.concat([missing.iloc[:10], orders.iloc[:5]])])
+        self.assertEqual(combined.attrs[DUPLICATE_COUNT_ATTR], 10)
+        self.assertEqual(len(combined), 25)
+
+    def test_numeric_types_do_not_matter(self):
+        first = self.order_df.iloc[:50]
+        second = first.astype({"商品id": "float64", "数量": "int8"})
+        combined = combine_order_frames([first, second])
+        self.assertEqual(combined.attrs[DUPLICATE_COUNT_ATTR], 50)
+
+    def test_chunks_and_appends_match_single_pass(self):
+        files = [self.order_df.iloc[:350], self.order_df.iloc[200:500], self.order_df.iloc[450:]]
+        expected = combine_order_frames(files)
+
+        dedup = Deduplicator()
+        parts = []
+        for df in files:
+            dedup.start_file()
+            for start in range(0, len(df), 70):
+                parts.append(dedup.filter(df.iloc[start:start + 70]))
+        pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), expected)
+        self.assertEqual(dedup.removed, expected.attrs[DUPLICATE_COUNT_ATTR])
+
+        # 追加文件时只处理新文件
+        dedup = Deduplicator()
+        base = combine_order_frames(files[:2], dedup)
+        appended = combine_order_frames(files[2:], dedup, base=base)
+        pd.testing.assert_frame_equal(appended, expected)
+        self.assertEqual(appended.attrs, expected.attrs)
+        # 之前只有一个文件（没有记录指纹）时先记录它的指纹
+        appended = combine_order_frames(files[1:], Deduplicator(), base=files[0].reset_index(drop=True))
+        pd.testing.assert_frame_equal(appended, expected)
+
+    def test_chunk_cost_does_not_grow(self):
+        # 一个文件分成多个块：每块的耗时不应随文件中已有的键数增长
+        dedup = Deduplicator()
+        dedup.start_file()
+        times = []
+        for i in range(40):
+            chunk = pd.DataFrame({"订单号": [f"N{j}" for j in range(i * 20000, (i + 1) * 20000)]})
+            start = time.perf_counter()
+            dedup.filter(chunk)
+            times.append(time.perf_counter() - start)
+        self.assertLess(np.median(times[-10:]), 3 * np.median(times[1:11]))
+        # 后面的块中重复出现的键接着编号，与整个文件一次处理的结果相同
+        repeated = pd.DataFrame({"订单号": ["N5", "N5", "N39999"]})
+        self.assertEqual(len(dedup.filter(repeated)), 3)
+        other = Deduplicator(dedup.seen)
+        other.start_file()
+        self.assertEqual(len(other.filter(pd.DataFrame({"订单号": ["N5", "N5", "N5", "N5"]}))), 1)
+
+    def test_seen_set(self):
+        rng = np.random.default_rng(3)
+        values = rng.integers(0, 2 ** 63, 5000, dtype=np.uint64)
+        seen = SeenSet()
+        for start in range(0, len(values), 300):
+            seen.add(values[start:start + 300])
+        self.assertTrue(seen.contains(values).all())
+        self.assertFalse(seen.contains(values + np.uint64(1)).any())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "seen.npy")
+            seen.save(path)
+            loaded = SeenSet.load(path)
+            self.assertEqual(len(loaded), len(np.unique(values)))
+            self.assertTrue(loaded.contains(values).all())
+            self.assertEqual(len(SeenSet.load(os.path.join(tmp, "missing.npy"))), 0)
+
+
+class TestMultiFileAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        order_df, self.operator_df, self.cost_df = make_tables(n=900)
+        self.order_df = with_order_numbers(order_df)
+        self.paths = []
+        for i, (start, end) in enumerate(((0, 500), (400, 800), (700, 900))):
+            path = os.path.join(self.tmp.name, f"orders_{i}.csv")
+            self.order_df.iloc[start:end].to_csv(path, index=False)
+            self.paths.append(path)
+
+    def test_streaming_multiple_files(self):
+        expected = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        result = run_streaming_analysis(self.paths, self.operator_df, self.cost_df, chunksize=150,
+                                        dedup=Deduplicator())
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+        self.assertEqual(result.order_count, len(self.order_df))
+        self.assertEqual(result.duplicate_count, 200)
+        self.assertIn("去除重复订单: 200 条", result.status_message())
+        self.assertNotIn("去除重复订单", expected.status_message())
+
+    def test_order_store_removes_overlap_across_sessions(self):
+        store_path = os.path.join(self.tmp.name, "orders.sqlite")
+        run_store_analysis(OrderStore(store_path), self.paths[:2], self.operator_df, self.cost_df)
+        # 重新打开订单库，已导入订单的指纹从磁盘读取
+        result, message = run_store_analysis(OrderStore(store_path), self.paths[2], self.operator_df, self.cost_df)
+        self.assertIn("去除重复 100 单", message)
+        self.assertEqual(result.duplicate_count, 200)
+        self.assertEqual(result.order_count, len(self.order_df))
+        expected = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                      expected.result_df.reset_index(drop=True), check_dtype=False)
+
+    def test_seen_fingerprints_are_written_with_batch(self):
+        store = OrderStore(os.path.join(self.tmp.name, "orders.sqlite"))
+        # 写入汇总时出错，批次和指纹都不保存
+        with mock.patch.object(OrderStore, "_set_join", side_effect=RuntimeError("磁盘已满")):
+            with self.assertRaises(RuntimeError):
+                run_store_analysis(store, self.paths[0], self.operator_df, self.cost_df)
+        self.assertEqual(len(store.seen()), 0)
+        self.assertEqual(len(store.batches()), 0)
+
+        run_store_analysis(store, self.paths[0], self.operator_df, self.cost_df)
+        self.assertEqual(store.seen_count(), 500)
+        store.clear()
+        self.assertEqual(len(store.seen()), 0)
+
+        # 较早版本保存在订单库旁边的指纹文件在打开时移入订单库（大于 2**63 的指纹按位存为负数）
+        values = np.array([1, 2 ** 63 + 5, 2 ** 64 - 1], dtype=np.uint64)
+        legacy_path = os.path.join(self.tmp.name, "legacy-seen.npy")
+        SeenSet([values]).save(legacy_path)
+        legacy = OrderStore(os.path.join(self.tmp.name, "legacy.sqlite"))
+        self.assertFalse(os.path.exists(legacy_path))
+        self.assertEqual(legacy.seen_count(), 3)
+        probe = np.concatenate([values, values + np.uint64(1)])
+        self.assertEqual(legacy.contains_seen(probe).tolist(), [True] * 3 + [False] * 3)
+
+if __name__ == "__main__":
+    unittest.main()
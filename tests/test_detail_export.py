@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import detail_export  # noqa: E402
+from analysis import AnalysisCancelled, iter_merged_chunks, run_analysis  # noqa: E402
+from detail_export import ExportError, XlsxDetailWriter, iter_frame_chunks, write_detail  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class TestDetailExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=500)
+        self.merged_df = run_analysis(self.order_df, self.operator_df, self.cost_df).merged_df
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_csv_from_memory(self):
+        rows = []
+        written = write_detail(iter_frame_chunks(self.merged_df, 120), self.path("detail.csv"), rows.append)
+        self.assertEqual(written, 500)
+        self.assertEqual(rows, [120, 240, 360, 480, 500])
+        with open(self.path("detail.csv"), "rb") as f:
+            self.assertTrue(f.read(3) == b"\xef\xbb\xbf")
+        detail = pd.read_csv(self.path("detail.csv"), encoding="utf-8-sig")
+        self.assertNotIn("状态分类", detail.columns)
+        self.assertIn("运营人员", detail.columns)
+        self.assertAlmostEqual(detail["盈亏"].sum(), self.merged_df["盈亏"].sum(), places=6)
+        self.assertAlmostEqual(detail["待确认盈利"].sum(), self.merged_df["待确认盈利"].sum(), places=6)
+
+    def test_streamed_detail_matches_memory(self):
+        order_path = self.path("orders.csv")
+        self.order_df.to_csv(order_path, index=False, encoding="gbk")
+        chunks = (merged for merged, _, _ in iter_merged_chunks(order_path, self.operator_df, self.cost_df,
+                                                                 chunksize=150))
+        write_detail(chunks, self.path("streamed.csv"))
+        write_detail(iter_frame_chunks(self.merged_df), self.path("memory.csv"))
+        pd.testing.assert_frame_equal(pd.read_csv(self.path("streamed.csv"), encoding="utf-8-sig"),
+                                      pd.read_csv(self.path("memory.csv"), encoding="utf-8-sig"))
+
+    def test_cancel_and_unsupported_format(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            write_detail(iter_frame_chunks(self.merged_df), self.path("cancelled.csv"), cancel_event=cancel_event)
+        self.assertFalse(os.path.exists(self.path("cancelled.csv")))
+        with self.assertRaises(ExportError):
+            write_detail(iter_frame_chunks(self.merged_df), self.path("detail.json"))
+
+    @unittest.skipUnless(detail_export.xlsxwriter is not None or openpyxl is not None, "需要 xlsxwriter 或 openpyxl")
+    def test_xlsx_splits_sheets(self):
+        writer = XlsxDetailWriter(self.path("detail.xlsx"), max_rows=201)
+        for chunk in iter_frame_chunks(detail_export.detail_frame(self.merged_df), 150):
+            writer.write(chunk)
+        writer.close()
+        sheets = pd.read_excel(self.path("detail.xlsx"), sheet_name=None)
+        self.assertEqual(list(sheets), ["明细", "明细2", "明细3"])
+        self.assertEqual([len(df) for df in sheets.values()], [200, 200, 100])
+        combined = pd.concat(sheets.values(), ignore_index=True)
+        self.assertAlmostEqual(combined["盈亏"].sum(), self.merged_df["盈亏"].sum(), places=6)
+
+    @unittest.skipUnless(detail_export.pq is not None, "需要 pyarrow")
+    def test_parquet(self):
+        write_detail(iter_frame_chunks(self.merged_df, 100), self.path("detail.parquet"))
+        detail = pd.read_parquet(self.path("detail.parquet"))
+        self.assertEqual(len(detail), 500)
+        self.assertAlmostEqual(detail["盈亏"].sum(), self.merged_df["盈亏"].sum(), places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from instrumentation import RunProfiler  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestRunProfiler(unittest.TestCase):
+    def test_repeated_stages_accumulate(self):
+        profiler = RunProfiler("test", track_memory=True)
+        for n in (3, 4):
+            with profiler.stage("merge", "合并", rows_in=n) as timing:
+                data = [0] * 100000
+                timing.rows_out = n
+        profiler.finish()
+        record = profiler.records["merge"]
+        self.assertEqual((record.calls, record.rows_in, record.rows_out), (2, 7, 7))
+        self.assertGreater(record.peak_bytes, 0)
+        self.assertIn("合并", profiler.summary_text())
+        del data
+
+    def test_pipeline_stages_and_log(self):
+        order_df, operator_df, cost_df = make_tables(n=200)
+        pipeline = AnalysisPipeline()
+        pipeline.run(order_df, operator_df, cost_df)
+
+        profiler = RunProfiler("analysis", profile=True)
+        new_cost_df = cost_df.copy()
+        pipeline.run(order_df, operator_df, new_cost_df, profiler=profiler)
+        self.assertTrue(profiler.records["normalize"].reused)
+        self.assertEqual(profiler.records["profit"].rows_in, 200)
+        self.assertEqual(profiler.records["cost_join"].rows_out, 200)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = profiler.write_log(tmp, extra={"status": "done"})
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.assertEqual(data["status"], "done")
+            self.assertIn("cost_index", [stage["name"] for stage in data["stages"]])
+            self.assertTrue(os.path.exists(data["profile"]["path"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+import pandas as pd  # noqa: E402
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+import loaders  # noqa: E402
+from analysis import run_analysis, select_columns  # noqa: E402
+from dedup import row_keys  # noqa: E402
+from loaders import (TranscodingReader, detect_encoding, iter_table_chunks, read_csv_with_encoding,  # noqa: E402
+                     read_header, read_table)
+
+
+class TestTranscodingReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_switches_encoding_without_rereading(self):
+        # 开头全是ASCII（检测为ascii），后面才出现GBK中文
+        ascii_rows = "".join(f"{i},SKU{i},done\n" for i in range(3000))
+        gbk_rows = "".join(f"{i},商品{i},已收货\n" for i in range(3000, 3100))
+        text = "id,code,status\n" + ascii_rows + gbk_rows
+        path = self.write("orders.csv", text.encode("gbk"))
+
+        with TranscodingReader(path, ["ascii", "gbk", "latin1"], block_size=4096) as reader:
+            self.assertEqual(reader.read(), text)
+            self.assertTrue(reader.switched)
+            self.assertEqual(reader.encoding, "gbk")
+
+        df = read_csv_with_encoding(path, "auto")
+        self.assertEqual(len(df), 3100)
+        self.assertEqual(df["code"].iloc[-1], "商品3099")
+        # 切换后的编码被缓存，下次读取直接使用
+        self.assertEqual(detect_encoding(path), "gbk")
+
+    def test_multibyte_character_split_across_blocks(self):
+        text = "商品编码,成本\n" + "".join(f"编码{i},{i}.5\n" for i in range(500))
+        path = self.write("cost.csv", text.encode("utf-8"))
+        with TranscodingReader(path, ["utf-8"], block_size=7) as reader:
+            lines = list(reader)
+        self.assertEqual("".join(lines), text)
+        self.assertFalse(reader.switched)
+
+    def test_detection_is_cached_per_file_state(self):
+        path = self.write("cached.csv", "商品,数量\n".encode("gbk") * 50)
+        first = detect_encoding(path)
+        key = loaders._cache_key(path)
+        loaders._encoding_cache[key] = "sentinel"
+        self.assertEqual(detect_encoding(path), "sentinel")
+        # 文件内容变化后（大小不同）重新检测
+        with open(path, "ab") as f:
+            f.write("新增,1\n".encode("gbk"))
+        self.assertEqual(detect_encoding(path), first)
+
+
+class TestColumnPruning(unittest.TestCase):
+    def test_pruned_read_gives_same_analysis(self):
+        sys.path.insert(0, os.path.dirname(__file__))
+        from test_analysis import make_tables
+
+        order_df, operator_df, cost_df = make_tables(n=400)
+        for i in range(20):
+            order_df[f"备注{i}"] = "无关内容"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            order_df.to_csv(path, index=False, encoding="gbk")
+            usecols, text_columns = select_columns("order", read_header(path))
+            pruned = read_table(path, usecols=usecols, text_columns=text_columns)
+            full = read_table(path)
+
+        self.assertEqual(sorted(pruned.columns), sorted(["商品id", "SKU", "状态", "实收金额", "数量", "运费"]))
+        expected = run_analysis(full, operator_df, cost_df)
+        result = run_analysis(pruned, operator_df, cost_df)
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+
+    @unittest.skipUnless(openpyxl is not None, "需要 openpyxl")
+    def test_xlsx_chunks_read_text_columns_as_text(self):
+        sys.path.insert(0, os.path.dirname(__file__))
+        from test_analysis import make_tables
+
+        order_df = make_tables(n=300)[0]
+        # 数字订单号：整表读取和分块读取都应按文本读取，CSV 和 xlsx 导出的去重指纹相同
+        order_df["订单号"] = pd.array([10000 + i // 2 for i in range(len(order_df))], dtype="Int64")
+        order_df.loc[3, "订单号"] = pd.NA
+        with tempfile.TemporaryDirectory() as tmp:
+            frames = {}
+            for name in ("orders.csv", "orders.xlsx"):
+                path = os.path.join(tmp, name)
+                if name.endswith(".csv"):
+                    order_df.to_csv(path, index=False)
+                else:
+                    order_df.to_excel(path, index=False)
+                usecols, text_columns = select_columns("order", read_header(path))
+                self.assertIn("订单号", text_columns)
+                chunks = list(iter_table_chunks(path, chunksize=70, usecols=usecols, text_columns=text_columns))
+                frames[name] = pd.concat(chunks, ignore_index=True)
+                whole = read_table(path, usecols=usecols, text_columns=text_columns)
+                self.assertEqual(frames[name]["订单号"].tolist()[:3], ["10000", "10000", "10001"])
+                pd.testing.assert_series_equal(frames[name]["订单号"], whole["订单号"], check_dtype=False)
+                self.assertTrue(frames[name]["订单号"].isna().iloc[3])
+        self.assertEqual(row_keys(frames["orders.csv"]).tolist(), row_keys(frames["orders.xlsx"]).tolist())
+
+    def test_missing_required_column_reads_everything(self):
+        self.assertEqual(select_columns("cost", ["商品编码", "备注"]), (None, ()))
+        self.assertEqual(select_columns("operator", ["商品ID", "运营", "备注"]), (["商品ID", "运营"], ["运营"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
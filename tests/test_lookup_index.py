@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+from analysis import build_join_indexes, resolve_columns, run_analysis  # noqa: E402
+from lookup_index import LookupIndex  # noqa: E402
+
+
+class TestLookupIndex(unittest.TestCase):
+    def test_duplicates_resolved_at_build_time(self):
+        cost_df = pd.DataFrame({"商品编码": ["A", "B", "A", "C"], "商品成本": [1.0, 2.0, 9.0, 3.0]})
+        index = LookupIndex.build(cost_df, ["商品编码"], "商品成本")
+        self.assertEqual(index.duplicate_count, 2)
+        self.assertEqual(len(index), 3)
+
+        orders = pd.DataFrame({"商品编码": ["A", "Z", "C", "A"]})
+        values = index.lookup(orders)
+        self.assertEqual(len(values), 4)
+        np.testing.assert_array_equal(values, [1.0, np.nan, 3.0, 1.0])
+
+    def test_multi_column_keys(self):
+        operator_df = pd.DataFrame({"商品ID": [1, 1, 2], "商品编码": ["a", "b", "a"], "运营人员": ["甲", "乙", "丙"]})
+        index = LookupIndex.build(operator_df, ["商品ID", "商品编码"], "运营人员")
+        orders = pd.DataFrame({"商品ID": [1, 2, 2], "商品编码": ["b", "a", "b"]})
+        self.assertEqual(list(index.lookup(orders)[:2]), ["乙", "丙"])
+        self.assertTrue(pd.isna(index.lookup(orders)[2]))
+
+    def test_key_type_mismatch_is_reported(self):
+        index = LookupIndex.build(pd.DataFrame({"商品ID": ["1", "2"], "运营人员": ["甲", "乙"]}), ["商品ID"], "运营人员")
+        with self.assertRaises(ValueError):
+            index.lookup(pd.DataFrame({"商品ID": [1, 2]}))
+
+
+class TestJoinIndexesInAnalysis(unittest.TestCase):
+    def test_row_count_kept_with_duplicate_costs_and_indexes_reused(self):
+        order_df = pd.DataFrame({
+            "商品ID": [1, 2, 3], "商品编码": ["A", "B", "C"],
+            "订单状态": ["已收货", "已收货", "已收货"], "实收金额": [10, 20, 30],
+        })
+        operator_df = pd.DataFrame({"商品ID": [1, 2], "运营人员": ["甲", "乙"]})
+        cost_df = pd.DataFrame({"商品编码": ["A", "A", "B"], "商品成本": [4, 5, 6]})
+
+        result = run_analysis(order_df, operator_df, cost_df)
+        self.assertEqual(len(result.merged_df), 3)
+        self.assertEqual(result.cost_duplicate_count, 2)
+        self.assertEqual(result.merged_df["盈亏"].tolist(), [6.0, 14.0, 0.0])
+
+        columns = resolve_columns(order_df, operator_df, cost_df)
+        indexes = build_join_indexes(operator_df, cost_df, columns)
+        again = run_analysis(order_df, operator_df, cost_df, indexes=indexes)
+        self.assertIs(again.indexes, indexes)
+        pd.testing.assert_frame_equal(again.result_df, result.result_df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import sqlite3
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis  # noqa: E402
+from order_store import OrderStore, run_store_analysis  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestOrderStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=600)
+        self.store = OrderStore(os.path.join(self.tmp.name, "orders.sqlite"))
+        # 把订单表分成三个批次文件
+        self.paths = []
+        for i, batch in enumerate((self.order_df.iloc[:250], self.order_df.iloc[250:450], self.order_df.iloc[450:])):
+            path = os.path.join(self.tmp.name, f"orders_{i}.csv")
+            batch.to_csv(path, index=False)
+            self.paths.append(path)
+
+    def import_all(self, operator_df=None, cost_df=None):
+        operator_df = self.operator_df if operator_df is None else operator_df
+        cost_df = self.cost_df if cost_df is None else cost_df
+        for path in self.paths:
+            result, message = run_store_analysis(self.store, path, operator_df, cost_df)
+        return result, message
+
+    def assert_same_result(self, result, expected):
+        pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                      expected.result_df.reset_index(drop=True), check_dtype=False)
+        self.assertEqual(result.order_count, expected.order_count)
+        self.assertEqual(result.other_count, expected.other_count)
+        self.assertEqual(result.missing_cost_count, expected.missing_cost_count)
+        self.assertEqual(list(result.merge_on_operator), list(expected.merge_on_operator))
+
+    def test_incremental_report_matches_full_analysis(self):
+        result, message = self.import_all()
+        self.assertIn("共 3 个批次", message)
+        self.assert_same_result(result, run_analysis(self.order_df, self.operator_df, self.cost_df))
+        self.assertEqual(result.operator_duplicate_count,
+                         run_analysis(self.order_df, self.operator_df, self.cost_df).operator_duplicate_count)
+
+        status = self.store.status_report()
+        self.assertEqual(status["订单行数"].sum(), len(self.order_df))
+
+    def test_same_batch_is_skipped(self):
+        self.import_all()
+        result, message = run_store_analysis(self.store, self.paths[0], self.operator_df, self.cost_df)
+        self.assertIn("已导入过", message)
+        self.assertEqual(len(self.store.batches()), 3)
+        self.assertEqual(result.order_count, len(self.order_df))
+
+    def test_mapping_change_rebuilds_summaries(self):
+        self.import_all()
+        cost_df = self.cost_df.assign(成本价=self.cost_df["成本价"] * 2)
+        result, message = run_store_analysis(self.store, self.paths[1], self.operator_df, cost_df)
+        self.assertIn("重新计算", message)
+        self.assert_same_result(result, run_analysis(self.order_df, self.operator_df, cost_df))
+
+    def test_connections_are_closed(self):
+        connections = []
+        connect = sqlite3.connect
+
+        def tracking_connect(*args, **kwargs):
+            connections.append(connect(*args, **kwargs))
+            return connections[-1]
+
+        with mock.patch("order_store.sqlite3.connect", tracking_connect):
+            self.import_all()
+            self.store.report()
+            self.store.status_report()
+            self.store.clear()
+        self.assertTrue(connections)
+        for con in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                con.execute("SELECT 1")
+
+    def test_clear(self):
+        self.import_all()
+        self.store.clear()
+        self.assertIsNone(self.store.report())
+        self.assertIsNone(self.store.mapping())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import AnalysisCancelled, run_analysis  # noqa: E402
+import parallel  # noqa: E402
+from parallel import get_pool, read_shard, run_parallel_analysis, shard_bounds, write_shards  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestParallelAnalysis(unittest.TestCase):
+    def test_shard_bounds_cover_all_rows(self):
+        self.assertEqual(shard_bounds(10, 3), [(0, 4), (4, 7), (7, 10)])
+        self.assertEqual(shard_bounds(2, 8), [(0, 1), (1, 2)])
+
+    def test_matches_single_process(self):
+        order_df, operator_df, cost_df = make_tables(n=3000)
+        expected = run_analysis(order_df, operator_df, cost_df)
+        stages = []
+        for workers in (1, 3):
+            result = run_parallel_analysis(order_df, operator_df, cost_df, workers=workers,
+                                           progress=stages.append, min_shard_rows=500)
+            pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                          expected.result_df.reset_index(drop=True))
+            self.assertEqual(result.order_count, expected.order_count)
+            self.assertEqual(result.other_count, expected.other_count)
+            self.assertEqual(result.missing_cost_count, expected.missing_cost_count)
+            self.assertEqual(result.operator_duplicate_count, expected.operator_duplicate_count)
+            self.assertIsNone(result.merged_df)
+        self.assertIn('aggregate', stages)
+
+    def test_cancel(self):
+        order_df, operator_df, cost_df = make_tables(n=1000)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            run_parallel_analysis(order_df, operator_df, cost_df, workers=2,
+                                  cancel_event=cancel_event, min_shard_rows=100)
+
+    def test_shard_files_round_trip(self):
+        order_df = make_tables(n=100)[0]
+        bounds = shard_bounds(len(order_df), 3)
+        # 有 pyarrow 时为一个 Arrow 文件，否则每个分片一个 pickle 文件
+        for arrow in (parallel.pa, None):
+            with tempfile.TemporaryDirectory() as tmp, mock.patch("parallel.pa", arrow):
+                shards = write_shards(order_df, bounds, tmp)
+                for shard, (start, end) in zip(shards, bounds):
+                    pd.testing.assert_frame_equal(read_shard(*shard).reset_index(drop=True),
+                                                  order_df.iloc[start:end].reset_index(drop=True))
+
+    def test_pool_is_reused_and_survives_cancel(self):
+        order_df, operator_df, cost_df = make_tables(n=2000)
+        expected = run_analysis(order_df, operator_df, cost_df)
+        first = run_parallel_analysis(order_df, operator_df, cost_df, workers=2, min_shard_rows=500)
+        pool = get_pool(2)
+        executor = pool._executor
+        indexes_path = pool._indexes[1]
+
+        # 分片开始计算后取消：等待正在运行的分片停止，进程池保留
+        cancel_event = threading.Event()
+
+        def progress(stage):
+            if stage == "profit":
+                cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            run_parallel_analysis(order_df, operator_df, cost_df, workers=2, progress=progress,
+                                  cancel_event=cancel_event, indexes=first.indexes, min_shard_rows=500)
+
+        result = run_parallel_analysis(order_df, operator_df, cost_df, workers=2,
+                                       indexes=first.indexes, min_shard_rows=500)
+        self.assertIs(get_pool(2), pool)
+        self.assertIs(pool._executor, executor)
+        # 查找索引不变时不重新写出
+        self.assertEqual(pool._indexes[1], indexes_path)
+        self.assertEqual(os.listdir(pool._dir), [os.path.basename(indexes_path)])
+        pd.testing.assert_frame_equal(result.result_df.reset_index(drop=True),
+                                      expected.result_df.reset_index(drop=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestAnalysisPipeline(unittest.TestCase):
+    def assert_same_result(self, result, expected):
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+        self.assertEqual(result.other_count, expected.other_count)
+        self.assertEqual(result.missing_cost_count, expected.missing_cost_count)
+
+    def test_matches_run_analysis_and_reuses_everything(self):
+        order_df, operator_df, cost_df = make_tables(n=500)
+        pipeline = AnalysisPipeline()
+        first = pipeline.run(order_df, operator_df, cost_df)
+        self.assert_same_result(first, run_analysis(order_df, operator_df, cost_df))
+
+        second = pipeline.run(order_df, operator_df, cost_df)
+        self.assertEqual(pipeline.recomputed, [])
+        self.assertIs(second.merged_df, first.merged_df)
+
+    def test_changing_cost_table_only_recomputes_cost_stages(self):
+        order_df, operator_df, cost_df = make_tables(n=500)
+        pipeline = AnalysisPipeline()
+        pipeline.run(order_df, operator_df, cost_df)
+
+        new_cost_df = cost_df.copy()
+        new_cost_df.loc[:5, "成本价"] += 10
+        result = pipeline.run(order_df, operator_df, new_cost_df)
+        self.assertEqual(pipeline.recomputed,
+                         ["cost_columns", "cost_index", "cost_join", "profit", "detail", "aggregate", "cube"])
+        self.assert_same_result(result, run_analysis(order_df, operator_df, new_cost_df))
+
+    def test_changing_operator_table_skips_profit(self):
+        order_df, operator_df, cost_df = make_tables(n=500)
+        pipeline = AnalysisPipeline()
+        pipeline.run(order_df, operator_df, cost_df)
+
+        new_operator_df = operator_df.copy()
+        new_operator_df.loc[0, "运营"] = "新运营"
+        result = pipeline.run(order_df, new_operator_df, cost_df)
+        self.assertNotIn("profit", pipeline.recomputed)
+        self.assertNotIn("normalize", pipeline.recomputed)
+        self.assert_same_result(result, run_analysis(order_df, new_operator_df, cost_df))
+
+    def test_loaded_frames_are_not_renamed(self):
+        order_df, operator_df, cost_df = make_tables(n=50)
+        columns = list(order_df.columns)
+        AnalysisPipeline().run(order_df, operator_df, cost_df)
+        self.assertEqual(list(order_df.columns), columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
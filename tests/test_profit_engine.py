@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+from profit_engine import calculate_profit_loss, compute_profit  # noqa: E402
+
+
+def make_merged_df(n=500, seed=0, with_shipping=True):
+    rng = np.random.default_rng(seed)
+    statuses = np.array([
+        "已收货", "已完成", "交易完成", "退货", "退款成功", "已退回",
+        "已发货待收货", "已发货", "待收货", "待发货", "待处理", "待确认",
+        "已取消", " 已收货 ", "退货完成", None, 5,
+    ], dtype=object)
+    amounts = np.array([120.5, 0, "88", "abc", None, 59.9, "12.30"], dtype=object)
+    costs = np.array([30.0, None, "15", "n/a", 0, 12.5], dtype=object)
+    quantities = np.array([1, 2, None, "3", "x", 0.5], dtype=object)
+    df = pd.DataFrame({
+        "订单状态": statuses[rng.integers(0, len(statuses), n)],
+        "实收金额": amounts[rng.integers(0, len(amounts), n)],
+        "商品成本": costs[rng.integers(0, len(costs), n)],
+        "商品数量": quantities[rng.integers(0, len(quantities), n)],
+    })
+    if with_shipping:
+        shipping = np.array([8, None, "6.5", "免运费"], dtype=object)
+        df["运费"] = shipping[rng.integers(0, len(shipping), n)]
+    return df
+
+
+class TestComputeProfit(unittest.TestCase):
+    def assert_matches_rowwise(self, df):
+        expected = df.apply(calculate_profit_loss, axis=1).to_numpy(dtype="float64")
+        profit_loss, pending_profit = compute_profit(df)
+        np.testing.assert_allclose(profit_loss, expected[:, 0])
+        np.testing.assert_allclose(pending_profit, expected[:, 1])
+
+    def test_parity_with_rowwise_function(self):
+        self.assert_matches_rowwise(make_merged_df())
+
+    def test_parity_without_shipping_column(self):
+        self.assert_matches_rowwise(make_merged_df(seed=1, with_shipping=False))
+
+    def test_missing_cost_is_zero_and_return_deducts_shipping(self):
+        df = pd.DataFrame({
+            "订单状态": ["已收货", "退货", "已发货"],
+            "实收金额": [100, 100, 100],
+            "商品成本": [None, 20, 20],
+            "商品数量": [2, None, 3],
+            "运费": [5, 5, 5],
+        })
+        profit_loss, pending_profit = compute_profit(df)
+        self.assertEqual(profit_loss.tolist(), [0.0, -25.0, 0.0])
+        self.assertEqual(pending_profit.tolist(), [0.0, 0.0, 40.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import result_cache  # noqa: E402
+from analysis import run_analysis  # noqa: E402
+from result_cache import ResultCache, changed_tables, result_key, source_fingerprints  # noqa: E402
+from table_cache import TableCache  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.tables = make_tables()
+        self.paths = {}
+        for kind, df in zip(("order", "operator", "cost"), self.tables):
+            self.paths[kind] = os.path.join(self.tmp.name, f"{kind}.csv")
+            df.to_csv(self.paths[kind], index=False)
+        self.cache_dir = os.path.join(self.tmp.name, "results")
+
+    def test_key_changes_with_inputs_and_rules(self):
+        key = result_key(self.paths)
+        self.assertEqual(key, result_key(self.paths))
+        # 已加载的数据表只用于确定列映射
+        self.assertEqual(key, result_key(self.paths, frames=dict(zip(("order", "operator", "cost"), self.tables))))
+        self.assertNotEqual(key, result_key(self.paths, "gbk"))
+        with mock.patch.object(result_cache, "RULES_VERSION", 2):
+            self.assertNotEqual(key, result_key(self.paths))
+
+        time.sleep(0.01)
+        self.tables[2].iloc[:1].to_csv(self.paths["cost"], index=False)
+        self.assertNotEqual(key, result_key(self.paths))
+
+    def test_loaded_tables_keep_their_fingerprints(self):
+        table_cache = TableCache(os.path.join(self.tmp.name, "tables"))
+        frames = {kind: table_cache.read_table(path) for kind, path in self.paths.items()}
+        key = result_key(self.paths, frames=frames)
+        self.assertEqual(key, result_key(self.paths))
+
+        # 读取后修改了文件：已加载的数据表仍对应原来的内容，不能按新文件的哈希保存结果
+        time.sleep(0.01)
+        self.tables[0].iloc[:10].to_csv(self.paths["order"], index=False)
+        self.assertEqual(key, result_key(self.paths, frames=frames))
+        new_key = result_key(self.paths)
+        self.assertNotEqual(key, new_key)
+        frames["order"] = table_cache.read_table(self.paths["order"])
+        self.assertEqual(new_key, result_key(self.paths, frames=frames))
+
+    def test_changed_tables(self):
+        table_cache = TableCache(os.path.join(self.tmp.name, "tables"))
+        frames = {"cost": table_cache.read_table(self.paths["cost"])}
+        fingerprints = source_fingerprints(self.paths, frames)
+        self.assertEqual(changed_tables(self.paths, fingerprints), [])
+
+        # 分析后修改或删除了文件：重新读取会得到与报告不符的明细
+        time.sleep(0.01)
+        self.tables[0].iloc[:10].to_csv(self.paths["order"], index=False)
+        self.tables[2].iloc[:10].to_csv(self.paths["cost"], index=False)
+        self.assertEqual(changed_tables(self.paths, fingerprints, frames), ["order"])
+        self.assertEqual(changed_tables(self.paths, fingerprints), ["order", "cost"])
+        os.remove(self.paths["operator"])
+        self.assertEqual(changed_tables(self.paths, fingerprints, frames), ["order", "operator"])
+
+    def test_memory_and_disk_hits(self):
+        result = run_analysis(*self.tables)
+        cache = ResultCache(self.cache_dir)
+        key = result_key(self.paths)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, result)
+
+        # 新的缓存对象从磁盘读取
+        restored = ResultCache(self.cache_dir).get(key)
+        self.assertTrue(restored.from_cache)
+        self.assertFalse(result.from_cache)
+        pd.testing.assert_frame_equal(restored.result_df, result.result_df)
+        self.assertEqual(restored.status_message(), result.status_message())
+        self.assertEqual(restored.warnings(), result.warnings())
+
+    def test_eviction_and_corrupt_files(self):
+        result = run_analysis(*self.tables)
+        cache = ResultCache(self.cache_dir, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, result)
+        self.assertEqual(list(cache._memory), ["b", "c"])
+        # 内存中淘汰的结果仍可从磁盘读取
+        self.assertIsNotNone(cache.get("a"))
+
+        size = os.path.getsize(os.path.join(self.cache_dir, "a.pkl"))
+        small = ResultCache(self.cache_dir, max_bytes=size * 2)
+        small.evict()
+        self.assertEqual(len(small._entries()), 2)
+
+        with open(os.path.join(self.cache_dir, "bad.pkl"), "wb") as f:
+            f.write(b"not a pickle")
+        self.assertIsNone(ResultCache(self.cache_dir).get("bad"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "bad.pkl")))
+
+        cache.clear()
+        self.assertIsNone(cache.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import run_analysis  # noqa: E402
+from scenarios import (  # noqa: E402
+    BASELINE, TOTAL_ROW, Scenario, ScenarioError, adjustment_scenarios, comparison_table,
+    evaluate_scenarios, groups_from_chunks, parse_percent, scenario_groups, uniform_scenarios
+)
+from test_analysis import make_tables  # noqa: E402
+
+
+def operator_totals(result):
+    summary = result.result_df.set_index("运营")
+    return summary["总盈亏"], summary["待确认盈利"]
+
+
+class TestScenarios(unittest.TestCase):
+    def setUp(self):
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=800)
+        self.result = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        self.groups = scenario_groups(self.result.merged_df)
+
+    def assert_matches_analysis(self, profit, pending, name, cost_df):
+        expected_profit, expected_pending = operator_totals(run_analysis(self.order_df, self.operator_df, cost_df))
+        np.testing.assert_allclose(profit[name].reindex(expected_profit.index), expected_profit, atol=0.01)
+        np.testing.assert_allclose(pending[name].reindex(expected_pending.index), expected_pending, atol=0.01)
+
+    def test_scenarios_match_full_reanalysis(self):
+        doubled = self.cost_df.assign(成本价=self.cost_df["成本价"] * 2)
+        adjustments = pd.Series({"SKU001": 0.5, "SKU002": -0.2, "SKU999": 1.0})
+        scenarios = [
+            Scenario("成本翻倍", cost_df=doubled),
+            Scenario("部分调价", adjustments=adjustments),
+            *uniform_scenarios("10, -5%"),
+        ]
+        profit, pending = evaluate_scenarios(self.groups, scenarios)
+        self.assertEqual(list(profit.columns), [BASELINE, "成本翻倍", "部分调价", "全部+10%", "全部-5%"])
+
+        self.assert_matches_analysis(profit, pending, BASELINE, self.cost_df)
+        self.assert_matches_analysis(profit, pending, "成本翻倍", doubled)
+        adjusted = self.cost_df.copy()
+        for sku, percent in adjustments.items():
+            adjusted.loc[adjusted["商品编码"] == sku, "成本价"] *= 1 + percent
+        self.assert_matches_analysis(profit, pending, "部分调价", adjusted)
+        self.assert_matches_analysis(profit, pending, "全部+10%", self.cost_df.assign(成本价=self.cost_df["成本价"] * 1.1))
+
+    def test_replacement_cost_table_missing_skus(self):
+        # 替换成本表中没有的商品按成本缺失处理
+        partial = self.cost_df.iloc[:10]
+        profit, pending = evaluate_scenarios(self.groups, [Scenario("部分成本表", cost_df=partial)])
+        self.assert_matches_analysis(profit, pending, "部分成本表", partial)
+
+    def test_chunked_groups_match(self):
+        merged_df = self.result.merged_df
+        chunks = (merged_df.iloc[i:i + 150] for i in range(0, len(merged_df), 150))
+        chunked, _ = evaluate_scenarios(groups_from_chunks(chunks), uniform_scenarios("20"))
+        whole, _ = evaluate_scenarios(self.groups, uniform_scenarios("20"))
+        pd.testing.assert_frame_equal(chunked, whole)
+
+    def test_comparison_table(self):
+        profit, _ = evaluate_scenarios(self.groups, uniform_scenarios("10"))
+        table = comparison_table(profit)
+        self.assertEqual(list(table.columns), ["运营", BASELINE, "全部+10%", "全部+10% 变化"])
+        self.assertEqual(table["运营"].iloc[-1], TOTAL_ROW)
+        self.assertEqual(table["运营"].iloc[-2], "其他")
+        body = table.iloc[:-1]
+        self.assertAlmostEqual(table[BASELINE].iloc[-1], body[BASELINE].sum(), places=2)
+        self.assertTrue((body["全部+10% 变化"] <= 0).all())
+
+    def test_adjustment_sku_matching(self):
+        # 调价表中的商品编码与订单按相同规则匹配，类型不一致时报错而不是按 0 调整
+        numeric = Scenario("数字编码", adjustments=pd.Series({1001: 0.1}))
+        with self.assertRaises(ScenarioError):
+            evaluate_scenarios(self.groups, [numeric])
+        scenario = Scenario("部分调价", adjustments=pd.Series({"SKU001": 0.5, "SKU999": 1.0, "SKU998": 1.0}))
+        evaluate_scenarios(self.groups, [scenario])
+        self.assertEqual(scenario.unmatched, 2)
+
+    def test_adjustment_table(self):
+        df = pd.DataFrame({"商品编码": ["SKU001", "SKU002"], "涨价": ["10%", "+5%"], "降价": [-0.1, None]})
+        scenarios = adjustment_scenarios(df)
+        self.assertEqual([s.name for s in scenarios], ["涨价", "降价"])
+        self.assertAlmostEqual(scenarios[0].adjustments["SKU002"], 0.05)
+        self.assertAlmostEqual(scenarios[1].adjustments["SKU001"], -0.1)
+        self.assertAlmostEqual(scenarios[1].adjustments["SKU002"], 0.0)
+        # Excel 中百分比格式的单元格保存为小数，只有带 % 的文字按百分数解析
+        scenarios = adjustment_scenarios(pd.DataFrame({"商品编码": [1001, 1002], "调价": [0.1, "10%"]}))
+        self.assertEqual(scenarios[0].adjustments.to_dict(), {1001: 0.1, 1002: 0.1})
+        with self.assertRaises(ScenarioError):
+            parse_percent(10)
+        self.assertEqual(uniform_scenarios("10")[0].uniform, 0.1)
+        with self.assertRaises(ScenarioError):
+            adjustment_scenarios(pd.DataFrame({"涨价": ["10%"]}))
+        with self.assertRaises(ScenarioError):
+            parse_percent("abc")
+        with self.assertRaises(ScenarioError):
+            evaluate_scenarios(self.groups, [Scenario(BASELINE, uniform=0.1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
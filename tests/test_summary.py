@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+from profit_engine import compute_profit  # noqa: E402
+from status_rules import classify_statuses, match_status  # noqa: E402
+from summary import summarize_by_operator  # noqa: E402
+
+
+def groupby_reference(df):
+    return df.groupby('运营人员').agg(
+        订单总数=('商品ID', 'count'),
+        已收货订单=('订单状态', lambda x: x.str.contains('已收货|已完成|完成|收货', case=False, na=False).sum()),
+        退货订单=('订单状态', lambda x: x.str.contains('退货|退款|退回', case=False, na=False).sum()),
+        已发货待收货=('订单状态', lambda x: x.str.contains('已发货待收货|已发货|待收货', case=False, na=False).sum()),
+        总盈亏=('盈亏', 'sum'),
+        待确认盈利总额=('待确认盈利', 'sum'),
+        平均每单盈亏=('盈亏', 'mean')
+    ).reset_index()
+
+
+class TestStatusClassification(unittest.TestCase):
+    def test_overlapping_keywords_set_several_bits(self):
+        # "已发货待收货" 同时包含 "收货"，盈亏按已收货计算，汇总时两类都计数
+        self.assertEqual(match_status("已发货待收货"), 0b101)
+        self.assertEqual(match_status(None), 0)
+        self.assertEqual(match_status(float("nan")), 0)
+
+    def test_classify_is_categorical_per_row(self):
+        status = pd.Series(["已收货", None, "退款", "已收货"])
+        codes = classify_statuses(status)
+        self.assertEqual(len(codes), 4)
+        self.assertEqual(list(codes.codes), [1, 0, 2, 1])
+
+
+class TestSummarizeByOperator(unittest.TestCase):
+    def test_matches_groupby_with_regex_counts(self):
+        rng = np.random.default_rng(3)
+        n = 400
+        statuses = np.array(["已收货", "交易完成", "退款中", "已发货待收货", "已发货",
+                             "待发货", "已取消", None], dtype=object)
+        df = pd.DataFrame({
+            "运营人员": rng.choice(["张三", "李四", "王五", "其他"], n),
+            "商品ID": np.where(rng.random(n) < 0.1, np.nan, rng.integers(1, 50, n)),
+            "订单状态": statuses[rng.integers(0, len(statuses), n)],
+            "实收金额": rng.uniform(0, 200, n).round(2),
+            "商品成本": np.where(rng.random(n) < 0.2, np.nan, rng.uniform(5, 80, n).round(2)),
+            "商品数量": rng.integers(1, 4, n),
+        })
+        df["状态分类"] = classify_statuses(df["订单状态"])
+        df["盈亏"], df["待确认盈利"] = compute_profit(df)
+
+        expected = groupby_reference(df)
+        result = summarize_by_operator(df)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
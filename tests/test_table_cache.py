@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+import table_cache  # noqa: E402
+from table_cache import TableCache  # noqa: E402
+
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = TableCache(os.path.join(self.tmp.name, "cache"))
+        self.csv_path = os.path.join(self.tmp.name, "cost.csv")
+        pd.DataFrame({"商品编码": ["A", "B"], "商品成本": [1.5, 2.0]}).to_csv(
+            self.csv_path, index=False, encoding="gbk")
+
+    def test_second_read_comes_from_cache(self):
+        first = self.cache.read_table(self.csv_path, "gbk")
+        with mock.patch.object(table_cache, "read_table", side_effect=AssertionError("re-parsed")):
+            second = self.cache.read_table(self.csv_path, "gbk")
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_key_depends_on_content_and_settings(self):
+        key = self.cache.cache_key(self.csv_path, "gbk")
+        self.assertNotEqual(key, self.cache.cache_key(self.csv_path, "auto"))
+        time.sleep(0.01)
+        with open(self.csv_path, "a", encoding="gbk") as f:
+            f.write("C,3\n")
+        self.assertNotEqual(key, self.cache.cache_key(self.csv_path, "gbk"))
+
+    def test_lru_eviction_and_clear(self):
+        frames = {name: pd.DataFrame({"x": range(2000)}) for name in ("old", "mid", "new")}
+        for i, (name, df) in enumerate(frames.items()):
+            self.cache.store(name, df)
+            path = [p for p, _, _ in self.cache._entries() if os.path.basename(p).startswith(name)][0]
+            os.utime(path, (1000 + i, 1000 + i))
+        # 读取最旧的一项后它变为最近使用
+        self.assertIsNotNone(self.cache.load("old"))
+
+        entry_size = max(size for _, size, _ in self.cache._entries())
+        self.cache.max_bytes = entry_size * 2
+        self.cache.evict()
+        self.assertIsNone(self.cache.load("mid"))
+        self.assertIsNotNone(self.cache.load("old"))
+        self.assertIsNotNone(self.cache.load("new"))
+
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+MAIN_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "main")
+sys.path.insert(0, MAIN_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analysis import AnalysisCancelled, AnalysisError, run_analysis  # noqa: E402
+from table_cache import TableCache  # noqa: E402
+from test_analysis import make_tables  # noqa: E402
+from warm_process import WarmClient, WarmServer, read_state  # noqa: E402
+
+
+class TestLauncher(unittest.TestCase):
+    def test_launcher_does_not_import_heavy_modules(self):
+        code = ("import sys; sys.path.insert(0, sys.argv[1]); import main; "
+                "print([m for m in ('pandas', 'numpy', 'chardet', 'app') if m in sys.modules])")
+        output = subprocess.run([sys.executable, "-c", code, MAIN_DIR], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "[]")
+
+
+class TestWarmProcess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.order_df, self.operator_df, self.cost_df = make_tables(n=600)
+        self.paths = {}
+        for kind, df in (("order", self.order_df), ("operator", self.operator_df), ("cost", self.cost_df)):
+            self.paths[kind] = os.path.join(self.tmp.name, f"{kind}.csv")
+            df.to_csv(self.paths[kind], index=False)
+        self.state_path = os.path.join(self.tmp.name, "warm_process.json")
+        self.server, self.thread = self.start_server()
+        self.client = WarmClient(self.state_path, launcher=lambda: self.fail("不应启动新的后台进程"))
+
+    def start_server(self, **options):
+        server = WarmServer(self.state_path, TableCache(os.path.join(self.tmp.name, "tables")), **options)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.stop)
+        while read_state(self.state_path) is None:
+            thread.join(0.01)
+        return server, thread
+
+    def test_analysis_reuses_tables_in_memory(self):
+        stages = []
+        result, note = self.client.analyze(self.paths, progress=stages.append)
+        expected = run_analysis(self.order_df, self.operator_df, self.cost_df)
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+        self.assertEqual(result.order_count, expected.order_count)
+        self.assertIsNone(result.merged_df)
+        self.assertIsNotNone(result.cube)
+        self.assertEqual(stages[0], "read")
+        self.assertIn("0/3", note)
+
+        # 只修改了成本表时其余数据表直接使用内存中的
+        self.cost_df.assign(成本价=self.cost_df["成本价"] * 2).to_csv(self.paths["cost"], index=False)
+        result, note = self.client.analyze(self.paths)
+        self.assertIn("2/3", note)
+        expected = run_analysis(self.order_df, self.operator_df, self.cost_df.assign(成本价=self.cost_df["成本价"] * 2))
+        pd.testing.assert_frame_equal(result.result_df, expected.result_df)
+
+    def test_multiple_order_files_and_errors(self):
+        first = os.path.join(self.tmp.name, "orders_0.csv")
+        second = os.path.join(self.tmp.name, "orders_1.csv")
+        self.order_df.iloc[:400].to_csv(first, index=False)
+        self.order_df.iloc[300:].to_csv(second, index=False)
+        result, _ = self.client.analyze(dict(self.paths, order=(first, second)), compact=True)
+        self.assertEqual(result.duplicate_count, 100)
+        self.assertEqual(result.order_count, len(self.order_df))
+
+        self.cost_df.drop(columns="成本价").to_csv(self.paths["cost"], index=False)
+        with self.assertRaises(AnalysisError):
+            self.client.analyze(self.paths)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            self.client.analyze(self.paths, cancel_event=cancel_event)
+
+    def test_shutdown_and_idle_timeout(self):
+        self.assertTrue(self.client.running())
+        self.client.shutdown()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertIsNone(read_state(self.state_path))
+        self.assertFalse(self.client.running())
+
+        _, thread = self.start_server(idle_timeout=0.1, check_interval=0.05)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
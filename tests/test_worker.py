@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "main"))
+
+from analysis import AnalysisCancelled  # noqa: E402
+from worker import BackgroundTask, run_concurrently  # noqa: E402
+
+
+class FakeRoot:
+    """只记录 after 调用、不运行事件循环的 Tk 根窗口替身"""
+
+    def after(self, delay, callback):
+        pass
+
+
+class TestBackgroundTaskWait(unittest.TestCase):
+    def test_wait_returns_result_from_other_thread(self):
+        release = threading.Event()
+        task = BackgroundTask(FakeRoot(), lambda progress, cancel_event: release.wait(5) and "表").start()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(task.wait()))
+        waiter.start()
+        release.set()
+        waiter.join(5)
+        self.assertEqual(results, ["表"])
+
+    def test_wait_reraises_error_and_honours_cancel(self):
+        def fail(progress, cancel_event):
+            raise ValueError("编码错误")
+
+        with self.assertRaises(ValueError):
+            BackgroundTask(FakeRoot(), fail).start().wait()
+
+        blocker = threading.Event()
+        slow = BackgroundTask(FakeRoot(), lambda progress, cancel_event: blocker.wait(5)).start()
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            slow.wait(cancel_event, interval=0.01)
+        blocker.set()
+
+
+class TestRunConcurrently(unittest.TestCase):
+    def test_runs_in_parallel_and_collects_errors_per_name(self):
+        def slow(value):
+            time.sleep(0.3)
+            return value
+
+        def fail():
+            raise ValueError("无法解码")
+
+        start = time.perf_counter()
+        results, errors = run_concurrently({
+            "order": lambda: slow(1), "operator": lambda: slow(2), "cost": fail,
+        })
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(results, {"order": 1, "operator": 2})
+        self.assertIsInstance(errors["cost"], ValueError)
+
+    def test_cancel_stops_waiting(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(AnalysisCancelled):
+            run_concurrently({"order": lambda: time.sleep(1)}, cancel_event)
+
+
+if __name__ == "__main__":
+    unittest.main()